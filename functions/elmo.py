@@ -1,6 +1,10 @@
+import json
+
 from os import getenv
 
+from hal.deadline import Deadline
 from hal.probes.elmo import ElmoProbe
+from hal.probes.multi import MultiAccountProbe
 from hal.exporters.datadog import DatadogExporter
 
 
@@ -13,11 +17,18 @@ def entrypoint(event, context):
       * `DD_HOSTNAME` (default `hal`): Hostname used for the Datadog metric.
       * `WATCHDOG_HOSTS` (default `[]`): List of hostnames or IP addresses to check
       * `WATCHDOG_TAGS` (default `None`): Add tags to all Datadog metrics.
+      * `ELMO_ACCOUNTS` (default `None`): JSON list of alarm panels to monitor in the same
+        invocation, e.g. `[{"account": "home", "username": "...", "password": "..."}]`.
+        Missing keys are taken from the `ELMO_*` variables.
+      * `HAL_DEADLINE` (default `None`): Time budget of the invocation in seconds. Set it below the
+        function timeout, so that partial results are exported (with the `partial:true` tag) if time runs out.
 
     Args:
          event (dict): Event payload.
          context (google.cloud.functions.Context): Metadata for the event.
     """
+    budget = getenv("HAL_DEADLINE")
+    deadline = Deadline(float(budget)) if budget else None
     config = {
         "base_url": getenv("ELMO_BASE_URL"),
         "vendor": getenv("ELMO_VENDOR"),
@@ -33,6 +44,12 @@ def entrypoint(event, context):
             )
         ],
     }
-    probe = ElmoProbe(config)
-    probe.run()
+    accounts = getenv("ELMO_ACCOUNTS")
+    if accounts:
+        probe = MultiAccountProbe(
+            {**config, "probe": ElmoProbe, "accounts": json.loads(accounts)}
+        )
+    else:
+        probe = ElmoProbe(config)
+    probe.run(deadline)
     probe.export()
@@ -1,6 +1,11 @@
+import json
+
 from os import getenv
 
+from hal.deadline import Deadline
+from hal.probes.multi import MultiAccountProbe
 from hal.probes.paperspace import PaperspaceProbe
+from hal.snapshots.file import FileSnapshotStore
 from hal.exporters.datadog import DatadogExporter
 
 
@@ -12,13 +17,27 @@ def entrypoint(event, context):
       * `DD_HOSTNAME` (default `hal`): Hostname used for the Datadog metric.
       * `PAPERSPACE_TAGS` (default `None`): Add tags to all Datadog metrics.
       * `PAPERSPACE_API_KEY`: API key used to authenticate API calls.
+      * `PAPERSPACE_ACCOUNTS` (default `None`): JSON list of accounts to monitor in the same
+        invocation, e.g. `[{"account": "work", "api_key": "..."}]`. Each account overrides `PAPERSPACE_API_KEY`
+        and the `account` tag is added to all metrics.
+      * `HAL_SNAPSHOT_PATH` (default `None`): Folder where the probe state is stored, so that
+        invocations served by the same instance fetch utilization data incrementally.
+      * `HAL_DEADLINE` (default `None`): Time budget of the invocation in seconds. Set it below the
+        function timeout, so that partial results are exported (with the `partial:true` tag) if time runs out.
 
     Args:
          event (dict): Event payload.
          context (google.cloud.functions.Context): Metadata for the event.
     """
+    budget = getenv("HAL_DEADLINE")
+    deadline = Deadline(float(budget)) if budget else None
+    snapshot_path = getenv("HAL_SNAPSHOT_PATH")
     config = {
         "api_key": getenv("PAPERSPACE_API_KEY"),
+        "incremental": snapshot_path is not None,
+        "snapshot_store": FileSnapshotStore({"path": snapshot_path})
+        if snapshot_path
+        else None,
         "exporters": [
             DatadogExporter(
                 {
@@ -29,6 +48,12 @@ def entrypoint(event, context):
             )
         ],
     }
-    probe = PaperspaceProbe(config)
-    probe.run()
+    accounts = getenv("PAPERSPACE_ACCOUNTS")
+    if accounts:
+        probe = MultiAccountProbe(
+            {**config, "probe": PaperspaceProbe, "accounts": json.loads(accounts)}
+        )
+    else:
+        probe = PaperspaceProbe(config)
+    probe.run(deadline)
     probe.export()
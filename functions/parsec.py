@@ -1,5 +1,6 @@
 from os import getenv
 
+from hal.deadline import Deadline
 from hal.probes.parsec import ParsecProbe
 from hal.exporters.datadog import DatadogExporter
 
@@ -12,11 +13,15 @@ def entrypoint(event, context):
       * `DD_HOSTNAME` (default `hal`): Hostname used for the Datadog metric.
       * `PARSEC_TAGS` (default `None`): Add tags to Datadog metrics.
       * `PARSEC_TOKEN`: Token extracted from a browser session.
+      * `HAL_DEADLINE` (default `None`): Time budget of the invocation in seconds. Set it below the
+        function timeout, so that partial results are exported (with the `partial:true` tag) if time runs out.
 
     Args:
          event (dict): Event payload.
          context (google.cloud.functions.Context): Metadata for the event.
     """
+    budget = getenv("HAL_DEADLINE")
+    deadline = Deadline(float(budget)) if budget else None
     config = {
         "session_id": getenv("PARSEC_TOKEN"),
         "exporters": [
@@ -30,5 +35,5 @@ def entrypoint(event, context):
         ],
     }
     probe = ParsecProbe(config)
-    probe.run()
+    probe.run(deadline)
     probe.export()
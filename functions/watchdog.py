@@ -1,5 +1,6 @@
 from os import getenv
 
+from hal.deadline import Deadline
 from hal.probes.watchdog import WatchdogProbe
 from hal.exporters.datadog import DatadogExporter
 
@@ -14,11 +15,15 @@ def entrypoint(event, context):
         `127.0.0.1|name:hal another-address|name:system`
       * `WATCHDOG_HOSTS` (default `[]`): List of hostnames or IP addresses to check.
       * `WATCHDOG_TAGS` (default `None`): Add tags to all Datadog metrics.
+      * `HAL_DEADLINE` (default `None`): Time budget of the invocation in seconds. Set it below the
+        function timeout, so that partial results are exported (with the `partial:true` tag) if time runs out.
 
     Args:
          event (dict): Event payload.
          context (google.cloud.functions.Context): Metadata for the event.
     """
+    budget = getenv("HAL_DEADLINE")
+    deadline = Deadline(float(budget)) if budget else None
     config = {
         # TODO: Such king of logic must be isolated in a settings system.
         # Check: https://github.com/palazzem/hal/issues/29
@@ -37,5 +42,5 @@ def entrypoint(event, context):
         ],
     }
     probe = WatchdogProbe(config)
-    probe.run()
+    probe.run(deadline)
     probe.export()
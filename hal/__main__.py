@@ -0,0 +1,220 @@
+"""HAL command line interface.
+
+Usage:
+    # Profile the ``paperspace`` definition of the configuration file
+    hal profile paperspace --config hal.json
+
+    # Profile a builtin probe with inline configuration, and write collapsed stacks
+    hal profile watchdog --set 'hosts=[["127.0.0.1", "home"]]' --collapsed stacks.txt
+
+    # Run all definitions every 60 seconds, reloading them when the file changes
+    hal run --config hal.json --interval 60
+
+    # Expose probe stats on http://127.0.0.1:8126/stats
+    hal run --config hal.json --health-port 8126
+"""
+import sys
+import json
+import asyncio
+import logging
+import argparse
+
+from os import getenv
+
+from . import config
+from .health import HealthServer
+from .reload import ConfigWatcher
+from .runner import Runner, _close_exporters
+from .profiling import Profiler
+from .probes.base import AsyncBaseProbe
+
+
+def _definition(args):
+    if args.config:
+        definitions = config.load(args.config)
+        if args.probe not in definitions:
+            raise config.ConfigError(
+                "definition '{}' not found in '{}'".format(args.probe, args.config)
+            )
+        definition = definitions[args.probe]
+    else:
+        definition = {"probe": args.probe}
+
+    overrides = {}
+    for item in args.set:
+        key, _, value = item.partition("=")
+        try:
+            overrides[key] = json.loads(value)
+        except ValueError:
+            overrides[key] = value
+    definition = {
+        **definition,
+        "config": {**(definition.get("config") or {}), **overrides},
+    }
+    if args.no_export:
+        definition["exporters"] = []
+    return definition
+
+
+def _execute(probe, export):
+    if isinstance(probe, AsyncBaseProbe):
+        asyncio.run(probe.run())
+        if export:
+            asyncio.run(probe.export())
+    else:
+        probe.run()
+        if export:
+            probe.export()
+    if export:
+        # Buffered exporters write from a background thread or at exit: close
+        # them, so that encoding and writing are part of the profile
+        _close_exporters(probe)
+
+
+def profile(args):
+    """Runs a probe and its exporters under the profiler, and prints hotspots,
+    allocation sites and optionally writes collapsed stacks.
+    """
+    try:
+        probe = config.build(_definition(args))
+    except config.ConfigError as e:
+        print("hal: {}".format(e), file=sys.stderr)
+        return 2
+
+    with Profiler(interval=args.interval or None) as profiler:
+        for _ in range(args.runs):
+            _execute(probe, not args.no_export)
+
+    print("# Hotspots (sorted by {})".format(args.sort))
+    print(profiler.hotspots(args.sort, args.limit))
+    print("# Top allocation sites")
+    print(profiler.allocations(args.allocations))
+    if args.collapsed:
+        with open(args.collapsed, "w") as f:
+            f.write(profiler.collapsed())
+        print("# Collapsed stacks written to '{}'".format(args.collapsed))
+    return 0
+
+
+async def _serve(runner, watcher, args):
+    server = None
+    if args.health_port or args.health_socket:
+        server = HealthServer(
+            runner, {"port": args.health_port, "path": args.health_socket}
+        )
+        await server.start()
+
+    tasks = [runner.serve(args.interval)]
+    if args.reload:
+        tasks.append(watcher.watch())
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        if server is not None:
+            await server.stop()
+
+
+def run(args):
+    """Runs all definitions of the configuration file, reloading them when the file
+    changes.
+    """
+    if not args.config:
+        print("hal: a configuration file is required (--config)", file=sys.stderr)
+        return 2
+
+    runner = Runner(processes=args.processes, deadline=args.deadline)
+    watcher = ConfigWatcher(args.config, runner, args.reload)
+    try:
+        watcher.reload()
+    except config.ConfigError as e:
+        print("hal: {}".format(e), file=sys.stderr)
+        return 2
+
+    try:
+        asyncio.run(_serve(runner, watcher, args))
+    finally:
+        runner.close()
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="hal")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    parser_profile = commands.add_parser(
+        "profile", help="run a probe and its exporters under the profiler"
+    )
+    parser_profile.add_argument(
+        "probe", help="definition name, builtin probe name or dotted path"
+    )
+    parser_profile.add_argument(
+        "--config",
+        default=getenv("HAL_CONFIG"),
+        help="JSON file with probe definitions (default: $HAL_CONFIG)",
+    )
+    parser_profile.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="override a probe config key; VALUE is decoded as JSON if possible",
+    )
+    parser_profile.add_argument("--runs", type=int, default=1)
+    parser_profile.add_argument(
+        "--no-export", action="store_true", help="profile the probe run only"
+    )
+    parser_profile.add_argument(
+        "--sort", default="cumulative", help="pstats sort key (default: cumulative)"
+    )
+    parser_profile.add_argument("--limit", type=int, default=25)
+    parser_profile.add_argument("--allocations", type=int, default=10)
+    parser_profile.add_argument(
+        "--interval",
+        type=float,
+        default=0.005,
+        help="sampling interval in seconds; 0 disables sampling",
+    )
+    parser_profile.add_argument(
+        "--collapsed", help="write sampled stacks in the collapsed format"
+    )
+    parser_profile.set_defaults(func=profile)
+
+    parser_run = commands.add_parser(
+        "run", help="run all probe definitions of the configuration file"
+    )
+    parser_run.add_argument(
+        "--config",
+        default=getenv("HAL_CONFIG"),
+        help="JSON file with probe definitions (default: $HAL_CONFIG)",
+    )
+    parser_run.add_argument(
+        "--interval", type=float, default=60, help="seconds between runs"
+    )
+    parser_run.add_argument(
+        "--reload",
+        type=float,
+        default=1.0,
+        help="seconds between configuration file checks; 0 disables reloads",
+    )
+    parser_run.add_argument(
+        "--deadline", type=float, help="time budget of each run in seconds"
+    )
+    parser_run.add_argument(
+        "--processes", type=int, help="worker processes for isolated probes"
+    )
+    parser_run.add_argument(
+        "--health-port", type=int, help="serve probe stats on this local TCP port"
+    )
+    parser_run.add_argument(
+        "--health-socket", help="serve probe stats on this Unix socket"
+    )
+    parser_run.set_defaults(func=run)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=getenv("HAL_LOG_LEVEL", "WARNING"))
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
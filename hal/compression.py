@@ -0,0 +1,94 @@
+"""Compression helpers shared by HTTP exporters and on-disk formats. ``gzip`` and
+``deflate`` are always available; ``zstd`` requires the optional ``zstandard`` package
+and falls back to ``gzip`` when it's not installed.
+"""
+import os
+import zlib
+import logging
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+
+log = logging.getLogger(__name__)
+
+ALGORITHMS = ("gzip", "deflate", "zstd")
+EXTENSIONS = {"gzip": ".gz", "deflate": ".zz", "zstd": ".zst"}
+CHUNK_SIZE = 256 * 1024
+
+
+def compress(body, algorithm="gzip", level=6, threshold=1024):
+    """Compresses the given body, unless it's smaller than ``threshold`` bytes, where
+    the CPU cost is not worth the saved bytes.
+
+    Args:
+        body: Bytes to compress.
+        algorithm: One of ``gzip``, ``deflate``, ``zstd``, or ``None`` to disable it.
+        level: Compression level.
+        threshold: Minimum body size in bytes.
+    Returns:
+        A tuple ``(body, encoding)`` where ``encoding`` is the value for the
+        ``Content-Encoding`` header, or ``None`` if the body is not compressed.
+    """
+    if not algorithm or len(body) < threshold:
+        return body, None
+
+    if algorithm == "zstd":
+        if zstandard is not None:
+            return zstandard.ZstdCompressor(level=level).compress(body), "zstd"
+        log.debug("zstandard is not installed; falling back to gzip")
+        algorithm = "gzip"
+
+    if algorithm == "gzip":
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return compressor.compress(body) + compressor.flush(), "gzip"
+    if algorithm == "deflate":
+        return zlib.compress(body, level), "deflate"
+    raise ValueError("unsupported compression '{}'".format(algorithm))
+
+
+def decompress(body, encoding):
+    """Decompresses a body compressed with ``compress()``."""
+    if encoding is None:
+        return body
+    if encoding == "gzip":
+        return zlib.decompress(body, 16 + zlib.MAX_WBITS)
+    if encoding == "deflate":
+        return zlib.decompress(body)
+    if encoding == "zstd" and zstandard is not None:
+        return zstandard.ZstdDecompressor().decompress(body)
+    raise ValueError("unsupported encoding '{}'".format(encoding))
+
+
+def compress_file(path, algorithm="gzip", level=6):
+    """Compresses a file in chunks, so that large files are never loaded in memory.
+    The compressed file is written next to the original with the algorithm extension
+    (e.g. ``.gz``), and the original file is removed only when it's complete.
+
+    Returns:
+        The path of the compressed file.
+    """
+    if algorithm == "zstd" and zstandard is None:
+        log.debug("zstandard is not installed; falling back to gzip")
+        algorithm = "gzip"
+
+    if algorithm == "zstd":
+        compressor = zstandard.ZstdCompressor(level=level).compressobj()
+    elif algorithm == "gzip":
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    elif algorithm == "deflate":
+        compressor = zlib.compressobj(level)
+    else:
+        raise ValueError("unsupported compression '{}'".format(algorithm))
+
+    target = path + EXTENSIONS[algorithm]
+    partial = target + ".partial"
+    with open(path, "rb") as src, open(partial, "wb") as dst:
+        for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+            dst.write(compressor.compress(chunk))
+        dst.write(compressor.flush())
+    os.replace(partial, target)
+    os.remove(path)
+    return target
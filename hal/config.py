@@ -0,0 +1,147 @@
+"""Builds probes from JSON definitions, so that probes and exporters can be configured
+without code changes. A definition has the following format:
+
+    {
+        "name": "paperspace",
+        "probe": "paperspace",
+        "config": {"api_key": "..."},
+        "exporters": [{"exporter": "datadog", "config": {"api_key": "..."}}],
+        "snapshot_store": {"store": "file", "config": {"path": "/var/lib/hal"}},
+        "membership": {"backend": "sqlite", "config": {"path": "/var/lib/hal/members.db"}}
+    }
+
+``probe``, ``exporter``, ``store`` and ``backend`` are either names of builtin classes
+(see ``PROBES``, ``EXPORTERS``, ``SNAPSHOT_STORES`` and ``MEMBERSHIPS``) or dotted paths such as
+``mypackage.probes.MyProbe``. Modules are imported only when used, so optional
+dependencies of unused probes are not required.
+"""
+import json
+import importlib
+
+
+PROBES = {
+    "elmo": "hal.probes.elmo.ElmoProbe",
+    "hass": "hal.probes.hass.HassProbe",
+    "knx": "hal.probes.knx.KNXProbe",
+    "multi": "hal.probes.multi.MultiAccountProbe",
+    "paperspace": "hal.probes.paperspace.PaperspaceProbe",
+    "paperspace-async": "hal.probes.paperspace.AsyncPaperspaceProbe",
+    "parsec": "hal.probes.parsec.ParsecProbe",
+    "parsec-async": "hal.probes.parsec.AsyncParsecProbe",
+    "recorder": "hal.probes.recorder.RecorderProbe",
+    "rest": "hal.probes.rest.RestProbe",
+    "rest-async": "hal.probes.rest.AsyncRestProbe",
+    "watchdog": "hal.probes.watchdog.WatchdogProbe",
+    "webhook": "hal.probes.webhook.WebhookProbe",
+}
+EXPORTERS = {
+    "datadog": "hal.exporters.datadog.DatadogExporter",
+    "file": "hal.exporters.file.FileExporter",
+    "guard": "hal.exporters.guard.CardinalityGuard",
+    "influx": "hal.exporters.influx.InfluxExporter",
+    "log": "hal.exporters.logger.LogExporter",
+    "otlp": "hal.exporters.otlp.OTLPExporter",
+}
+SNAPSHOT_STORES = {
+    "file": "hal.snapshots.file.FileSnapshotStore",
+}
+MEMBERSHIPS = {
+    "sqlite": "hal.sharding.sqlite.SQLiteMembership",
+}
+
+
+class ConfigError(Exception):
+    """Raised when a definition is not valid."""
+
+
+def load_class(name, registry):
+    """Returns the class registered with ``name``, or imported from a dotted path.
+
+    Raises:
+        ConfigError: If the class can't be found.
+    """
+    path = registry.get(name, name)
+    module, _, attribute = path.rpartition(".")
+    if not module:
+        raise ConfigError("unknown class '{}'".format(name))
+
+    try:
+        return getattr(importlib.import_module(module), attribute)
+    except (ImportError, AttributeError) as e:
+        raise ConfigError("unable to load '{}': {}".format(name, e))
+
+
+def build_exporter(definition):
+    """Builds an exporter from its definition. Exporters that wrap other exporters
+    (e.g. ``CardinalityGuard``) define them in the ``exporters`` config key.
+    """
+    config = dict(definition.get("config") or {})
+    if "exporters" in config:
+        config["exporters"] = [build_exporter(e) for e in config["exporters"]]
+    return load_class(definition["exporter"], EXPORTERS)(config)
+
+
+def build(definition):
+    """Builds a probe with its exporters from a definition.
+
+    Raises:
+        ConfigError: If the definition is not valid.
+    """
+    if not isinstance(definition, dict) or "probe" not in definition:
+        raise ConfigError("a definition requires the 'probe' key")
+
+    probe_class = load_class(definition["probe"], PROBES)
+    config = dict(definition.get("config") or {})
+    if isinstance(config.get("probe"), str):
+        # Probes wrapping other probes (e.g. ``MultiAccountProbe``)
+        config["probe"] = load_class(config["probe"], PROBES)
+
+    config["exporters"] = [
+        build_exporter(exporter) for exporter in definition.get("exporters", [])
+    ]
+
+    store = definition.get("snapshot_store")
+    if store:
+        config["snapshot_store"] = load_class(store["store"], SNAPSHOT_STORES)(
+            store.get("config")
+        )
+
+    membership = definition.get("membership")
+    if membership:
+        config["membership"] = load_class(membership["backend"], MEMBERSHIPS)(
+            membership.get("config")
+        )
+
+    try:
+        return probe_class(config)
+    except ValueError as e:
+        raise ConfigError("invalid '{}' config: {}".format(definition["probe"], e))
+
+
+def load(path):
+    """Loads definitions from a JSON file, that contains either a definition or a
+    list of definitions. Definitions without a ``name`` are named after the probe.
+
+    Returns:
+        A dictionary of definitions by name.
+    Raises:
+        ConfigError: If the file or a definition is not valid.
+    """
+    try:
+        with open(path) as f:
+            definitions = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ConfigError("unable to read '{}': {}".format(path, e))
+
+    if not isinstance(definitions, list):
+        definitions = [definitions]
+
+    named = {}
+    for definition in definitions:
+        if not isinstance(definition, dict) or "probe" not in definition:
+            raise ConfigError("a definition requires the 'probe' key")
+        name = definition.get("name", definition["probe"])
+        if name in named:
+            raise ConfigError("duplicated definition '{}'".format(name))
+        named[name] = definition
+    return named
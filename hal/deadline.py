@@ -0,0 +1,42 @@
+import time
+
+
+class DeadlineExceeded(Exception):
+    """Raised when the time budget of a probe run is exhausted."""
+
+
+class Deadline(object):
+    """Deadline is the time budget of a probe run, e.g. the timeout of a Cloud Function
+    invocation. Probes derive per-call timeouts from the remaining budget, so that a
+    slow upstream can't consume the whole invocation. ``reserve`` seconds are kept
+    aside to export partial results once the budget is used up.
+
+    Usage:
+        deadline = Deadline(50, reserve=5)
+        requests.get(url, timeout=deadline.timeout(10))
+    """
+
+    def __init__(self, seconds, reserve=0.0):
+        self.expires = time.monotonic() + seconds
+        self.reserve = reserve
+
+    def remaining(self):
+        """Returns the seconds left before the deadline, excluding the reserve."""
+        return max(0.0, self.expires - self.reserve - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def timeout(self, default=None):
+        """Returns the timeout for the next call: the remaining budget, capped by
+        ``default`` if set.
+
+        Raises:
+            DeadlineExceeded: If there is no budget left.
+        """
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded()
+        if default is not None:
+            return min(default, remaining)
+        return remaining
@@ -1,7 +1,15 @@
+from ..payload import Payload
+
+
 class BaseExporter(object):
     """BaseExporter defines the interface to send probe data to an external system.
     This class must be implemented by overriding the following methods:
       * ``send()``: defines what is sent to the external service.
+
+    Exporters that serialize data in a wire format should also implement ``encode()``
+    and ``cache_key()``, and use ``serialize()`` in ``send()``: when probe results
+    are exported as a ``Payload``, the encoded bytes are shared with every other
+    exporter with the same ``cache_key()``.
     """
 
     DEFAULTS = {}
@@ -20,3 +28,52 @@ class BaseExporter(object):
             NotImplementedError: This class is not supposed to be used directly.
         """
         raise NotImplementedError()
+
+    def encode(self, data, timestamp=None):
+        """Encodes probe data in the exporter wire format.
+
+        Args:
+            data: Probe data.
+            timestamp: Time used for data points without a timestamp.
+        Returns:
+            The encoded bytes.
+        """
+        raise NotImplementedError()
+
+    def cache_key(self):
+        """Returns a key that identifies the output of ``encode()``: exporters with
+        the same key must encode the same data in the same bytes. ``None`` disables
+        the cache.
+        """
+        return None
+
+    def stats(self):
+        """Returns runtime stats of the exporter, such as the size of its queue. Stats
+        are read without locks, so they may be slightly out of date.
+        """
+        return {}
+
+    def serialize(self, data):
+        """Encodes probe data, reusing the bytes cached in the ``Payload`` if another
+        exporter already encoded it in the same format.
+        """
+        key = self.cache_key()
+        if not isinstance(data, Payload) or key is None:
+            return self.encode(data)
+        return data.encoded(key, lambda: self.encode(data, data.timestamp))
+
+
+class AsyncBaseExporter(BaseExporter):
+    """AsyncBaseExporter defines the interface of exporters that are awaited by
+    ``AsyncBaseProbe`` instances. ``send()`` must be implemented as a coroutine.
+    """
+
+    async def send(self, data):
+        """Send must be implemented in the child class as a coroutine.
+
+        Args:
+            data: Probe data that should be sent to an external system.
+        Raises:
+            NotImplementedError: This class is not supposed to be used directly.
+        """
+        raise NotImplementedError()
@@ -0,0 +1,115 @@
+import atexit
+import logging
+import threading
+
+from .http import HTTPExporter
+
+
+log = logging.getLogger(__name__)
+
+
+def count_points(data):
+    """Returns the number of data points in probe results, counting each point of
+    timestamped lists.
+    """
+    count = 0
+    for values in data.values():
+        if not isinstance(values, list):
+            values = [values]
+        for value in values:
+            if isinstance(value, tuple):
+                value = value[0]
+            count += len(value) if isinstance(value, list) else 1
+    return count
+
+
+class BatchExporter(HTTPExporter):
+    """BatchExporter is the base class for HTTP exporters that buffer data from many
+    ``send()`` calls (i.e. from every probe sharing the exporter) and ship it with a
+    single request. Encoded data is buffered and written when ``batch_size`` data points
+    are buffered, or every ``flush_interval`` seconds by a background thread. Buffered
+    data is written when the interpreter exits.
+
+    Child classes must implement ``encode()`` and ``write(chunks)``, that receives the
+    list of encoded bodies of the batch.
+    """
+
+    DEFAULTS = {
+        **HTTPExporter.DEFAULTS,
+        "batch_size": 5000,
+        "flush_interval": 10.0,
+    }
+
+    def __init__(self, config=None):
+        super().__init__(config)
+        self._lock = threading.Lock()
+        self._chunks = []
+        self._points = 0
+        self._flusher = None
+        self._closed = threading.Event()
+
+    def write(self, chunks):
+        """Write must be implemented in the child class to send a batch.
+
+        Args:
+            chunks: List of bodies returned by ``encode()``.
+        Raises:
+            NotImplementedError: This class is not supposed to be used directly.
+        """
+        raise NotImplementedError()
+
+    def send(self, data):
+        body = self.serialize(data)
+        with self._lock:
+            self._chunks.append(body)
+            self._points += count_points(data)
+            chunks = self._take() if self._points >= self.config["batch_size"] else None
+        if chunks:
+            self.write(chunks)
+        self._start()
+
+    def stats(self):
+        return {"queued_points": self._points, "queued_chunks": len(self._chunks)}
+
+    def flush(self):
+        """Writes buffered data."""
+        with self._lock:
+            chunks = self._take()
+        if chunks:
+            self.write(chunks)
+
+    def close(self):
+        """Stops the background thread and writes buffered data."""
+        self._closed.set()
+        # Closed exporters (e.g. of reloaded probes) must not be kept alive until exit
+        atexit.unregister(self.close)
+        self.flush()
+
+    def _take(self):
+        """Returns buffered chunks and resets the buffer. The lock must be held by
+        the caller.
+        """
+        chunks = self._chunks
+        self._chunks = []
+        self._points = 0
+        return chunks
+
+    def _start(self):
+        if self._flusher is not None or not self.config["flush_interval"]:
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(
+                    target=self._flush_periodically,
+                    name="hal-{}-flusher".format(type(self).__name__.lower()),
+                    daemon=True,
+                )
+                self._flusher.start()
+                atexit.register(self.close)
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.config["flush_interval"]):
+            try:
+                self.flush()
+            except Exception:
+                log.exception("%s: unable to write a batch", type(self).__name__)
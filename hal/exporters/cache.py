@@ -0,0 +1,29 @@
+class BoundedCache(object):
+    """BoundedCache keeps the encoded form of keys that repeat in every data point,
+    such as metric names and tag sets, so that exporters encode them once. The cache
+    is reset when it grows over ``size`` entries, to keep memory bounded with
+    high-cardinality tags.
+
+    Usage:
+        names = BoundedCache(lambda metric: metric.encode())
+        names.get("hal.metric")  # b"hal.metric"
+    """
+
+    def __init__(self, encode, size=10000):
+        self.encode = encode
+        self.size = size
+        self._values = {}
+
+    def __len__(self):
+        return len(self._values)
+
+    def get(self, key):
+        """Returns the encoded ``key``, encoding it if it's not cached. ``key`` must
+        be hashable (e.g. tags as a tuple).
+        """
+        value = self._values.get(key)
+        if value is None:
+            if len(self._values) >= self.size:
+                self._values = {}
+            value = self._values[key] = self.encode(key)
+        return value
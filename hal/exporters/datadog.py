@@ -1,13 +1,16 @@
+import json
+import time
 import datadog
 import logging
+import requests
 
-from .base import BaseExporter
+from .http import HTTPExporter
 
 
 log = logging.getLogger(__name__)
 
 
-class DatadogExporter(BaseExporter):
+class DatadogExporter(HTTPExporter):
     """DatadogExporter sends data to Datadog API. Every kwarg in the results dictionary
     is used as a metric name, so the naming of your keys is important. As example, if
     the result dictionary is ``{"hal.metric": 42}`` the exporter sends a metric
@@ -17,9 +20,20 @@ class DatadogExporter(BaseExporter):
     ``{"hal.metric": (42, ["tag_1"])}``. In that case, the metric ``hal.metric`` has
     ``42`` as data point and ``tag_1`` as tag. In case ``tags`` in the exporter configuration
     is set, the lists are merged.
+
+    By default, each data point is sent with a request through the ``datadog`` client.
+    When ``batch`` is enabled, all data points are sent with a single request to the
+    series API, compressed according to ``HTTPExporter`` settings.
     """
 
-    DEFAULTS = {"api_key": None, "hostname": None, "tags": None}
+    DEFAULTS = {
+        **HTTPExporter.DEFAULTS,
+        "api_key": None,
+        "hostname": None,
+        "tags": None,
+        "batch": False,
+        "url": "https://api.datadoghq.com/api/v1/series",
+    }
 
     def __init__(self, config=None):
         super().__init__(config)
@@ -39,6 +53,10 @@ class DatadogExporter(BaseExporter):
             log.error("DatadogExporter: 'tags' must be a list of strings.")
             return
 
+        if self.config["batch"]:
+            self._send_series(self.serialize(data))
+            return
+
         for k, v in data.items():
             # Convert the metric data points in a list of metrics
             # to allow sending multiple metrics with the same name
@@ -63,3 +81,58 @@ class DatadogExporter(BaseExporter):
                     )
                 else:
                     log.info("DatadogExporter: metric '%s' sent correctly", k)
+
+    def encode(self, data, timestamp=None):
+        """Encodes probe data as a series API payload.
+
+        Returns:
+            The JSON payload as bytes.
+        """
+        timestamp = int(timestamp or time.time())
+        series = []
+        for k, v in data.items():
+            if not isinstance(v, list):
+                v = [v]
+
+            for metric in v:
+                if isinstance(metric, tuple):
+                    points = metric[0]
+                    tags = (self.config["tags"] or []) + metric[1]
+                else:
+                    points = metric
+                    tags = self.config["tags"] or []
+
+                if not isinstance(points, list):
+                    points = [(timestamp, points)]
+                series.append(
+                    {
+                        "metric": k,
+                        "points": points,
+                        "tags": tags,
+                        "host": self.config["hostname"],
+                        "type": "gauge",
+                    }
+                )
+        return json.dumps({"series": series}, separators=(",", ":")).encode()
+
+    def cache_key(self):
+        return ("datadog", self.config["hostname"], tuple(self.config["tags"] or []))
+
+    def _send_series(self, body):
+        headers = {
+            "Content-Type": "application/json",
+            "DD-API-KEY": self.config["api_key"],
+        }
+        try:
+            response = self.post(self.config["url"], body, headers)
+        except requests.RequestException as e:
+            log.error("DatadogExporter: unable to send metrics: %s", e)
+            return
+
+        if response.status_code >= 300:
+            log.error(
+                "DatadogExporter: unable to send metrics. Server response was '%s'",
+                response.text,
+            )
+        else:
+            log.info("DatadogExporter: metrics sent correctly")
@@ -0,0 +1,254 @@
+import os
+import glob
+import json
+import time
+import atexit
+import logging
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+from .base import BaseExporter
+from .cache import BoundedCache
+from ..compression import compress_file
+
+
+log = logging.getLogger(__name__)
+
+
+def _number(value):
+    if type(value) is int:
+        return str(value)
+    if type(value) is float:
+        return repr(value)
+    return json.dumps(value)
+
+
+def _metric(metric):
+    return ',"metric":{},"value":'.format(json.dumps(metric))
+
+
+def _tags(tags):
+    return ',"tags":{}}}\n'.format(json.dumps(list(tags), separators=(",", ":")))
+
+
+class FileExporter(BaseExporter):
+    """FileExporter writes data points to a local file in the JSON-lines format, with
+    one compact line per data point:
+
+        {"timestamp":1600000000,"metric":"hal.metric","value":42,"tags":["tag_1"]}
+
+    It's the same point format accepted by ``WebhookProbe``, so files can be replayed.
+    Lines are kept in a write buffer of ``buffer_size`` bytes, that is written when
+    full or every ``flush_interval`` seconds by a background thread, so that a ``send()``
+    doesn't hit the disk. The file is rotated when it's larger than ``max_size`` bytes
+    or older than ``rotate_interval`` seconds; rotated files are renamed with the
+    rotation time as suffix (e.g. ``hal.jsonl.20200913T122640.000123``) and compressed in
+    background if ``compression`` is set. When ``backups`` is set, only that number of
+    rotated files is kept.
+    """
+
+    DEFAULTS = {
+        "path": None,
+        "buffer_size": 1024 * 1024,
+        "flush_interval": 1.0,
+        "max_size": 64 * 1024 * 1024,
+        "rotate_interval": None,
+        "backups": None,
+        "compression": "gzip",
+        "compression_level": 6,
+        "tags": None,
+    }
+
+    def __init__(self, config=None):
+        super().__init__(config)
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._buffered = 0
+        self._file = None
+        self._size = 0
+        self._opened_at = None
+        self._metrics = BoundedCache(_metric)
+        self._tags = BoundedCache(_tags)
+        self._flusher = None
+        self._closed = threading.Event()
+        self._compressor = None
+
+    def encode(self, data, timestamp=None):
+        """Encodes probe data as JSON lines.
+
+        Returns:
+            The lines as bytes.
+        """
+        now = _number(timestamp or time.time())
+        config_tags = self.config["tags"] or []
+        lines = []
+        for metric, values in data.items():
+            if not isinstance(values, list):
+                values = [values]
+            prefix = self._metrics.get(metric)
+
+            for value in values:
+                if isinstance(value, tuple):
+                    value, tags = value
+                    suffix = self._tags.get(tuple(config_tags + tags))
+                else:
+                    suffix = self._tags.get(tuple(config_tags))
+
+                if isinstance(value, list):
+                    # Timestamped data points
+                    for ts, point in value:
+                        lines.append(
+                            '{"timestamp":'
+                            + _number(ts)
+                            + prefix
+                            + _number(point)
+                            + suffix
+                        )
+                else:
+                    lines.append(
+                        '{"timestamp":' + now + prefix + _number(value) + suffix
+                    )
+        return "".join(lines).encode()
+
+    def cache_key(self):
+        return ("jsonl", tuple(self.config["tags"] or []))
+
+    def send(self, data):
+        if not self.config["path"]:
+            log.error("FileExporter: path is not configured.")
+            return
+
+        body = self.serialize(data)
+        with self._lock:
+            self._buffer.append(body)
+            self._buffered += len(body)
+            if self._buffered >= self.config["buffer_size"]:
+                self._write()
+        self._start()
+
+    def stats(self):
+        return {"buffered_bytes": self._buffered, "file_size": self._size}
+
+    def flush(self):
+        """Writes buffered lines to the file."""
+        with self._lock:
+            self._write()
+
+    def close(self):
+        """Flushes buffered lines, closes the file and waits for pending compressions."""
+        self._closed.set()
+        # Closed exporters (e.g. of reloaded probes) must not be kept alive until exit
+        atexit.unregister(self.close)
+        with self._lock:
+            self._write()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        if self._compressor is not None:
+            self._compressor.shutdown(wait=True)
+            self._compressor = None
+
+    def _start(self):
+        if self._flusher is not None or not self.config["flush_interval"]:
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(
+                    target=self._flush_periodically,
+                    name="hal-file-flusher",
+                    daemon=True,
+                )
+                self._flusher.start()
+                atexit.register(self.close)
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.config["flush_interval"]):
+            try:
+                self.flush()
+            except OSError as e:
+                log.error(
+                    "FileExporter: unable to write '%s': %s", self.config["path"], e
+                )
+
+    def _write(self):
+        """Writes the buffer with a single call, rotating the file if needed. The
+        lock must be held by the caller.
+        """
+        if not self._buffer:
+            return
+
+        if self._file is None:
+            self._open()
+        elif self._size >= self.config["max_size"] or (
+            self.config["rotate_interval"]
+            and time.time() - self._opened_at >= self.config["rotate_interval"]
+        ):
+            self._rotate()
+
+        body = b"".join(self._buffer)
+        self._buffer = []
+        self._buffered = 0
+        self._file.write(body)
+        self._file.flush()
+        self._size += len(body)
+
+    def _open(self):
+        self._file = open(self.config["path"], "ab", buffering=0)
+        self._size = self._file.tell()
+        self._opened_at = time.time()
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        if self._size:
+            path = self.config["path"]
+            rotated = self._rotated_name(path)
+            os.replace(path, rotated)
+            log.debug("FileExporter: rotated '%s' to '%s'", path, rotated)
+
+            if self.config["compression"]:
+                if self._compressor is None:
+                    self._compressor = ThreadPoolExecutor(max_workers=1)
+                self._compressor.submit(self._compress, rotated)
+            else:
+                self._cleanup()
+        self._open()
+
+    def _rotated_name(self, path):
+        """Returns a name for the rotated file that sorts by rotation time."""
+        now = time.time()
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.localtime(now))
+        micros = int(now % 1 * 1000000)
+        while True:
+            rotated = "{}.{}.{:06d}".format(path, stamp, micros)
+            if not glob.glob(glob.escape(rotated) + "*"):
+                return rotated
+            micros += 1
+
+    def _compress(self, path):
+        try:
+            compress_file(
+                path, self.config["compression"], self.config["compression_level"]
+            )
+        except (OSError, ValueError) as e:
+            log.error("FileExporter: unable to compress '%s': %s", path, e)
+        self._cleanup()
+
+    def _cleanup(self):
+        """Removes rotated files exceeding the ``backups`` count, oldest first."""
+        if not self.config["backups"]:
+            return
+
+        path = self.config["path"]
+        rotated = sorted(
+            name
+            for name in glob.glob(glob.escape(path) + ".*")
+            if not name.endswith(".partial")
+        )
+        excess = len(rotated) - self.config["backups"]
+        for name in rotated[:excess] if excess > 0 else []:
+            try:
+                os.remove(name)
+            except OSError as e:
+                log.warning("FileExporter: unable to remove '%s': %s", name, e)
@@ -0,0 +1,134 @@
+import time
+import logging
+
+from .base import BaseExporter
+from ..metrics import iter_metrics
+from ..payload import Payload
+from ..sketches import HyperLogLog, SpaceSaving
+
+
+log = logging.getLogger(__name__)
+
+
+class CardinalityGuard(BaseExporter):
+    """CardinalityGuard sits in front of other exporters and bounds the number of
+    series (distinct tag sets) sent for each metric, so that tags scaling with the
+    fleet (e.g. ``machine_id:``) don't grow the downstream cost without limits.
+
+    Distinct series of each metric are estimated with a ``HyperLogLog`` sketch over a
+    ``window`` of seconds. Below the ``budget``, data is forwarded as is. Above it,
+    only the top ``budget - 1`` series are kept, ranked by value or by activity
+    (``rank``: ``value`` or ``activity``) with a ``SpaceSaving`` counter of
+    ``capacity`` entries; the remaining series are folded in a single series where
+    guarded tags are replaced by ``<tag>:other`` and values are summed (timestamped
+    points are concatenated). ``tags`` lists the tag names that are folded; by
+    default all tags are.
+
+    Usage:
+        guard = CardinalityGuard({"budget": 50, "exporters": [DatadogExporter(config)]})
+        probe = PaperspaceProbe({"exporters": [guard]})
+    """
+
+    DEFAULTS = {
+        "exporters": [],
+        "budget": 100,
+        "capacity": None,
+        "rank": "value",
+        "tags": None,
+        "window": 3600,
+        "precision": 12,
+    }
+
+    def __init__(self, config=None):
+        super().__init__(config)
+        self.series = {}
+        self.heavy = {}
+        self.window_start = None
+
+    def _weight(self, value):
+        if self.config["rank"] == "activity":
+            return 1
+        if isinstance(value, list):
+            return sum(abs(point[1]) for point in value)
+        return abs(value)
+
+    def _fold(self, tags):
+        folded = []
+        for tag in tags:
+            name = tag.split(":", 1)[0]
+            if self.config["tags"] is None or name in self.config["tags"]:
+                tag = "{}:other".format(name)
+            folded.append(tag)
+        return tuple(folded)
+
+    def guard(self, data):
+        """Returns probe data with series over the budget folded.
+
+        Returns:
+            A new results dictionary.
+        """
+        now = time.time()
+        if (
+            self.window_start is None
+            or now - self.window_start >= self.config["window"]
+        ):
+            self.series = {}
+            self.heavy = {}
+            self.window_start = now
+
+        budget = self.config["budget"]
+        capacity = self.config["capacity"] or 4 * budget
+        results = {}
+        for metric, values in data.items():
+            points = [
+                (value, tags, "\n".join(tags))
+                for _, value, tags in iter_metrics({metric: values})
+            ]
+            series = self.series.get(metric)
+            if series is None:
+                series = self.series[metric] = HyperLogLog(self.config["precision"])
+                self.heavy[metric] = SpaceSaving(capacity)
+            heavy = self.heavy[metric]
+            for value, tags, key in points:
+                series.add(key)
+                heavy.add(key, self._weight(value))
+
+            if series.count() <= budget:
+                results[metric] = values
+                continue
+
+            keep = set(heavy.top(budget - 1))
+            kept, folded = [], {}
+            for value, tags, key in points:
+                if key in keep:
+                    kept.append((value, tags))
+                    continue
+                other = self._fold(tags)
+                if isinstance(value, list):
+                    folded.setdefault(other, []).extend(value)
+                else:
+                    folded[other] = folded.get(other, 0) + value
+
+            log.debug(
+                "CardinalityGuard: '%s' over budget, %d series folded",
+                metric,
+                len(points) - len(kept),
+            )
+            results[metric] = kept + [
+                (value, list(tags)) for tags, value in folded.items()
+            ]
+        return results
+
+    def stats(self):
+        return {
+            "metrics": len(self.series),
+            "exporters": [
+                {"exporter": type(exporter).__name__, **exporter.stats()}
+                for exporter in self.config["exporters"]
+            ],
+        }
+
+    def send(self, data):
+        payload = Payload(self.guard(data), getattr(data, "timestamp", None))
+        for exporter in self.config["exporters"]:
+            exporter.send(payload)
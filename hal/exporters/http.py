@@ -0,0 +1,53 @@
+import logging
+
+from .base import BaseExporter
+from ..compression import compress
+from ..http import session_for
+
+
+log = logging.getLogger(__name__)
+
+
+class HTTPExporter(BaseExporter):
+    """HTTPExporter is the base class for exporters that send data with HTTP requests.
+    It shares pooled connections per base URL and the compression settings:
+      * ``compression``: ``gzip`` (default), ``deflate``, ``zstd`` or ``None``.
+      * ``compression_level``: compression level.
+      * ``compression_threshold``: bodies smaller than this size (bytes) are sent as is.
+
+    Child classes must extend ``HTTPExporter.DEFAULTS`` in their own ``DEFAULTS``.
+    """
+
+    DEFAULTS = {
+        "compression": "gzip",
+        "compression_level": 6,
+        "compression_threshold": 1024,
+        "timeout": 10,
+    }
+
+    def compress(self, body):
+        """Compresses the body according to the exporter settings.
+
+        Returns:
+            A tuple ``(body, encoding)``.
+        """
+        return compress(
+            body,
+            self.config["compression"],
+            self.config["compression_level"],
+            self.config["compression_threshold"],
+        )
+
+    def post(self, url, body, headers=None):
+        """Sends the body with a POST request, compressing it if needed.
+
+        Returns:
+            The ``requests.Response``.
+        """
+        headers = dict(headers or {})
+        body, encoding = self.compress(body)
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        return session_for(url).post(
+            url, data=body, headers=headers, timeout=self.config["timeout"]
+        )
@@ -0,0 +1,182 @@
+import time
+import logging
+import requests
+
+from urllib.parse import urlencode
+
+from .batch import BatchExporter
+from .cache import BoundedCache
+
+
+log = logging.getLogger(__name__)
+
+MEASUREMENT_ESCAPES = str.maketrans({",": "\\,", " ": "\\ ", "\\": "\\\\"})
+TAG_ESCAPES = str.maketrans({",": "\\,", "=": "\\=", " ": "\\ ", "\\": "\\\\"})
+
+
+def _field(value):
+    """Returns the line protocol field value, or ``None`` if it can't be written."""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return "{}i".format(value)
+    if isinstance(value, float):
+        return repr(value)
+    if isinstance(value, str):
+        return '"{}"'.format(value.replace("\\", "\\\\").replace('"', '\\"'))
+    return None
+
+
+def _measurement(metric):
+    return metric.translate(MEASUREMENT_ESCAPES)
+
+
+def _tags(tags):
+    pairs = {}
+    for tag in tags:
+        name, separator, value = tag.partition(":")
+        if name:
+            pairs[name] = value if separator and value else "true"
+    # Tags sorted by key are parsed faster by InfluxDB
+    return "".join(
+        ",{}={}".format(name.translate(TAG_ESCAPES), value.translate(TAG_ESCAPES))
+        for name, value in sorted(pairs.items())
+    )
+
+
+class InfluxExporter(BatchExporter):
+    """InfluxExporter writes data to an InfluxDB-compatible endpoint with the line
+    protocol. Each metric is a measurement with a single ``value`` field, and each
+    tag becomes an InfluxDB tag: ``key:value`` tags are split on the first colon,
+    while tags without a value are written as ``tag=true``. ``tags`` in the exporter
+    configuration are attached to every data point. Escaped tag sets are cached, so
+    escaping is done once per series.
+
+    Data is batched across probes according to ``BatchExporter`` settings, compressed
+    according to ``HTTPExporter`` settings and sent over a pooled connection. ``params``
+    are added to the write URL (e.g. ``db`` for InfluxDB 1.x, or ``org`` and ``bucket``
+    for 2.x), and ``token`` is sent in the ``Authorization`` header.
+
+    Writes failing with a server error are retried ``retries`` times with exponential
+    ``backoff`` (seconds). When the server rejects a batch (partial write, or request
+    too large), the batch is split in halves that are written again, so that only
+    rejected points are dropped.
+
+    Usage:
+        exporter = InfluxExporter({"params": {"db": "hal"}})
+        probe = PaperspaceProbe({"exporters": [exporter]})
+    """
+
+    DEFAULTS = {
+        **BatchExporter.DEFAULTS,
+        "url": "http://localhost:8086/write",
+        "params": None,
+        "token": None,
+        "tags": None,
+        "retries": 3,
+        "backoff": 0.5,
+    }
+
+    def __init__(self, config=None):
+        super().__init__(config)
+        self._metrics = BoundedCache(_measurement)
+        self._tags = BoundedCache(_tags)
+        params = self.config["params"]
+        self.url = self.config["url"]
+        if params:
+            self.url += "?" + urlencode(params)
+
+    def encode(self, data, timestamp=None):
+        """Encodes probe data as line protocol with nanoseconds precision.
+
+        Returns:
+            The lines as bytes.
+        """
+        now = int((timestamp or time.time()) * 1e9)
+        config_tags = self.config["tags"] or []
+        lines = []
+        for metric, values in data.items():
+            if not isinstance(values, list):
+                values = [values]
+            measurement = self._metrics.get(metric)
+
+            for value in values:
+                if isinstance(value, tuple):
+                    value, tags = value
+                    prefix = (
+                        measurement
+                        + self._tags.get(tuple(config_tags + tags))
+                        + " value="
+                    )
+                else:
+                    prefix = (
+                        measurement + self._tags.get(tuple(config_tags)) + " value="
+                    )
+
+                if not isinstance(value, list):
+                    # Data point without timestamp
+                    value = [(None, value)]
+                for ts, point in value:
+                    field = _field(point)
+                    if field is None:
+                        log.warning(
+                            "InfluxExporter: skipping '%s', value '%s' can't be written",
+                            metric,
+                            point,
+                        )
+                        continue
+                    ts = now if ts is None else int(ts * 1e9)
+                    lines.append("{}{} {}\n".format(prefix, field, ts))
+        return "".join(lines).encode()
+
+    def cache_key(self):
+        return ("influx", tuple(self.config["tags"] or []))
+
+    def write(self, chunks):
+        self._write(b"".join(chunks))
+
+    def _write(self, body):
+        headers = {"Content-Type": "text/plain; charset=utf-8"}
+        if self.config["token"]:
+            headers["Authorization"] = "Token {}".format(self.config["token"])
+
+        retries = self.config["retries"]
+        for attempt in range(retries + 1):
+            try:
+                response = self.post(self.url, body, headers)
+            except requests.RequestException as e:
+                error = str(e)
+            else:
+                if response.status_code < 300:
+                    log.info("InfluxExporter: points written correctly")
+                    return
+                if response.status_code in (400, 413):
+                    self._split(body, response.text)
+                    return
+                error = response.text
+                if response.status_code != 429 and response.status_code < 500:
+                    break
+
+            if attempt < retries:
+                time.sleep(self.config["backoff"] * 2**attempt)
+
+        log.error(
+            "InfluxExporter: unable to write %d points. Server response was '%s'",
+            body.count(b"\n"),
+            error,
+        )
+
+    def _split(self, body, error):
+        """Writes again the halves of a rejected batch, dropping single rejected points."""
+        lines = body.splitlines(keepends=True)
+        if len(lines) == 1:
+            log.warning(
+                "InfluxExporter: point '%s' rejected. Server response was '%s'",
+                body.decode().rstrip(),
+                error,
+            )
+            return
+
+        half = len(lines) // 2
+        self._write(b"".join(lines[:half]))
+        self._write(b"".join(lines[half:]))
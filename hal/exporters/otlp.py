@@ -0,0 +1,176 @@
+import time
+import struct
+import logging
+import requests
+
+from .batch import BatchExporter
+from .cache import BoundedCache
+
+
+log = logging.getLogger(__name__)
+
+# Protobuf wire types
+VARINT = 0
+FIXED64 = 1
+LENGTH_DELIMITED = 2
+
+
+def _varint(value):
+    encoded = bytearray()
+    while value > 0x7F:
+        encoded.append((value & 0x7F) | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+
+def _key(field, wire_type):
+    return _varint(field << 3 | wire_type)
+
+
+def _message(field, body):
+    """Encodes a length-delimited field (messages, strings and bytes)."""
+    return _key(field, LENGTH_DELIMITED) + _varint(len(body)) + body
+
+
+def _string(field, value):
+    return _message(field, value.encode())
+
+
+def _attribute(field, key, value):
+    """Encodes a ``KeyValue`` field with a string or a boolean ``AnyValue``."""
+    if value is True:
+        any_value = _key(2, VARINT) + b"\x01"
+    else:
+        any_value = _string(1, str(value))
+    return _message(field, _string(1, key) + _message(2, any_value))
+
+
+def _point(timestamp, value, attributes):
+    """Encodes a ``NumberDataPoint`` message, or ``None`` if the value is not a number."""
+    if isinstance(value, int):
+        number = _key(6, FIXED64) + struct.pack("<q", value)
+    elif isinstance(value, float):
+        number = _key(4, FIXED64) + struct.pack("<d", value)
+    else:
+        return None
+    time_unix_nano = _key(3, FIXED64) + struct.pack("<Q", int(timestamp * 1e9))
+    return attributes + time_unix_nano + number
+
+
+def _name(metric):
+    return _string(1, metric)
+
+
+def _attributes(tags):
+    attributes = []
+    for tag in tags:
+        name, separator, value = tag.partition(":")
+        # ``NumberDataPoint.attributes`` is the field 7
+        attributes.append(_attribute(7, name, value if separator else True))
+    return b"".join(attributes)
+
+
+class OTLPExporter(BatchExporter):
+    """OTLPExporter sends data to an OpenTelemetry collector with the OTLP/HTTP
+    protocol, encoded as protobuf. Each metric is sent as a gauge, and each data
+    point tag becomes an attribute: ``key:value`` tags are string attributes, while
+    tags without a value are ``true`` boolean attributes. ``tags`` in the exporter
+    configuration are attached to every data point.
+
+    Data is batched across probes according to ``BatchExporter`` settings, compressed
+    according to ``HTTPExporter`` settings and sent over a pooled connection. The
+    ``resource`` dictionary defines resource attributes, and ``headers`` are added
+    to each request (e.g. for authentication).
+
+    Usage:
+        exporter = OTLPExporter({"url": "http://collector:4318/v1/metrics"})
+        probe = PaperspaceProbe({"exporters": [exporter]})
+    """
+
+    DEFAULTS = {
+        **BatchExporter.DEFAULTS,
+        "url": "http://localhost:4318/v1/metrics",
+        "headers": None,
+        "resource": {"service.name": "hal"},
+        "tags": None,
+    }
+
+    def __init__(self, config=None):
+        super().__init__(config)
+        self._names = BoundedCache(_name)
+        self._attributes = BoundedCache(_attributes)
+
+    def encode(self, data, timestamp=None):
+        """Encodes probe data as ``Metric`` messages of a ``ScopeMetrics`` message.
+
+        Returns:
+            The encoded messages as bytes.
+        """
+        timestamp = timestamp or time.time()
+        config_tags = self.config["tags"] or []
+        metrics = []
+        for metric, values in data.items():
+            if not isinstance(values, list):
+                values = [values]
+
+            points = []
+            for value in values:
+                if isinstance(value, tuple):
+                    value, tags = value
+                    attributes = self._attributes.get(tuple(config_tags + tags))
+                else:
+                    attributes = self._attributes.get(tuple(config_tags))
+
+                if not isinstance(value, list):
+                    # Data point without timestamp
+                    value = [(timestamp, value)]
+                for ts, number in value:
+                    point = _point(ts, number, attributes)
+                    if point is None:
+                        log.warning(
+                            "OTLPExporter: skipping '%s', value '%s' is not a number",
+                            metric,
+                            number,
+                        )
+                        continue
+                    points.append(_message(1, point))
+
+            if points:
+                gauge = _message(5, b"".join(points))
+                metrics.append(_message(2, self._names.get(metric) + gauge))
+        return b"".join(metrics)
+
+    def cache_key(self):
+        return ("otlp", tuple(self.config["tags"] or []))
+
+    def request(self, chunks):
+        """Wraps encoded metrics in an ``ExportMetricsServiceRequest`` message.
+
+        Returns:
+            The request body as bytes.
+        """
+        resource = b"".join(
+            _attribute(1, key, value)
+            for key, value in (self.config["resource"] or {}).items()
+        )
+        scope = _message(1, _string(1, "hal"))
+        scope_metrics = _message(2, scope + b"".join(chunks))
+        return _message(1, _message(1, resource) + scope_metrics)
+
+    def write(self, chunks):
+        headers = dict(self.config["headers"] or {})
+        headers["Content-Type"] = "application/x-protobuf"
+        try:
+            response = self.post(self.config["url"], self.request(chunks), headers)
+        except requests.RequestException as e:
+            log.error("OTLPExporter: unable to send metrics: %s", e)
+            return
+
+        if response.status_code >= 300:
+            log.error(
+                "OTLPExporter: unable to send metrics. Server response was '%s'",
+                response.text,
+            )
+        else:
+            log.info("OTLPExporter: metrics sent correctly")
@@ -0,0 +1,153 @@
+"""Runtime stats of a long-running HAL process, and a local HTTP endpoint to inspect
+them without parsing logs.
+
+Usage:
+    runner = Runner(probes)
+    server = HealthServer(runner, {"port": 8126})
+    await server.start()
+    await runner.serve(60)
+
+Endpoints:
+    GET /health     liveness: ``{"status": "ok", "probes": 2}``
+    GET /stats      stats of each probe, its exporters and shared HTTP caches
+"""
+import time
+import bisect
+import logging
+
+from aiohttp import web
+
+from . import http
+from .exporters.base import BaseExporter
+
+
+log = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the run duration histogram buckets
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, float("inf"))
+
+
+class ProbeStats(object):
+    """ProbeStats keeps counters of the runs of a probe. Counters are updated by the
+    ``Runner`` from the event loop thread only, so they don't need locks.
+    """
+
+    __slots__ = (
+        "name",
+        "runs",
+        "successes",
+        "partials",
+        "last_run",
+        "last_duration",
+        "last_status",
+        "durations",
+    )
+
+    def __init__(self, name):
+        self.name = name
+        self.runs = 0
+        self.successes = 0
+        self.partials = 0
+        self.last_run = None
+        self.last_duration = None
+        self.last_status = None
+        self.durations = [0] * len(DURATION_BUCKETS)
+
+    def record(self, started, duration, status, partial=False):
+        """Records a completed run.
+
+        Args:
+            started: Wall-clock time of the run start.
+            duration: Duration of the run and export in seconds.
+            status: ``True`` if the run succeeded.
+            partial: ``True`` if results were partial.
+        """
+        self.runs += 1
+        self.successes += 1 if status else 0
+        self.partials += 1 if partial else 0
+        self.last_run = started
+        self.last_duration = duration
+        self.last_status = bool(status)
+        self.durations[bisect.bisect_left(DURATION_BUCKETS, duration)] += 1
+
+    def report(self):
+        """Returns the counters as a JSON serializable dictionary."""
+        return {
+            "name": self.name,
+            "runs": self.runs,
+            "successes": self.successes,
+            "failures": self.runs - self.successes,
+            "partials": self.partials,
+            "success_ratio": self.successes / self.runs if self.runs else None,
+            "last_run": self.last_run,
+            "last_duration": self.last_duration,
+            "last_status": self.last_status,
+            "durations": [
+                {"le": "+Inf" if bound == float("inf") else bound, "count": count}
+                for bound, count in zip(DURATION_BUCKETS, self.durations)
+            ],
+        }
+
+
+def _exporter(exporter):
+    stats = exporter.stats() if isinstance(exporter, BaseExporter) else {}
+    return {"exporter": type(exporter).__name__, **stats}
+
+
+def report(runner):
+    """Returns the stats of the probes registered in the runner."""
+    probes = []
+    for probe in runner.probes:
+        stats = runner.stats.get(probe) or ProbeStats(runner.name(probe))
+        probes.append(
+            {
+                **stats.report(),
+                "probe": type(probe).__name__,
+                "exporters": [_exporter(e) for e in probe.config["exporters"]],
+            }
+        )
+    return {"time": time.time(), "probes": probes, "http": http.stats()}
+
+
+class HealthServer(object):
+    """HealthServer exposes the stats of a ``Runner`` over HTTP, on a local TCP
+    ``host`` and ``port``, or on a Unix socket if ``path`` is set. The server runs in
+    the runner event loop, so reads don't contend with probes for locks.
+    """
+
+    DEFAULTS = {"host": "127.0.0.1", "port": 8126, "path": None}
+
+    def __init__(self, runner, config=None):
+        config = config or {}
+        self.config = {**self.DEFAULTS, **config}
+        self.runner = runner
+        self._app_runner = None
+
+    async def _health(self, request):
+        return web.json_response({"status": "ok", "probes": len(self.runner.probes)})
+
+    async def _stats(self, request):
+        return web.json_response(report(self.runner))
+
+    async def start(self):
+        """Starts serving requests in the running event loop."""
+        app = web.Application()
+        app.router.add_get("/health", self._health)
+        app.router.add_get("/stats", self._stats)
+        self._app_runner = web.AppRunner(app, access_log=None)
+        await self._app_runner.setup()
+
+        if self.config["path"]:
+            site = web.UnixSite(self._app_runner, self.config["path"])
+        else:
+            site = web.TCPSite(
+                self._app_runner, self.config["host"], self.config["port"]
+            )
+        await site.start()
+        log.info("HealthServer: listening on %s", site.name)
+
+    async def stop(self):
+        """Stops the server."""
+        if self._app_runner is not None:
+            await self._app_runner.cleanup()
+            self._app_runner = None
@@ -0,0 +1,118 @@
+import asyncio
+import aiohttp
+import hashlib
+import logging
+import requests
+import threading
+
+from urllib.parse import urlsplit
+
+from .deadline import DeadlineExceeded
+from .singleflight import AsyncSingleFlight, SingleFlight
+
+
+log = logging.getLogger(__name__)
+
+_sessions = {}
+_lock = threading.Lock()
+_flights = SingleFlight()
+_async_flights = AsyncSingleFlight()
+
+
+def session_for(url):
+    """Returns a ``requests.Session`` shared by all probes that call the same base URL
+    (scheme and host), so that pooled connections are reused across probe instances
+    and accounts running in the same process.
+
+    Args:
+        url: Any URL of the upstream service.
+    Returns:
+        The ``requests.Session`` for the given base URL.
+    """
+    parts = urlsplit(url)
+    key = "{}://{}".format(parts.scheme, parts.netloc)
+    session = _sessions.get(key)
+    if session is None:
+        with _lock:
+            session = _sessions.get(key)
+            if session is None:
+                log.debug("HTTP: new connection pool for '%s'", key)
+                session = _sessions[key] = requests.Session()
+    return session
+
+
+def stats():
+    """Returns the number of shared sessions, and of coalesced requests that are in
+    flight or cached.
+    """
+    return {
+        "sessions": len(_sessions),
+        "requests": len(_flights) + len(_async_flights),
+    }
+
+
+def request_key(method, url, params=None, headers=None):
+    """Returns the key that identifies identical requests. Headers are part of the
+    key because they carry credentials; the key is hashed so that secrets are not
+    kept in memory.
+    """
+    parts = [method, url]
+    parts.extend("{}={}".format(k, v) for k, v in sorted((params or {}).items()))
+    parts.extend(
+        "{}:{}".format(k.lower(), v) for k, v in sorted((headers or {}).items())
+    )
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+
+def get(url, headers=None, params=None, ttl=0, deadline=None):
+    """Sends a GET request through the shared session. Identical requests made
+    concurrently by different probes (e.g. the same account configured with different
+    tags or exporters) are coalesced in a single call, and the
+    ``requests.Response`` is shared by all callers. With a ``ttl`` (seconds), the
+    response is also reused by identical requests sent shortly after. With a
+    ``deadline``, the request timeout is the remaining budget; a caller that waits
+    for a coalesced request is bound by its own deadline, and the request is sent
+    again if the caller that sent it runs out of budget.
+
+    Returns:
+        The ``requests.Response``.
+    Raises:
+        DeadlineExceeded: If the deadline is used up before the response arrives.
+    """
+
+    def fetch():
+        timeout = deadline.timeout() if deadline is not None else None
+        try:
+            return session_for(url).get(
+                url, headers=headers, params=params, timeout=timeout
+            )
+        except requests.Timeout as e:
+            if deadline is None:
+                raise
+            raise DeadlineExceeded() from e
+
+    key = request_key("GET", url, params, headers)
+    return _flights.do(key, fetch, ttl, deadline)
+
+
+async def get_async(session, url, headers=None, params=None, ttl=0, deadline=None):
+    """Asynchronous variant of ``get()`` for ``aiohttp`` sessions.
+
+    Returns:
+        A tuple ``(status, text)``.
+    """
+
+    async def fetch():
+        kwargs = {"headers": headers, "params": params}
+        if deadline is not None:
+            kwargs["timeout"] = aiohttp.ClientTimeout(total=deadline.timeout())
+        try:
+            async with session.get(url, **kwargs) as response:
+                return response.status, await response.text()
+        except asyncio.TimeoutError as e:
+            if deadline is None:
+                raise
+            raise DeadlineExceeded() from e
+
+    key = request_key("GET", url, params, headers)
+    return await _async_flights.do(key, fetch, ttl, deadline)
@@ -0,0 +1,93 @@
+"""Compiles JSONPath-like expressions in accessors for decoded JSON documents. The
+supported subset covers what probes need to extract metrics from API responses:
+
+    $                   the root document
+    .name / ['name']    a key of an object
+    [0] / [-1]          an item of an array
+    [*] / .*            every item of an array, or every value of an object
+
+Paths are parsed once, so evaluating an accessor only walks the document.
+
+Usage:
+    accessor = jsonpath.compile("$.machines[*].usage")
+    accessor({"machines": [{"usage": 1}, {"usage": 2}]})  # [1, 2]
+"""
+import re
+
+
+_TOKEN = re.compile(
+    r"\.(?P<name>[^.\[\]*]+)"
+    r"|\[(?P<index>-?\d+)\]"
+    r"|\[(?P<quote>['\"])(?P<key>.*?)(?P=quote)\]"
+    r"|(?P<wildcard>\[\*\]|\.\*)"
+)
+_WILDCARD = object()
+
+
+def _parse(path):
+    if not path.startswith("$"):
+        raise ValueError("path '{}' must start with '$'".format(path))
+
+    steps = []
+    position = 1
+    while position < len(path):
+        match = _TOKEN.match(path, position)
+        if match is None:
+            raise ValueError("invalid path '{}' at position {}".format(path, position))
+        if match.group("wildcard"):
+            steps.append(_WILDCARD)
+        elif match.group("index") is not None:
+            steps.append(int(match.group("index")))
+        elif match.group("quote"):
+            steps.append(match.group("key"))
+        else:
+            steps.append(match.group("name"))
+        position = match.end()
+    return steps
+
+
+def compile(path):
+    """Compiles a path in an accessor.
+
+    Args:
+        path: JSONPath-like expression.
+    Returns:
+        A callable that receives a decoded document and returns the list of matched
+        values; the list is empty if nothing matches.
+    Raises:
+        ValueError: If the path is not valid.
+    """
+    steps = _parse(path)
+
+    if _WILDCARD not in steps:
+        # Single value: plain lookups without intermediate lists
+        def accessor(document):
+            try:
+                for step in steps:
+                    document = document[step]
+            except (KeyError, IndexError, TypeError):
+                return []
+            return [document]
+
+        return accessor
+
+    def accessor(document):
+        nodes = [document]
+        for step in steps:
+            matched = []
+            if step is _WILDCARD:
+                for node in nodes:
+                    if isinstance(node, dict):
+                        matched.extend(node.values())
+                    elif isinstance(node, list):
+                        matched.extend(node)
+            else:
+                for node in nodes:
+                    try:
+                        matched.append(node[step])
+                    except (KeyError, IndexError, TypeError):
+                        pass
+            nodes = matched
+        return nodes
+
+    return accessor
@@ -0,0 +1,63 @@
+"""Helpers to walk and transform probe results. Probe results are dictionaries where
+each key is a metric name, and each value is either a data point, a ``(value, tags)``
+tuple, or a list of them.
+"""
+
+
+def iter_metrics(results):
+    """Iterates over probe results, normalizing every data point.
+
+    Args:
+        results: Probe results dictionary.
+    Returns:
+        A generator of ``(metric, value, tags)`` tuples, where ``tags`` is always a list.
+    """
+    for metric, values in results.items():
+        if not isinstance(values, list):
+            values = [values]
+
+        for value in values:
+            if isinstance(value, tuple):
+                yield metric, value[0], value[1]
+            else:
+                yield metric, value, []
+
+
+def add_tags(results, tags):
+    """Returns a copy of probe results where the given tags are attached to every
+    data point. Data points without tags are converted in ``(value, tags)`` tuples.
+
+    Args:
+        results: Probe results dictionary.
+        tags: List of tags that must be added.
+    Returns:
+        A new results dictionary.
+    """
+    tagged = {}
+    for metric, values in results.items():
+        if isinstance(values, list):
+            tagged[metric] = [_tag(value, tags) for value in values]
+        else:
+            tagged[metric] = _tag(values, tags)
+    return tagged
+
+
+def merge(results, other):
+    """Merges ``other`` results into ``results``. Data points of metrics available
+    in both dictionaries are concatenated in a list.
+    """
+    for metric, values in other.items():
+        if not isinstance(values, list):
+            values = [values]
+
+        current = results.get(metric, [])
+        if not isinstance(current, list):
+            current = [current]
+        results[metric] = current + values
+    return results
+
+
+def _tag(value, tags):
+    if isinstance(value, tuple):
+        return (value[0], value[1] + tags)
+    return (value, list(tags))
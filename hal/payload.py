@@ -0,0 +1,31 @@
+import time
+
+
+class Payload(dict):
+    """Payload wraps a batch of probe results when they're exported. It behaves like
+    the results dictionary, and also memoizes the encoded bytes of every wire format,
+    so that when many exporters need the same format (e.g. two Datadog accounts), the
+    batch is walked and serialized only once.
+
+    ``timestamp`` is the time of the batch, used for data points without their own
+    timestamp, so that bytes encoded by different exporters are the same. A payload
+    must not be changed after it's created, otherwise cached bytes are stale.
+
+    Usage:
+        payload = Payload(results)
+        body = payload.encoded(("datadog", "home"), lambda: encode(payload))
+    """
+
+    def __init__(self, results, timestamp=None):
+        super().__init__(results)
+        self.timestamp = timestamp or time.time()
+        self._encoded = {}
+
+    def encoded(self, key, encoder):
+        """Returns the bytes cached with ``key``, calling ``encoder()`` to create them
+        the first time.
+        """
+        body = self._encoded.get(key)
+        if body is None:
+            body = self._encoded[key] = encoder()
+        return body
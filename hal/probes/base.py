@@ -1,5 +1,13 @@
+import asyncio
+import aiohttp
 import logging
 
+from contextlib import asynccontextmanager
+
+from ..deadline import DeadlineExceeded
+from ..metrics import add_tags
+from ..payload import Payload
+
 
 log = logging.getLogger(__name__)
 
@@ -28,15 +36,104 @@ class BaseProbe(object):
 
         # Export the results based on configured exporter
         probe.export()
+
+    Probes that keep state across runs can persist it with a snapshot store, set via
+    the ``snapshot_store`` config key (and optionally ``snapshot_key``, that defaults
+    to the class name). The state is loaded before the first run and saved after each
+    successful run. Probes define their state overriding ``snapshot()`` and
+    ``restore()``, and bump ``SNAPSHOT_VERSION`` when the state format changes.
+
+    ``run()`` accepts a ``Deadline``, stored in ``self.deadline`` for the duration of
+    the run. Probes derive per-call timeouts from it (see ``_timeout()``), and when
+    the budget is used up, the remaining work is cancelled: results collected so far
+    are kept and exported with the ``partial:true`` tag. A probe can also stop early
+    by itself, setting ``self.partial``.
+
+    Probe work can be split across workers setting a ``membership`` (see
+    ``hal.sharding``): probes process only the items they ``owns()``, and emit
+    aggregate metrics only if they ``owns_aggregates()``.
     """
 
     DEFAULTS = {}
     BASE_DEFAULTS = {"exporters": []}
+    SNAPSHOT_VERSION = 1
 
     def __init__(self, config=None):
         config = config or {}
         self.config = {**BaseProbe.BASE_DEFAULTS, **self.DEFAULTS, **config}
         self.results = {}
+        self.deadline = None
+        self.partial = False
+        self._restored = False
+        self._ring = None
+
+    def snapshot(self):
+        """Returns the probe state that must be persisted across runs. The state
+        must be JSON serializable. By default probes are stateless.
+        """
+        return None
+
+    def restore(self, state):
+        """Restores the probe state returned by ``snapshot()`` in a previous run."""
+
+    def _snapshot_key(self):
+        return self.config.get("snapshot_key") or self.__class__.__name__
+
+    def _load_snapshot(self):
+        """Warm-starts the probe from the snapshot store, once."""
+        store = self.config.get("snapshot_store")
+        if store is None or self._restored:
+            return
+
+        self._restored = True
+        state = store.load(self._snapshot_key(), self.SNAPSHOT_VERSION)
+        if state is not None:
+            log.debug("%s: restored from snapshot", self.__class__.__name__)
+            self.restore(state)
+
+    def _save_snapshot(self):
+        store = self.config.get("snapshot_store")
+        state = self.snapshot()
+        if store is None or state is None:
+            return
+        store.save(self._snapshot_key(), self.SNAPSHOT_VERSION, state)
+
+    def _payload(self):
+        """Wraps results in a ``Payload``, so that exporters share encoded bytes.
+        Partial results are tagged with ``partial:true``.
+        """
+        if not isinstance(self.results, dict):
+            return self.results
+        if self.partial:
+            return Payload(add_tags(self.results, ["partial:true"]))
+        if not isinstance(self.results, Payload):
+            return Payload(self.results)
+        return self.results
+
+    def owns(self, key):
+        """Checks if this worker must process the item with the given key. Without
+        a ``membership`` config, the probe owns all items.
+        """
+        if self._ring is None:
+            return True
+        return self._ring.owner(key) == self.config["membership"].worker_id
+
+    def owns_aggregates(self):
+        """Checks if this worker must emit aggregate metrics, so that they're emitted
+        exactly once across workers.
+        """
+        return self.owns("{}:aggregates".format(self._snapshot_key()))
+
+    def _timeout(self, default=None):
+        """Returns the timeout for the next network or subprocess call, according
+        to the run deadline. Without a deadline, ``default`` is returned.
+
+        Raises:
+            DeadlineExceeded: If the deadline budget is used up.
+        """
+        if self.deadline is None:
+            return default
+        return self.deadline.timeout(default)
 
     def _run(self):
         """Defines the probe logic. This method must be implemented in the child class, and probe
@@ -47,18 +144,55 @@ class BaseProbe(object):
         """
         raise NotImplementedError()
 
-    def run(self):
+    def run(self, deadline=None):
         """Probe public API that must be called by the main program. It differs from `_run()`
         because this must not be implemented in child classes, and is used only to share
         a common logic between probes.
 
+        Args:
+            deadline: Optional ``Deadline`` for this run.
         Returns:
             A boolean that represents the success or failure of the data collection.
         """
         log.debug("%s: started", self.__class__.__name__)
-        status, msg = self._run()
+        self._started(deadline)
+        try:
+            status, msg = self._run()
+        except DeadlineExceeded:
+            status, msg = self._cancelled()
+        return self._completed(status, msg)
+
+    def _started(self, deadline):
+        self.deadline = deadline
+        self.partial = False
+        # Results of the previous run must not be taken as collected by this one
+        self.results = {}
+        membership = self.config.get("membership")
+        self._ring = membership.ring() if membership is not None else None
+        self._load_snapshot()
+
+    def _cancelled(self):
+        """Handles a run cancelled by the deadline. The run is successful only if
+        some results were collected before the cancellation.
+        """
+        self.partial = True
+        if self.results:
+            return True, None
+        return False, "run cancelled by the deadline with no results"
+
+    def _completed(self, status, msg):
+        """Logs the outcome of a probe execution and returns its status. The probe
+        snapshot is saved after a successful run.
+        """
         if status:
-            log.info("%s: completed with success", self.__class__.__name__)
+            self._save_snapshot()
+            if self.partial:
+                log.warning(
+                    "%s: deadline exceeded, results are partial",
+                    self.__class__.__name__,
+                )
+            else:
+                log.info("%s: completed with success", self.__class__.__name__)
         else:
             log.error("%s: %s", self.__class__.__name__, msg)
         return status
@@ -76,9 +210,121 @@ class BaseProbe(object):
             )
             return
 
+        payload = self._payload()
+        try:
+            for exporter in self.config["exporters"]:
+                exporter.send(payload)
+        except TypeError:
+            log.error(
+                "%s: some exporters are not valid; execution aborted",
+                self.__class__.__name__,
+            )
+
+
+class AsyncBaseProbe(BaseProbe):
+    """Defines a `Probe` variant that runs in an asyncio event loop. The contract is the
+    same of ``BaseProbe``, but ``_run()``, ``run()`` and ``export()`` are coroutines so
+    that many probes can wait on the network concurrently from a single thread.
+
+    Exporters can be either ``AsyncBaseExporter`` instances, that are awaited, or
+    synchronous exporters, that are executed in the default loop executor so they
+    don't block other probes.
+
+    Usage:
+        probe = AsyncProbe(config)
+        await probe.run()
+        await probe.export()
+    """
+
+    async def _run(self):
+        """Defines the probe logic as a coroutine. Probe results must be stored in
+        ``self.results``.
+
+        Raises:
+            NotImplementedError: the class must be extended to be used.
+        """
+        raise NotImplementedError()
+
+    @asynccontextmanager
+    async def _session(self):
+        """Yields the ``aiohttp.ClientSession`` shared via the ``session`` config key,
+        or a new session that is closed when the block exits.
+        """
+        session = self.config.get("session")
+        if session is not None:
+            yield session
+            return
+
+        session = aiohttp.ClientSession()
+        try:
+            yield session
+        finally:
+            await session.close()
+
+    async def _run_until(self, deadline):
+        """Awaits ``_run()``, cancelling it when the deadline budget is used up so
+        that the reserve is left for the export. ``_run()`` can catch
+        ``asyncio.CancelledError`` to store results collected so far before
+        re-raising it. Exceptions raised by ``_run()`` itself (e.g. timeouts of its
+        own calls) are propagated.
+
+        Raises:
+            DeadlineExceeded: If ``_run()`` is cancelled by the deadline.
+        """
+        task = asyncio.ensure_future(self._run())
+        try:
+            done, _ = await asyncio.wait({task}, timeout=deadline.remaining())
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+
+        if not done:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            raise DeadlineExceeded()
+        return task.result()
+
+    async def run(self, deadline=None):
+        """Probe public API that must be awaited by the main program. With a
+        ``deadline``, ``_run()`` is cancelled when the budget (reserve excluded) is
+        used up.
+
+        Returns:
+            A boolean that represents the success or failure of the data collection.
+        """
+        log.debug("%s: started", self.__class__.__name__)
+        self._started(deadline)
+        try:
+            if deadline is None:
+                status, msg = await self._run()
+            else:
+                status, msg = await self._run_until(deadline)
+        except DeadlineExceeded:
+            status, msg = self._cancelled()
+        return self._completed(status, msg)
+
+    async def export(self):
+        """Exports results stored in ``self.results`` through the configured exporters.
+        Synchronous exporters are executed in the loop executor.
+        """
+        if not self.results:
+            log.warning(
+                "%s: export() executed with no results available",
+                self.__class__.__name__,
+            )
+            return
+
+        loop = asyncio.get_running_loop()
+        payload = self._payload()
         try:
             for exporter in self.config["exporters"]:
-                exporter.send(self.results)
+                if asyncio.iscoroutinefunction(exporter.send):
+                    await exporter.send(payload)
+                else:
+                    await loop.run_in_executor(None, exporter.send, payload)
         except TypeError:
             log.error(
                 "%s: some exporters are not valid; execution aborted",
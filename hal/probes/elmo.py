@@ -4,22 +4,58 @@ from elmo.api.client import ElmoClient
 from requests.exceptions import HTTPError
 
 from .base import BaseProbe
+from ..http import request_key
+from ..singleflight import SingleFlight
 
 
 log = logging.getLogger(__name__)
 
+_flights = SingleFlight()
+
 
 class ElmoProbe(BaseProbe):
-    """TODO
-    """
+    """TODO"""
 
     DEFAULTS = {
         "base_url": None,
         "vendor": None,
         "username": None,
         "password": None,
+        "coalesce_ttl": 0,
     }
 
+    def __init__(self, config=None):
+        super().__init__(config)
+        self.client = None
+
+    def _client(self):
+        """Returns the cached ``ElmoClient``, authenticating a new one if needed."""
+        if self.client is None:
+            client = ElmoClient(self.config["base_url"], self.config["vendor"])
+            client.auth(self.config["username"], self.config["password"])
+            self.client = client
+        return self.client
+
+    def _check(self):
+        """Retrieves the system status. Probes that monitor the same panel with the
+        same credentials at the same time share a single call; with ``coalesce_ttl``
+        (seconds), a recent status is reused too.
+        """
+        key = request_key(
+            "CHECK",
+            self.config["base_url"],
+            {
+                "vendor": self.config["vendor"],
+                "username": self.config["username"],
+                "password": self.config["password"],
+            },
+        )
+        # ``ElmoClient`` doesn't accept timeouts: bail out if there is no budget left
+        self._timeout()
+        return _flights.do(
+            key, lambda: self._client().check(), self.config["coalesce_ttl"]
+        )
+
     def _run(self):
         if not self.config["base_url"] or not self.config["vendor"]:
             # Bail out if the Elmo endpoint is not defined
@@ -29,12 +65,20 @@ class ElmoProbe(BaseProbe):
             # Bail out if credentials are not defined
             return False, "run failed for missing credentials"
 
-        # Access Elmo and get the system status
+        # Access Elmo and get the system status. The authenticated client is cached
+        # so that the session is reused across runs; if the cached session fails
+        # (e.g. expired token), authenticate again once.
+        cached = self.client is not None
         try:
-            client = ElmoClient(self.config["base_url"], self.config["vendor"])
-            client.auth(self.config["username"], self.config["password"])
-            status = client.check()
+            try:
+                status = self._check()
+            except HTTPError:
+                if not cached:
+                    raise
+                self.client = None
+                status = self._check()
         except HTTPError as e:
+            self.client = None
             return False, "run failed. ElmoClient returns '{}'".format(e)
 
         # Metrics: collect armed/disarmed areas and system inputs status
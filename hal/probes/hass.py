@@ -0,0 +1,133 @@
+import asyncio
+import aiohttp
+import logging
+
+from .stream import StreamProbe
+
+
+log = logging.getLogger(__name__)
+
+BOOLEAN_STATES = {
+    "on": 1,
+    "off": 0,
+    "home": 1,
+    "not_home": 0,
+    "open": 1,
+    "closed": 0,
+}
+
+
+def state_value(state):
+    """Converts a Home Assistant state in a numeric value. Returns ``None`` for states
+    that are neither numeric nor boolean (e.g. ``unavailable`` or free text).
+    """
+    value = BOOLEAN_STATES.get(state)
+    if value is not None:
+        return value
+    try:
+        return float(state)
+    except (TypeError, ValueError):
+        return None
+
+
+class HassProbe(StreamProbe):
+    """HassProbe subscribes to Home Assistant ``state_changed`` events through a single
+    authenticated WebSocket, instead of polling the REST API for every entity. A
+    long-lived access token is required, and can be created from the user profile.
+
+    The probe keeps an in-memory map of entity states, and collects only numeric and
+    boolean states when they change. Each entity is exported as ``hal.hass.<domain>``
+    with the ``entity_id:<entity>`` tag. After a reconnect, all states are fetched once
+    and only entities that changed in the meantime are exported. The state map is the
+    probe snapshot, so a warm-started probe doesn't export unchanged entities again.
+    Use ``domains`` to limit the entities that are tracked.
+    """
+
+    DEFAULTS = {
+        **StreamProbe.DEFAULTS,
+        "url": None,
+        "token": None,
+        "domains": None,
+        "reconnect_interval": 5,
+    }
+
+    def __init__(self, config=None):
+        super().__init__(config)
+        self.states = {}
+        self._id = 0
+
+    def snapshot(self):
+        return {"states": self.states}
+
+    def restore(self, state):
+        self.states = state["states"]
+
+    def _update(self, entity_id, state):
+        """Updates the state map and collects the value if it changed."""
+        domain = entity_id.split(".", 1)[0]
+        if self.config["domains"] and domain not in self.config["domains"]:
+            return
+
+        value = state_value(state)
+        if value is None or self.states.get(entity_id) == value:
+            return
+        self.states[entity_id] = value
+        self.collect(
+            "hal.hass.{}".format(domain), value, ["entity_id:{}".format(entity_id)]
+        )
+
+    async def _command(self, ws, command):
+        self._id += 1
+        await ws.send_json({"id": self._id, **command})
+        return self._id
+
+    async def _session(self, ws):
+        """Authenticates, subscribes to events and resyncs states. Returns an error
+        message if the session can't be established, otherwise consumes events until
+        the connection is closed.
+        """
+        message = await ws.receive_json()
+        if message.get("type") == "auth_required":
+            await ws.send_json({"type": "auth", "access_token": self.config["token"]})
+            message = await ws.receive_json()
+        if message.get("type") != "auth_ok":
+            return "authentication failed"
+
+        # Subscribe before fetching states, so that no event is lost in between
+        await self._command(
+            ws, {"type": "subscribe_events", "event_type": "state_changed"}
+        )
+        states_id = await self._command(ws, {"type": "get_states"})
+
+        async for msg in ws:
+            if msg.type != aiohttp.WSMsgType.TEXT:
+                break
+            message = msg.json()
+            if message.get("type") == "event":
+                data = message["event"]["data"]
+                if data.get("new_state"):
+                    self._update(data["entity_id"], data["new_state"]["state"])
+            elif message.get("id") == states_id and message.get("success"):
+                for state in message["result"]:
+                    self._update(state["entity_id"], state["state"])
+        return None
+
+    async def _stream(self):
+        if not self.config["url"] or not self.config["token"]:
+            # Bail out if Home Assistant is not configured
+            return False, "run failed for missing 'url' and 'token'"
+
+        async with aiohttp.ClientSession() as session:
+            while True:
+                try:
+                    async with session.ws_connect(self.config["url"]) as ws:
+                        error = await self._session(ws)
+                except aiohttp.ClientError as e:
+                    error = None
+                    log.warning("HassProbe: connection error '%s'", e)
+
+                if error:
+                    return False, "run failed. Home Assistant {}".format(error)
+
+                log.info("HassProbe: disconnected, reconnecting")
+                await asyncio.sleep(self.config["reconnect_interval"])
@@ -0,0 +1,275 @@
+import struct
+import asyncio
+import logging
+
+from .stream import StreamProbe
+
+
+log = logging.getLogger(__name__)
+
+# KNXnet/IP service types
+CONNECT_REQUEST = 0x0205
+CONNECT_RESPONSE = 0x0206
+CONNECTIONSTATE_REQUEST = 0x0207
+CONNECTIONSTATE_RESPONSE = 0x0208
+DISCONNECT_REQUEST = 0x0209
+DISCONNECT_RESPONSE = 0x020A
+TUNNELING_REQUEST = 0x0420
+TUNNELING_ACK = 0x0421
+
+# cEMI message code and APCI commands
+L_DATA_IND = 0x29
+GROUP_VALUE_RESPONSE = 0x040
+GROUP_VALUE_WRITE = 0x080
+
+
+def frame(service, body):
+    """Builds a KNXnet/IP frame with the given service type and body."""
+    return struct.pack(">BBHH", 0x06, 0x10, service, 6 + len(body)) + body
+
+
+def hpai(address, port):
+    """Builds a Host Protocol Address Information block for UDP."""
+    return struct.pack(">BB4sH", 8, 0x01, bytes(map(int, address.split("."))), port)
+
+
+def group_address(raw):
+    """Converts a 16 bit group address in the 3-level format ``main/middle/sub``."""
+    return "{}/{}/{}".format(raw >> 11, (raw >> 8) & 0x07, raw & 0xFF)
+
+
+def decode_value(kind, data):
+    """Decodes a group value for the supported datapoint types:
+    * ``switch`` (DPT 1.xxx): 0 or 1
+    * ``percent`` (DPT 5.001): 0-100
+    * ``float`` (DPT 9.xxx): 2-byte float, used for temperatures and setpoints
+    """
+    if kind == "switch":
+        return data[0] & 0x01
+    if kind == "percent":
+        return round(data[0] * 100 / 255, 1)
+    if kind == "float":
+        raw = (data[0] << 8) | data[1]
+        mantissa = raw & 0x07FF
+        if raw & 0x8000:
+            mantissa -= 2048
+        return round(0.01 * mantissa * (1 << ((raw >> 11) & 0x0F)), 2)
+    raise ValueError("unsupported datapoint type '{}'".format(kind))
+
+
+def parse_cemi(cemi):
+    """Parses a cEMI frame and returns ``(group_address, data)`` for group value
+    writes and responses, otherwise ``None``.
+
+    Raises:
+        IndexError: If the frame is truncated.
+    """
+    if cemi[0] != L_DATA_IND:
+        return None
+
+    offset = 2 + cemi[1]
+    ctrl2 = cemi[offset + 1]
+    if not ctrl2 & 0x80:
+        # Individual address destination
+        return None
+
+    destination = (cemi[offset + 4] << 8) | cemi[offset + 5]
+    length = cemi[offset + 6]
+    start = offset + 7
+    tpdu = cemi[start:]
+    apci = ((tpdu[0] & 0x03) << 8) | tpdu[1]
+    if apci & 0x3C0 not in (GROUP_VALUE_WRITE, GROUP_VALUE_RESPONSE):
+        return None
+
+    if length == 1:
+        # Values up to 6 bits are stored in the APCI byte
+        data = bytes([tpdu[1] & 0x3F])
+    else:
+        end = length + 1
+        data = bytes(tpdu[2:end])
+    return group_address(destination), data
+
+
+class _TunnelProtocol(asyncio.DatagramProtocol):
+    def __init__(self, queue):
+        self.queue = queue
+
+    def datagram_received(self, data, addr):
+        if len(data) < 6 or data[0] != 0x06:
+            return
+        service, length = struct.unpack(">HH", data[2:6])
+        self.queue.put_nowait((service, data[6:length]))
+
+    def error_received(self, exc):
+        log.debug("KNXProbe: socket error '%s'", exc)
+
+
+class KNXProbe(StreamProbe):
+    """KNXProbe connects to a KNX/IP interface in tunneling mode and subscribes to the bus
+    telegrams, instead of polling the state of each device. Group values are decoded as
+    soon as they arrive, coalesced and exported in micro-batches (see ``StreamProbe``).
+    The probe requires the interface ``host`` and a mapping of group addresses:
+
+        "group_addresses": {
+            "0/0/12": {"metric": "hal.knx.light.state", "type": "switch", "tags": ["name:Kitchen"]},
+            "0/2/2": {"metric": "hal.knx.light.brightness", "type": "percent", "tags": ["name:TV"]},
+            "1/0/6": {"metric": "hal.knx.blind.position", "type": "percent", "tags": ["name:Living"]},
+            "2/0/1": {"metric": "hal.knx.climate.temperature", "type": "float", "tags": ["name:Bedroom"]},
+        }
+
+    Telegrams for unknown group addresses are ignored. A connection state request is
+    sent every ``heartbeat_interval`` seconds, whatever the bus traffic, to keep the
+    tunnel open; it's retried up to 3 times if the interface doesn't answer within
+    ``timeout`` seconds. When the tunnel is lost (missed heartbeats, or closed by the
+    interface), the probe reconnects after ``reconnect_interval`` seconds.
+    """
+
+    DEFAULTS = {
+        **StreamProbe.DEFAULTS,
+        "host": None,
+        "port": 3671,
+        "group_addresses": {},
+        "heartbeat_interval": 60,
+        "timeout": 10,
+        "reconnect_interval": 5,
+    }
+
+    def __init__(self, config=None):
+        super().__init__(config)
+        self.channel = None
+        self.transport = None
+        self._sequence = None
+
+    def _send(self, service, body):
+        self.transport.sendto(frame(service, body))
+
+    async def _connect(self, queue):
+        """Opens the tunnel and returns the channel ID, or ``None`` if the gateway
+        refuses the connection.
+        """
+        address, port = self.transport.get_extra_info("sockname")[:2]
+        endpoint = hpai(address, port)
+        # CRI: tunnel connection on the link layer
+        self._send(CONNECT_REQUEST, endpoint + endpoint + bytes([4, 4, 2, 0]))
+        while True:
+            service, body = await asyncio.wait_for(queue.get(), self.config["timeout"])
+            if service == CONNECT_RESPONSE and len(body) >= 2:
+                channel, status = body[0], body[1]
+                return channel if status == 0 else None
+
+    def _handle_telegram(self, body):
+        """Acknowledges a tunneling request and collects its group value."""
+        channel, sequence = body[1], body[2]
+        if channel != self.channel:
+            return
+        self._send(TUNNELING_ACK, bytes([4, channel, sequence, 0]))
+        if sequence == self._sequence:
+            # Repeated telegram because the gateway didn't receive our ACK
+            return
+        self._sequence = sequence
+
+        telegram = parse_cemi(body[4:])
+        if telegram is None:
+            return
+
+        address, data = telegram
+        mapping = self.config["group_addresses"].get(address)
+        if mapping is None:
+            return
+
+        try:
+            value = decode_value(mapping["type"], data)
+        except (ValueError, IndexError):
+            log.warning("KNXProbe: unable to decode value for '%s'", address)
+            return
+        self.collect(mapping["metric"], value, mapping.get("tags", []))
+
+    async def _heartbeat(self, queue, states):
+        """Sends a connection state request every ``heartbeat_interval`` seconds. If
+        the interface doesn't confirm the connection after 3 attempts, the tunnel is
+        reported as lost by putting ``(None, None)`` in the telegram queue.
+        """
+        body = self._heartbeat_body()
+        while True:
+            await asyncio.sleep(self.config["heartbeat_interval"])
+            for _ in range(3):
+                self._send(CONNECTIONSTATE_REQUEST, body)
+                try:
+                    status = await asyncio.wait_for(
+                        states.get(), self.config["timeout"]
+                    )
+                except asyncio.TimeoutError:
+                    continue
+                if status == 0:
+                    break
+            else:
+                queue.put_nowait((None, None))
+                return
+
+    async def _tunnel(self, loop):
+        """Opens a tunnel and collects telegrams until it's lost. Returns an error
+        message if the interface refuses the tunnel, otherwise ``None`` when the
+        connection must be opened again.
+        """
+        queue = asyncio.Queue()
+        self.transport, _ = await loop.create_datagram_endpoint(
+            lambda: _TunnelProtocol(queue),
+            remote_addr=(self.config["host"], self.config["port"]),
+        )
+        self._sequence = None
+        heartbeat = None
+        try:
+            try:
+                self.channel = await self._connect(queue)
+            except asyncio.TimeoutError:
+                log.warning("KNXProbe: interface is not responding")
+                return None
+            if self.channel is None:
+                return "refused the connection"
+
+            log.info("KNXProbe: tunnel opened on channel %d", self.channel)
+            states = asyncio.Queue()
+            heartbeat = asyncio.ensure_future(self._heartbeat(queue, states))
+            while True:
+                service, body = await queue.get()
+                if service is None:
+                    log.warning("KNXProbe: interface is not responding")
+                    return None
+                try:
+                    if service == TUNNELING_REQUEST:
+                        self._handle_telegram(body)
+                    elif service == CONNECTIONSTATE_RESPONSE:
+                        states.put_nowait(body[1])
+                except IndexError:
+                    log.debug("KNXProbe: dropping malformed frame '%s'", body.hex())
+                    continue
+                if service == DISCONNECT_REQUEST:
+                    self._send(DISCONNECT_RESPONSE, bytes([self.channel, 0]))
+                    self.channel = None
+                    log.warning("KNXProbe: interface closed the connection")
+                    return None
+        finally:
+            if heartbeat is not None:
+                heartbeat.cancel()
+            if self.channel is not None:
+                self._send(DISCONNECT_REQUEST, self._heartbeat_body())
+                self.channel = None
+            self.transport.close()
+
+    async def _stream(self):
+        if not self.config["host"]:
+            # Bail out if the KNX interface is not defined
+            return False, "run failed for missing KNX 'host'"
+
+        loop = asyncio.get_running_loop()
+        while True:
+            error = await self._tunnel(loop)
+            if error:
+                return False, "run failed. KNX interface {}".format(error)
+
+            log.info("KNXProbe: disconnected, reconnecting")
+            await asyncio.sleep(self.config["reconnect_interval"])
+
+    def _heartbeat_body(self):
+        address, port = self.transport.get_extra_info("sockname")[:2]
+        return bytes([self.channel, 0]) + hpai(address, port)
@@ -0,0 +1,102 @@
+import logging
+
+from concurrent.futures import ThreadPoolExecutor
+
+from .base import BaseProbe
+from ..metrics import add_tags, merge
+
+
+log = logging.getLogger(__name__)
+
+
+class MultiAccountProbe(BaseProbe):
+    """MultiAccountProbe runs the same probe for a list of accounts in a single
+    invocation. Each account config is merged with the shared config and used to
+    initialize a child probe, that is kept across runs so that cached authentication
+    (e.g. the Elmo session) is reused. Accounts run concurrently in a thread pool and
+    their results are merged, adding the ``account:<name>`` tag to every data point.
+    HTTP probes already share pooled connections per base URL (``hal.http``).
+
+    Usage:
+        config = {
+            "probe": PaperspaceProbe,
+            "accounts": [
+                {"account": "work", "api_key": "key_1"},
+                {"account": "home", "api_key": "key_2"},
+            ],
+            "exporters": [DatadogExporter(config)],
+        }
+        probe = MultiAccountProbe(config)
+        probe.run()
+        probe.export()
+    """
+
+    DEFAULTS = {
+        "probe": None,
+        "accounts": [],
+        "account_key": "account",
+        "max_workers": None,
+    }
+
+    def __init__(self, config=None):
+        super().__init__(config)
+        self.probes = {}
+
+    def _build(self):
+        """Initializes child probes for configured accounts, reusing existing ones."""
+        shared = {
+            k: v
+            for k, v in self.config.items()
+            if k not in MultiAccountProbe.DEFAULTS
+            and k not in ("exporters", "snapshot_key")
+        }
+        probes = {}
+        for account in self.config["accounts"]:
+            account = dict(account)
+            name = account.pop(self.config["account_key"])
+            if name in self.probes:
+                probes[name] = self.probes[name]
+                continue
+
+            config = {**shared, **account}
+            if config.get("snapshot_store"):
+                # Each account has its own snapshot
+                config.setdefault(
+                    "snapshot_key", "{}-{}".format(self.config["probe"].__name__, name)
+                )
+            probes[name] = self.config["probe"](config)
+        self.probes = probes
+
+    def _run_account(self, name, probe):
+        """Runs the probe of an account. Exceptions are logged and the account is
+        marked as failed, so that other accounts results are still collected.
+        """
+        try:
+            return probe.run(self.deadline)
+        except Exception:
+            log.exception("MultiAccountProbe: account '%s' raised an exception", name)
+            return False
+
+    def _run(self):
+        if not self.config["probe"] or not self.config["accounts"]:
+            # Bail out if there is nothing to run
+            return False, "run failed for missing 'probe' and 'accounts'"
+
+        self._build()
+        workers = self.config["max_workers"] or len(self.probes)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            statuses = list(
+                executor.map(self._run_account, self.probes, self.probes.values())
+            )
+
+        self.results = {}
+        for (name, probe), status in zip(self.probes.items(), statuses):
+            if not status:
+                log.warning("MultiAccountProbe: account '%s' skipped", name)
+                continue
+            merge(self.results, add_tags(probe.results, ["account:{}".format(name)]))
+            self.partial = self.partial or probe.partial
+
+        if not any(statuses):
+            return False, "run failed for all accounts"
+        return True, None
@@ -1,8 +1,13 @@
+import json
+import time
+import asyncio
+import hashlib
 import logging
-import requests
 
 from datetime import datetime
-from .base import BaseProbe
+from .base import AsyncBaseProbe, BaseProbe
+from .. import http
+from ..deadline import DeadlineExceeded
 
 
 log = logging.getLogger(__name__)
@@ -20,42 +25,159 @@ class PaperspaceProbe(BaseProbe):
         * Monthly rate for attached storages
 
     To retrieve billing metrics, the current time (``now()``) is used.
+
+    Machines listing is paginated when ``page_size`` is set, so that large accounts
+    are not retrieved with a single response. The probe keeps a local machine index
+    (``self.machines``) keyed by machine ID, that tracks when a machine has been seen
+    the last time and the latest utilization data. When ``incremental`` is enabled,
+    utilization data is refreshed only for machines that are added, changed, not
+    ``off`` (because they are accruing usage), or when the billing period changes.
+    The machine index is the probe snapshot, so it can be persisted across invocations.
+
+    API calls are coalesced with other probes (see ``hal.http.get``); ``coalesce_ttl``
+    sets how many seconds a response is reused.
+
+    With a ``membership`` config, machines are sharded by ID across workers: each
+    worker reports state and utilization of its own machines, and the machines count
+    is reported by a single worker.
     """
 
     DEFAULTS = {
         "api_key": None,
         "base_url": "https://api.paperspace.io",
         "header_key": "x-api-key",
+        "page_size": None,
+        "incremental": False,
+        "coalesce_ttl": 0,
     }
 
-    def _run(self):
-        if not self.config["api_key"]:
-            # Bail out if the Paperspace API key is missing
-            return False, "run failed for missing Paperspace API key"
+    def __init__(self, config=None):
+        super().__init__(config)
+        self.machines = {}
 
-        # Billing date for the current month (format: 2019-09)
-        billing_period = datetime.now().strftime("%Y-%m")
+    def snapshot(self):
+        return {"machines": self.machines}
 
-        # Use Paperspace API key for authentication
-        headers = {self.config["header_key"]: self.config["api_key"]}
+    def restore(self, state):
+        self.machines = state["machines"]
 
-        # List information about all machines available
+    def _request(self, url, headers, params=None):
+        return http.get(
+            url,
+            headers=headers,
+            params=params,
+            ttl=self.config["coalesce_ttl"],
+            deadline=self.deadline,
+        )
+
+    def _listing(self):
+        """Generator that drives the machines listing, shared by the sync and async
+        variants: it yields the query parameters of each request (``None`` if pages
+        are not used), receives the decoded response and returns the machines once
+        the last page is received.
+        """
+        page_size = self.config["page_size"]
+        if not page_size:
+            return (yield None)
+
+        machines = []
+        skip = 0
+        while True:
+            page = yield {"limit": page_size, "skip": skip}
+            machines.extend(page)
+            if len(page) < page_size:
+                break
+            skip += page_size
+
+        # Machines may shift across pages if the fleet changes while listing
+        return list({machine["id"]: machine for machine in machines}.values())
+
+    def _list_machines(self, headers):
+        """Retrieves the list of all machines, following pages if ``page_size`` is set.
+
+        Returns:
+            A tuple ``(machines, error)``, where ``machines`` is ``None`` if any
+            page cannot be retrieved.
+        """
         url = "{}/{}".format(self.config["base_url"], "machines/getMachines")
-        response = requests.get(url, headers=headers)
+        listing = self._listing()
+        params = next(listing)
+        while True:
+            response = self._request(url, headers, params)
+            if response.status_code != 200:
+                return None, response.text
+            try:
+                params = listing.send(response.json())
+            except StopIteration as e:
+                return e.value, None
 
-        # Bail out if we cannot retrieve the list of machines
-        if response.status_code != 200:
-            return False, "run failed. Server returns '{}'".format(response.text)
-        machines = response.json()
+    def _sync_index(self, machines):
+        """Updates the local machine index with the last listing.
+
+        Returns:
+            A tuple ``(added, removed, changed)`` with the set of machine IDs.
+        """
+        now = time.time()
+        added, changed = set(), set()
+        for machine in machines:
+            fingerprint = hashlib.sha1(
+                json.dumps(machine, sort_keys=True).encode()
+            ).hexdigest()
+            entry = self.machines.get(machine["id"])
+            if entry is None:
+                added.add(machine["id"])
+                entry = self.machines[machine["id"]] = {"billing": None, "period": None}
+            elif entry["fingerprint"] != fingerprint:
+                changed.add(machine["id"])
+            entry["fingerprint"] = fingerprint
+            entry["last_seen"] = now
+
+        listed = {machine["id"] for machine in machines}
+        removed = set(self.machines) - listed
+        for machine_id in removed:
+            del self.machines[machine_id]
+
+        return added, removed, changed
+
+    def _is_stale(self, machine, entry, billing_period, changed):
+        """Checks if utilization data for the given machine must be refreshed."""
+        return (
+            not self.config["incremental"]
+            or entry["billing"] is None
+            or entry["period"] != billing_period
+            or machine["id"] in changed
+            or machine["state"] != "off"
+        )
+
+    def _prepare(self, machines, billing_period):
+        """Syncs the machine index with the given listing, initializes results and
+        collects state metrics. When work is sharded, only machines owned by this
+        worker are processed.
+
+        Returns:
+            A tuple ``(owned, stale)`` with the list of machines owned by this worker,
+            and the list of machines that require fresh utilization data.
+        """
+        owned = [machine for machine in machines if self.owns(machine["id"])]
+        added, removed, changed = self._sync_index(owned)
+        log.debug(
+            "Paperspace index: %d added, %d removed, %d changed",
+            len(added),
+            len(removed),
+            len(changed),
+        )
 
         # Metric: number of registered machines
-        self.results["hal.paperspace.machines.count"] = len(machines)
+        self.results = {}
+        if self.owns_aggregates():
+            self.results["hal.paperspace.machines.count"] = len(machines)
         self.results["hal.paperspace.machines.instance"] = []
         self.results["hal.paperspace.utilization.instance.usage_seconds"] = []
         self.results["hal.paperspace.utilization.instance.hourly_rate"] = []
         self.results["hal.paperspace.utilization.storage.monthly_rate"] = []
 
-        for machine in machines:
+        stale = []
+        for machine in owned:
             # Metric: state of the instance (off/ready)
             is_off = int(machine["state"] == "off")
             is_ready = int(machine["state"] == "ready")
@@ -77,19 +199,33 @@ class PaperspaceProbe(BaseProbe):
                     )
                 )
 
-            # Get machine utilization data for the machine with the given ID
-            url = "{}/{}".format(self.config["base_url"], "machines/getUtilization")
-            params = {"machineId": machine["id"], "billingMonth": billing_period}
-            response = requests.get(url, headers=headers, params=params)
+            entry = self.machines[machine["id"]]
+            if self._is_stale(machine, entry, billing_period, changed):
+                stale.append(machine)
 
-            # Skip the rest but log the error
-            if response.status_code != 200:
-                log.error(
-                    "Skip machine check. Server returns '{}'".format(response.text)
-                )
+        return owned, stale
+
+    def _utilization_request(self, machine, billing_period):
+        """Returns the URL and the query parameters to get machine utilization data."""
+        url = "{}/{}".format(self.config["base_url"], "machines/getUtilization")
+        params = {"machineId": machine["id"], "billingMonth": billing_period}
+        return url, params
+
+    def _store_billing(self, machine, billing, billing_period):
+        """Stores utilization data in the machine index. ``None`` means that the
+        utilization check failed, so the machine is skipped.
+        """
+        entry = self.machines[machine["id"]]
+        entry["billing"] = billing
+        entry["period"] = billing_period if billing is not None else None
+
+    def _collect_billing(self, machines):
+        """Collects utilization metrics from the machine index."""
+        for machine in machines:
+            billing = self.machines[machine["id"]]["billing"]
+            if billing is None:
                 continue
 
-            billing = response.json()
             # Metric: usage (in seconds) for the given machine
             self.results["hal.paperspace.utilization.instance.usage_seconds"].append(
                 (
@@ -114,4 +250,114 @@ class PaperspaceProbe(BaseProbe):
                 )
             )
 
+    def _run(self):
+        if not self.config["api_key"]:
+            # Bail out if the Paperspace API key is missing
+            return False, "run failed for missing Paperspace API key"
+
+        # Billing date for the current month (format: 2019-09)
+        billing_period = datetime.now().strftime("%Y-%m")
+
+        # Use Paperspace API key for authentication
+        headers = {self.config["header_key"]: self.config["api_key"]}
+
+        # List information about all machines available
+        machines, error = self._list_machines(headers)
+
+        # Bail out if we cannot retrieve the list of machines
+        if machines is None:
+            return False, "run failed. Server returns '{}'".format(error)
+
+        machines, stale = self._prepare(machines, billing_period)
+        for machine in stale:
+            # Get machine utilization data for the machine with the given ID
+            url, params = self._utilization_request(machine, billing_period)
+            try:
+                response = self._request(url, headers, params)
+            except DeadlineExceeded:
+                # Export what has been collected so far
+                log.warning("Skip remaining machines: deadline exceeded")
+                self.partial = True
+                break
+
+            # Skip the rest but log the error
+            if response.status_code != 200:
+                log.error(
+                    "Skip machine check. Server returns '{}'".format(response.text)
+                )
+                self._store_billing(machine, None, billing_period)
+                continue
+
+            self._store_billing(machine, response.json(), billing_period)
+
+        self._collect_billing(machines)
+        return True, None
+
+
+class AsyncPaperspaceProbe(AsyncBaseProbe, PaperspaceProbe):
+    """Asynchronous variant of ``PaperspaceProbe`` built on ``aiohttp``. Machines
+    utilization data is retrieved concurrently. An ``aiohttp.ClientSession`` can be
+    shared via the ``session`` config key, otherwise a session is created for each run.
+    """
+
+    async def _get(self, session, url, headers, params=None):
+        return await http.get_async(
+            session, url, headers, params, self.config["coalesce_ttl"], self.deadline
+        )
+
+    async def _list_machines(self, session, headers):
+        url = "{}/{}".format(self.config["base_url"], "machines/getMachines")
+        listing = self._listing()
+        params = next(listing)
+        while True:
+            status, text = await self._get(session, url, headers, params)
+            if status != 200:
+                return None, text
+            try:
+                params = listing.send(json.loads(text))
+            except StopIteration as e:
+                return e.value, None
+
+    async def _refresh(self, session, headers, machine, billing_period):
+        url, params = self._utilization_request(machine, billing_period)
+        status, text = await self._get(session, url, headers, params)
+        if status != 200:
+            log.error("Skip machine check. Server returns '{}'".format(text))
+            self._store_billing(machine, None, billing_period)
+        else:
+            self._store_billing(machine, json.loads(text), billing_period)
+
+    async def _run(self):
+        if not self.config["api_key"]:
+            return False, "run failed for missing Paperspace API key"
+
+        billing_period = datetime.now().strftime("%Y-%m")
+        headers = {self.config["header_key"]: self.config["api_key"]}
+
+        async with self._session() as session:
+            machines, error = await self._list_machines(session, headers)
+            if machines is None:
+                return False, "run failed. Server returns '{}'".format(error)
+
+            machines, stale = self._prepare(machines, billing_period)
+            try:
+                refreshed = await asyncio.gather(
+                    *(
+                        self._refresh(session, headers, m, billing_period)
+                        for m in stale
+                    ),
+                    return_exceptions=True,
+                )
+            except asyncio.CancelledError:
+                # Cancelled by the deadline: machines refreshed in time are exported
+                self._collect_billing(machines)
+                raise
+            for outcome in refreshed:
+                if isinstance(outcome, DeadlineExceeded):
+                    # Machines refreshed in time are exported anyway
+                    self.partial = True
+                elif isinstance(outcome, BaseException):
+                    raise outcome
+
+        self._collect_billing(machines)
         return True, None
@@ -1,7 +1,8 @@
+import json
 import logging
-import requests
 
-from .base import BaseProbe
+from .base import AsyncBaseProbe, BaseProbe
+from .. import http
 
 
 log = logging.getLogger(__name__)
@@ -12,12 +13,14 @@ class ParsecProbe(BaseProbe):
     A session ID (access token) is required to authorize the user. The API
     is not officially supported, so the probe may break. A valid session ID can be
     extracted from a browser session, under the `parsec_login` secure cookie.
+    Responses are reused for ``coalesce_ttl`` seconds (see ``hal.http.get``).
     """
 
     DEFAULTS = {
         "session_id": None,
         "url": "https://parsecgaming.com/v1/me",
         "header_key": "X-Parsec-Session-Id",
+        "coalesce_ttl": 0,
     }
 
     def _run(self):
@@ -27,7 +30,12 @@ class ParsecProbe(BaseProbe):
 
         # Call Parsec API to scrape data
         headers = {self.config["header_key"]: self.config["session_id"]}
-        response = requests.get(self.config["url"], headers=headers)
+        response = http.get(
+            self.config["url"],
+            headers=headers,
+            ttl=self.config["coalesce_ttl"],
+            deadline=self.deadline,
+        )
 
         if response.status_code == 200:
             json_resp = response.json()
@@ -38,3 +46,32 @@ class ParsecProbe(BaseProbe):
             return True, None
         else:
             return False, "run failed. Server returns '{}'".format(response.text)
+
+
+class AsyncParsecProbe(AsyncBaseProbe, ParsecProbe):
+    """Asynchronous variant of ``ParsecProbe`` built on ``aiohttp``. An
+    ``aiohttp.ClientSession`` can be shared via the ``session`` config key.
+    """
+
+    async def _run(self):
+        if not self.config["session_id"]:
+            return False, "run failed for missing 'session_id'"
+
+        headers = {self.config["header_key"]: self.config["session_id"]}
+        async with self._session() as session:
+            status, text = await http.get_async(
+                session,
+                self.config["url"],
+                headers,
+                ttl=self.config["coalesce_ttl"],
+                deadline=self.deadline,
+            )
+        if status != 200:
+            return False, "run failed. Server returns '{}'".format(text)
+
+        json_resp = json.loads(text)
+        self.results = {
+            "hal.parsec.play_time": json_resp["play_time"],
+            "hal.parsec.credits": json_resp["credits"],
+        }
+        return True, None
@@ -0,0 +1,127 @@
+import json
+import logging
+
+from .base import AsyncBaseProbe, BaseProbe
+from .. import http, jsonpath
+
+
+log = logging.getLogger(__name__)
+
+
+def compile_rules(rules):
+    """Compiles extraction rules in ``(metric, each, value, tags)`` tuples, where
+    ``each`` and ``value`` are accessors and ``tags`` is a list of ``(name, accessor)``.
+
+    Raises:
+        ValueError: If a rule is not valid.
+    """
+    compiled = []
+    for rule in rules:
+        if "metric" not in rule or "path" not in rule:
+            raise ValueError("a rule requires the 'metric' and 'path' keys")
+        each = jsonpath.compile(rule["each"]) if rule.get("each") else None
+        tags = [
+            (name, jsonpath.compile(path))
+            for name, path in (rule.get("tags") or {}).items()
+        ]
+        compiled.append((rule["metric"], each, jsonpath.compile(rule["path"]), tags))
+    return compiled
+
+
+class RestProbe(BaseProbe):
+    """RestProbe collects metrics from any JSON API, without code. The probe sends a
+    GET request to ``url`` with the given ``headers`` (e.g. the authorization header)
+    and ``params``, and extracts metrics from the response with a list of ``rules``:
+
+        {
+            "metric": "hal.paperspace.machine.usage",
+            "each": "$.machines[*]",
+            "path": "$.usage",
+            "tags": {"machine_id": "$.id", "state": "$.state"}
+        }
+
+    ``path`` and ``tags`` are JSONPath-like expressions (see ``hal.jsonpath``) that
+    are evaluated on the response, or on each item matched by the optional ``each``
+    path. Every numeric value matched by ``path`` is a data point, tagged with
+    ``name:value`` for each tag found in the same item. Rules are compiled when the
+    probe is created, so each run only walks the decoded response. ``coalesce_ttl`` is
+    passed to ``hal.http.get``.
+    """
+
+    DEFAULTS = {
+        "url": None,
+        "headers": None,
+        "params": None,
+        "rules": [],
+        "coalesce_ttl": 0,
+    }
+
+    def __init__(self, config=None):
+        super().__init__(config)
+        self.rules = compile_rules(self.config["rules"])
+
+    def _extract(self, document):
+        results = {}
+        for metric, each, value, tags in self.rules:
+            items = each(document) if each is not None else [document]
+            points = results.setdefault(metric, [])
+            for item in items:
+                point_tags = []
+                for name, accessor in tags:
+                    found = accessor(item)
+                    if found:
+                        point_tags.append("{}:{}".format(name, found[0]))
+
+                for point in value(item):
+                    if isinstance(point, (int, float)):
+                        points.append((point, point_tags))
+                    else:
+                        log.debug(
+                            "RestProbe: skipping '%s', value '%s' is not a number",
+                            metric,
+                            point,
+                        )
+        return {metric: points for metric, points in results.items() if points}
+
+    def _run(self):
+        if not self.config["url"]:
+            return False, "run failed for missing 'url'"
+
+        response = http.get(
+            self.config["url"],
+            headers=self.config["headers"],
+            params=self.config["params"],
+            ttl=self.config["coalesce_ttl"],
+            deadline=self.deadline,
+        )
+        if response.status_code != 200:
+            return False, "run failed. Server returns '{}'".format(response.text)
+
+        self.results = self._extract(response.json())
+        return True, None
+
+
+class AsyncRestProbe(AsyncBaseProbe, RestProbe):
+    """Asynchronous variant of ``RestProbe`` built on ``aiohttp``. An
+    ``aiohttp.ClientSession`` can be shared via the ``session`` config key.
+    """
+
+    async def _run(self):
+        if not self.config["url"]:
+            return False, "run failed for missing 'url'"
+
+        async with self._session() as session:
+            status, text = await http.get_async(
+                session,
+                self.config["url"],
+                self.config["headers"],
+                self.config["params"],
+                ttl=self.config["coalesce_ttl"],
+                deadline=self.deadline,
+            )
+
+        if status != 200:
+            return False, "run failed. Server returns '{}'".format(text)
+
+        self.results = self._extract(json.loads(text))
+        return True, None
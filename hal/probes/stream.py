@@ -0,0 +1,87 @@
+import asyncio
+import logging
+
+from .base import AsyncBaseProbe
+
+
+log = logging.getLogger(__name__)
+
+
+class StreamProbe(AsyncBaseProbe):
+    """Defines a base `Probe` for sources that push updates over a long-lived connection,
+    instead of being polled. This class must be extended and the following method must
+    be implemented:
+      * ``_stream()``: coroutine that connects to the source and calls ``collect()`` for
+        each received update. It returns ``(status, msg)`` like ``_run()``.
+
+    Updates are coalesced by metric and tags, so only the latest value of each series is
+    kept, and flushed to exporters in micro-batches every ``flush_interval`` seconds.
+    When ``duration`` is set, the stream is closed after that many seconds; otherwise
+    it runs until the connection drops. Pending updates are always flushed before
+    ``run()`` returns, so calling ``export()`` afterwards only flushes leftovers.
+
+    Child classes must extend ``StreamProbe.DEFAULTS`` in their own ``DEFAULTS``.
+    """
+
+    DEFAULTS = {"flush_interval": 1.0, "duration": None}
+
+    def __init__(self, config=None):
+        super().__init__(config)
+        self._pending = {}
+
+    def collect(self, metric, value, tags):
+        """Stores an update that is exported with the next micro-batch. Updates for
+        the same metric and tags replace the pending value.
+        """
+        self._pending[(metric, tuple(tags))] = value
+
+    async def _stream(self):
+        """Defines the stream logic.
+
+        Raises:
+            NotImplementedError: the class must be extended to be used.
+        """
+        raise NotImplementedError()
+
+    async def _flush_safely(self):
+        """Flushes pending updates, logging exporter errors so that a failing export
+        doesn't stop the stream. The failed batch is dropped.
+        """
+        try:
+            await self.flush()
+        except Exception:
+            log.exception("%s: unable to export a batch", self.__class__.__name__)
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.config["flush_interval"])
+            await self._flush_safely()
+
+    async def flush(self):
+        """Exports pending updates as a single batch."""
+        if not self._pending:
+            return
+
+        batch = {}
+        pending, self._pending = self._pending, {}
+        for (metric, tags), value in pending.items():
+            batch.setdefault(metric, []).append((value, list(tags)))
+
+        self.results = batch
+        await super().export()
+
+    async def export(self):
+        await self.flush()
+
+    async def _run(self):
+        flusher = asyncio.ensure_future(self._flush_periodically())
+        try:
+            if self.config["duration"] is None:
+                return await self._stream()
+            try:
+                return await asyncio.wait_for(self._stream(), self.config["duration"])
+            except asyncio.TimeoutError:
+                return True, None
+        finally:
+            flusher.cancel()
+            await self._flush_safely()
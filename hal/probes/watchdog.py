@@ -1,11 +1,66 @@
+import re
+import time
 import logging
 import subprocess
 
 from .base import BaseProbe
+from ..deadline import DeadlineExceeded
+from ..sketches import DDSketch
 
 
 log = logging.getLogger(__name__)
 
+MAC_ADDRESS = re.compile(r"^([0-9a-f]{2}:){5}[0-9a-f]{2}$", re.IGNORECASE)
+PING_RTT = re.compile(rb"time[=<]([0-9.]+) ?ms")
+QUANTILES = (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))
+
+# ARP entry flag for completed (resolved) entries
+ATF_COM = 0x2
+# Neighbour states (NUD) of hosts that answered recently, or that are being confirmed
+REACHABLE_STATES = {"REACHABLE", "DELAY", "PROBE"}
+
+
+def parse_neighbours(output):
+    """Parses the kernel neighbour table as printed by ``ip neigh show``, e.g.
+    ``192.168.1.10 dev eth0 lladdr aa:bb:cc:dd:ee:01 REACHABLE``.
+
+    Returns:
+        A set with IP and MAC addresses (lowercase) of neighbours in one of the
+        ``REACHABLE_STATES``. ``STALE`` entries are skipped, because the kernel keeps
+        them for minutes after a host has left the network.
+    """
+    neighbours = set()
+    for line in output.splitlines():
+        fields = line.split()
+        if not fields or fields[-1] not in REACHABLE_STATES:
+            continue
+        neighbours.add(fields[0].lower())
+        if "lladdr" in fields:
+            neighbours.add(fields[fields.index("lladdr") + 1].lower())
+    return neighbours
+
+
+def read_neighbours(path):
+    """Reads the kernel neighbour table in the ``/proc/net/arp`` format.
+
+    This format doesn't include the neighbour state: ``STALE`` entries of hosts that
+    left the network are still flagged as resolved, so they're detected as present
+    until the kernel garbage collects them (usually a few minutes later).
+
+    Returns:
+        A set with IP and MAC addresses (lowercase) of resolved neighbours.
+    """
+    neighbours = set()
+    with open(path) as f:
+        next(f, None)
+        for line in f:
+            fields = line.split()
+            if len(fields) < 4 or not int(fields[2], 16) & ATF_COM:
+                continue
+            neighbours.add(fields[0])
+            neighbours.add(fields[3].lower())
+    return neighbours
+
 
 class WatchdogProbe(BaseProbe):
     """WatchdogProbe Probe detects if a list of hosts are connected to the
@@ -17,12 +72,182 @@ class WatchdogProbe(BaseProbe):
     checking the return code. `subprocess` is used
     The Probe collects the following metrics:
         * Number of connected hosts from the given list
+
+    When ``passive`` is enabled, the kernel neighbour table is read once with
+    ``ip neigh show`` and hosts with a ``REACHABLE``, ``DELAY`` or ``PROBE`` entry are
+    detected without sending any packet; ``STALE`` entries are not trusted and
+    IP addresses are pinged instead. If ``neighbour_table`` is set to a file in the
+    ``/proc/net/arp`` format, it's read instead of running ``ip``: that format has no
+    neighbour state, so hosts that left the network are detected as present until
+    their entry expires.
+    In passive mode, addresses can also be MAC addresses (e.g. ``aa:bb:cc:dd:ee:ff``).
+    Only IP addresses and hostnames that are not resolved in the table are pinged.
+
+    Presence is tracked per host (``self.presence``) with a state machine, so that a
+    single lost packet doesn't flip the result:
+        * ``home_after``: consecutive detections required to mark a host as home.
+        * ``away_after``: seconds since the host was last seen before it's marked away.
+        * ``fresh_for``: seconds after a detection where a home host is not probed again.
+    Defaults report the outcome of the current check only.
+
+    The round-trip time measured by ``ping`` is added to quantile sketches (``DDSketch``)
+    per host and per tag name, that use bounded memory whatever the number of samples.
+    Sketches are reset every ``rtt_window`` seconds, and the following metrics are
+    reported for the current window:
+        * ``hal.watchdog.rtt.{p50,p95,p99,avg,count}`` with the ``name`` tag
+        * ``hal.watchdog.host.rtt.{p50,p95,p99,avg,count}`` with ``host`` and ``name`` tags
+
+    With a run deadline, each ``ping`` is limited to the remaining budget; when it's
+    used up, hosts that were not checked keep their last known state and results are
+    exported as partial.
+
+    With a ``membership`` config, hosts are sharded across workers by tag name, so
+    that the hosts of a name are checked by the same worker and each
+    ``detected_hosts`` count is reported exactly once.
+
+    The presence state and the RTT sketches are the probe snapshot, so they're kept
+    across invocations when a snapshot store is configured. Sketches are stored with
+    ``DDSketch.to_dict()`` and can be merged with sketches of other probes.
     """
 
     DEFAULTS = {
         "hosts": [],
+        "passive": False,
+        "neighbour_table": None,
+        "home_after": 1,
+        "away_after": 0,
+        "fresh_for": 0,
+        "rtt_window": 3600,
+        "rtt_accuracy": 0.01,
     }
 
+    def __init__(self, config=None):
+        super().__init__(config)
+        self.presence = {}
+        self.sketches = {}
+        self.window_start = None
+
+    def snapshot(self):
+        return {
+            "presence": self.presence,
+            "sketches": {k: v.to_dict() for k, v in self.sketches.items()},
+            "window_start": self.window_start,
+        }
+
+    def restore(self, state):
+        self.presence = state["presence"]
+        self.sketches = {
+            k: DDSketch.from_dict(v) for k, v in state.get("sketches", {}).items()
+        }
+        self.window_start = state.get("window_start")
+
+    def _neighbours(self):
+        """Returns resolved neighbours if passive mode is enabled."""
+        if not self.config["passive"]:
+            return set()
+
+        try:
+            if self.config["neighbour_table"]:
+                return read_neighbours(self.config["neighbour_table"])
+
+            process = subprocess.run(
+                ["ip", "neigh", "show"],
+                capture_output=True,
+                check=True,
+                timeout=self._timeout(),
+            )
+            return parse_neighbours(process.stdout.decode())
+        except (OSError, ValueError, subprocess.SubprocessError) as e:
+            log.warning("Probe watchdog: unable to read the neighbour table: %s", e)
+            return set()
+
+    def _check(self, address, neighbours):
+        """Checks if the host is connected to the network.
+
+        Returns:
+            A tuple ``(found, rtt)`` where ``rtt`` is the round-trip time in
+            milliseconds, if measured.
+        """
+        if address.lower() in neighbours:
+            return True, None
+        if MAC_ADDRESS.match(address):
+            # MAC addresses can be detected only passively
+            return False, None
+
+        # Ping the host to check if present in the network
+        try:
+            process = subprocess.run(
+                ["ping", "-c", "1", address],
+                capture_output=True,
+                timeout=self._timeout(),
+            )
+        except subprocess.TimeoutExpired as e:
+            raise DeadlineExceeded() from e
+        if process.returncode != 0:
+            return False, None
+
+        match = None
+        if isinstance(process.stdout, bytes):
+            match = PING_RTT.search(process.stdout)
+        return True, float(match.group(1)) if match else None
+
+    def _record_rtt(self, address, name, rtt):
+        for key in ("host:{}|name:{}".format(address, name), "name:{}".format(name)):
+            sketch = self.sketches.get(key)
+            if sketch is None:
+                sketch = self.sketches[key] = DDSketch(self.config["rtt_accuracy"])
+            sketch.add(rtt)
+
+    def _collect_rtt(self):
+        """Collects RTT metrics from sketches of the current window."""
+        for key, sketch in self.sketches.items():
+            if not self.owns(key.rsplit("name:", 1)[1]):
+                # Owned by another worker after a rebalance
+                continue
+            if key.startswith("host:"):
+                metric = "hal.watchdog.host.rtt"
+                tags = key.split("|")
+            else:
+                metric = "hal.watchdog.rtt"
+                tags = [key]
+
+            for suffix, q in QUANTILES:
+                self.results.setdefault("{}.{}".format(metric, suffix), []).append(
+                    (sketch.quantile(q), tags)
+                )
+            self.results.setdefault("{}.avg".format(metric), []).append(
+                (sketch.sum / sketch.count, tags)
+            )
+            self.results.setdefault("{}.count".format(metric), []).append(
+                (sketch.count, tags)
+            )
+
+    def _update(self, state, address, name, neighbours, now):
+        """Updates the host presence state, probing the host only if needed."""
+        if (
+            state["home"]
+            and self.config["fresh_for"]
+            and now - state["last_seen"] < self.config["fresh_for"]
+        ):
+            return
+
+        found, rtt = self._check(address, neighbours)
+        if rtt is not None:
+            self._record_rtt(address, name, rtt)
+
+        if found:
+            state["hits"] += 1
+            state["last_seen"] = now
+            if state["hits"] >= self.config["home_after"]:
+                state["home"] = True
+            return
+
+        # Keep debug information with `ping` stdout
+        log.debug("Probe watchdog: host '%s' not found", address)
+        state["hits"] = 0
+        if state["home"] and now - state["last_seen"] >= self.config["away_after"]:
+            state["home"] = False
+
     def _run(self):
         if not self.config["hosts"]:
             # Bail out if hosts are not defined
@@ -30,18 +255,43 @@ class WatchdogProbe(BaseProbe):
 
         # Dict used to aggregate results instead of extra iterations
         detected_hosts = {}
+        neighbours = self._neighbours()
+        now = time.time()
+        presence = {}
+
+        # Start a new RTT window
+        if (
+            self.window_start is None
+            or now - self.window_start >= self.config["rtt_window"]
+        ):
+            self.sketches = {}
+            self.window_start = now
 
         for host in self.config["hosts"]:
-            # Ping the host to check if present in the network
             address, name = host
-            process = subprocess.run(["ping", "-c", "1", address], capture_output=True)
-            if process.returncode == 0:
+            if not self.owns(name):
+                continue
+            key = "{}|{}".format(address, name)
+            state = presence[key] = self.presence.get(key) or {
+                "home": False,
+                "last_seen": None,
+                "hits": 0,
+            }
+            if not self.partial:
+                try:
+                    self._update(state, address, name, neighbours, now)
+                except DeadlineExceeded:
+                    # Remaining hosts keep their last known state
+                    log.warning("Probe watchdog: deadline exceeded at '%s'", address)
+                    self.partial = True
+            if state["home"]:
                 check = detected_hosts.get(name) or (0, [name])
                 detected_hosts[name] = (check[0] + 1, check[1])
-            else:
-                # Keep debug information with `ping` stdout
-                log.debug("Probe watchdog: host '%s' not found", address)
+
+        # Hosts removed from the configuration are forgotten
+        self.presence = presence
 
         # Metric: number of detected hosts by tag (name)
-        self.results["hal.watchdog.detected_hosts"] = list(detected_hosts.values())
+        self.results = {"hal.watchdog.detected_hosts": list(detected_hosts.values())}
+        self._collect_rtt()
         return True, None
@@ -0,0 +1,134 @@
+import hmac
+import time
+import asyncio
+import logging
+
+from aiohttp import web
+
+from .stream import StreamProbe
+
+
+log = logging.getLogger(__name__)
+
+NUMBERS = (int, float)
+
+
+def validate(point):
+    """Validates a pushed data point. The expected format is:
+
+        {"metric": "hal.alarm.armed", "value": 1, "tags": ["area:home"], "timestamp": 1600000000}
+
+    where ``tags`` and ``timestamp`` are optional.
+
+    Returns:
+        An error message, or ``None`` if the point is valid.
+    """
+    if not isinstance(point, dict):
+        return "point must be an object"
+    if not isinstance(point.get("metric"), str):
+        return "'metric' must be a string"
+    if not isinstance(point.get("value"), NUMBERS):
+        return "'value' must be a number"
+    tags = point.get("tags", [])
+    if not isinstance(tags, list) or not all(isinstance(tag, str) for tag in tags):
+        return "'tags' must be a list of strings"
+    if not isinstance(point.get("timestamp", 0), NUMBERS):
+        return "'timestamp' must be a number"
+    return None
+
+
+class WebhookProbe(StreamProbe):
+    """WebhookProbe runs an embedded HTTP endpoint where external systems (e.g. alarm
+    panels or Home Assistant automations) push data points, instead of being polled.
+    Each source has its own bearer token and its own backpressure limit:
+
+        "sources": {
+            "alarm": {"token": "secret", "max_pending": 1000},
+        }
+
+    Sources send a JSON list of points (see ``validate()``) with a POST request to
+    ``/ingest/<source>`` and the ``Authorization: Bearer <token>`` header. Points are
+    tagged with ``source:<name>`` and exported in micro-batches as ``(timestamp, value)``
+    points through the configured exporters. When a source has more than ``max_pending``
+    points waiting for the next flush, requests are refused with a 429 status code, so
+    a noisy source can't exhaust memory or starve other sources.
+    """
+
+    DEFAULTS = {
+        **StreamProbe.DEFAULTS,
+        "host": "127.0.0.1",
+        "port": 8080,
+        "sources": {},
+        "max_body_size": 1024 * 1024,
+    }
+
+    def __init__(self, config=None):
+        super().__init__(config)
+        self.port = None
+        self._depth = {}
+
+    async def flush(self):
+        self._depth = {}
+        await super().flush()
+
+    def _ingest(self, source, points):
+        now = time.time()
+        source_tag = ("source:{}".format(source),)
+        for point in points:
+            key = (point["metric"], tuple(point.get("tags", [])) + source_tag)
+            self._pending.setdefault(key, []).append(
+                (point.get("timestamp", now), point["value"])
+            )
+        self._depth[source] = self._depth.get(source, 0) + len(points)
+
+    async def _handle(self, request):
+        source = request.match_info["source"]
+        config = self.config["sources"].get(source)
+        if config is None:
+            return web.json_response({"error": "unknown source"}, status=404)
+
+        expected = "Bearer {}".format(config["token"])
+        if not hmac.compare_digest(request.headers.get("Authorization", ""), expected):
+            return web.json_response({"error": "unauthorized"}, status=401)
+
+        try:
+            points = await request.json()
+        except ValueError:
+            return web.json_response({"error": "body must be JSON"}, status=400)
+        if not isinstance(points, list):
+            return web.json_response({"error": "body must be a list"}, status=400)
+
+        for index, point in enumerate(points):
+            error = validate(point)
+            if error is not None:
+                return web.json_response({"error": error, "index": index}, status=400)
+
+        max_pending = config.get("max_pending", 1000)
+        if self._depth.get(source, 0) + len(points) > max_pending:
+            log.warning("WebhookProbe: source '%s' is over capacity", source)
+            return web.json_response(
+                {"error": "too many pending points"},
+                status=429,
+                headers={"Retry-After": str(int(self.config["flush_interval"]) or 1)},
+            )
+
+        self._ingest(source, points)
+        return web.json_response({"accepted": len(points)}, status=202)
+
+    async def _stream(self):
+        if not self.config["sources"]:
+            # Bail out if no source can push data
+            return False, "run failed for missing 'sources'"
+
+        app = web.Application(client_max_size=self.config["max_body_size"])
+        app.router.add_post("/ingest/{source}", self._handle)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        try:
+            site = web.TCPSite(runner, self.config["host"], self.config["port"])
+            await site.start()
+            self.port = site._server.sockets[0].getsockname()[1]
+            log.info("WebhookProbe: listening on port %d", self.port)
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
@@ -0,0 +1,109 @@
+"""Profiling helpers to find where the time of a probe run goes. ``Profiler`` combines:
+  * ``cProfile``: deterministic profile of the calling thread, as hotspot tables.
+  * A sampler thread that records the stack of every thread, so that work done in
+    executors (e.g. ``MultiAccountProbe`` accounts) is visible too. Stacks are reported
+    in the collapsed format used by flamegraph tools (``flamegraph.pl``, speedscope).
+  * ``tracemalloc``: top allocation sites.
+
+Usage:
+    with Profiler() as profiler:
+        probe.run()
+        probe.export()
+    print(profiler.hotspots())
+"""
+import io
+import sys
+import pstats
+import cProfile
+import threading
+import tracemalloc
+
+from collections import Counter
+
+
+class Profiler(object):
+    """Profiles the code executed in the ``with`` block. Sampling requires
+    ``sys._current_frames()`` and is disabled when it's not available or when
+    ``interval`` is ``None``. ``frames`` is the number of frames kept for each
+    allocation site.
+    """
+
+    def __init__(self, interval=0.005, frames=10):
+        self.interval = interval
+        self.frames = frames
+        self.profile = cProfile.Profile()
+        self.samples = Counter()
+        self.snapshot = None
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        tracemalloc.start(self.frames)
+        if self.interval and hasattr(sys, "_current_frames"):
+            self._sampler = threading.Thread(
+                target=self._sample, name="hal-profiler", daemon=True
+            )
+            self._sampler.start()
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        self.snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__)]
+        )
+        tracemalloc.stop()
+
+    def _sample(self):
+        current = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == current:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(
+                        "{} ({}:{})".format(
+                            code.co_name, code.co_filename, code.co_firstlineno
+                        )
+                    )
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+
+    def hotspots(self, sort="cumulative", limit=25):
+        """Returns the cProfile table of the top ``limit`` functions."""
+        output = io.StringIO()
+        stats = pstats.Stats(self.profile, stream=output)
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+        return output.getvalue()
+
+    def collapsed(self):
+        """Returns sampled stacks in the collapsed format (``frame;frame;frame count``)."""
+        return "".join(
+            "{} {}\n".format(stack, count)
+            for stack, count in sorted(self.samples.items())
+        )
+
+    def allocations(self, limit=10):
+        """Returns the top ``limit`` allocation sites, by allocated size."""
+        if self.snapshot is None:
+            return ""
+        lines = []
+        for stat in self.snapshot.statistics("lineno")[:limit]:
+            frame = stat.traceback[0]
+            lines.append(
+                "{:>10.1f} KiB {:>8} blocks  {}:{}\n".format(
+                    stat.size / 1024, stat.count, frame.filename, frame.lineno
+                )
+            )
+        return "".join(lines)
@@ -0,0 +1,110 @@
+import os
+import asyncio
+import logging
+
+from . import config
+
+
+log = logging.getLogger(__name__)
+
+
+class ConfigWatcher(object):
+    """ConfigWatcher keeps the probes of a ``Runner`` in sync with a configuration
+    file (see ``hal.config``), so that probes can be added or changed without
+    restarting the process. The file is polled every ``interval`` seconds, and when
+    it changes definitions are compared by name with the loaded ones:
+      * new definitions are built and added to the runner.
+      * changed definitions are rebuilt and replace the previous probe.
+      * removed definitions are removed from the runner.
+
+    Unchanged probes are kept as they are, with their sessions and in-memory state.
+    Running probes are not interrupted: changes apply from the next run. Exporters
+    of replaced or removed probes are flushed and closed once their run in progress
+    is completed. A definition that can't be
+    built is logged and the previous probe is kept; the same happens for the whole
+    file if it's not valid. Definitions with ``"isolated": true`` are executed in
+    the runner process pool.
+
+    Usage:
+        runner = Runner()
+        watcher = ConfigWatcher("hal.json", runner)
+        watcher.reload()
+        await asyncio.gather(runner.serve(60), watcher.watch())
+    """
+
+    def __init__(self, path, runner, interval=1.0):
+        self.path = path
+        self.runner = runner
+        self.interval = interval
+        self.definitions = {}
+        self.probes = {}
+        self._signature = None
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            # The file may be briefly missing while it's atomically replaced
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def changed(self):
+        """Returns ``True`` if the file changed since the last reload."""
+        signature = self._stat()
+        return signature is not None and signature != self._signature
+
+    def reload(self):
+        """Loads the file and applies changed definitions to the runner.
+
+        Returns:
+            The list of names of added, changed and removed definitions.
+        Raises:
+            ConfigError: If the file is not valid; the runner is not changed.
+        """
+        self._signature = self._stat()
+        definitions = config.load(self.path)
+
+        updated = []
+        for name in list(self.definitions):
+            if name not in definitions:
+                probe = self.probes.pop(name)
+                del self.definitions[name]
+                self.runner.remove(probe, close=True)
+                updated.append(name)
+                log.info("ConfigWatcher: probe '%s' removed", name)
+
+        for name, definition in definitions.items():
+            if self.definitions.get(name) == definition:
+                continue
+
+            try:
+                probe = config.build(definition)
+            except config.ConfigError as e:
+                log.error("ConfigWatcher: unable to build '%s': %s", name, e)
+                continue
+
+            isolated = bool(definition.get("isolated"))
+            previous = self.probes.get(name)
+            if previous is None:
+                self.runner.add(probe, isolated=isolated, name=name)
+                log.info("ConfigWatcher: probe '%s' added", name)
+            else:
+                self.runner.replace(previous, probe, isolated=isolated, close=True)
+                log.info("ConfigWatcher: probe '%s' reloaded", name)
+            self.probes[name] = probe
+            self.definitions[name] = definition
+            updated.append(name)
+        return updated
+
+    async def watch(self):
+        """Polls the file every ``interval`` seconds and reloads it when it changes,
+        forever.
+        """
+        while True:
+            await asyncio.sleep(self.interval)
+            if not self.changed():
+                continue
+            try:
+                self.reload()
+            except config.ConfigError as e:
+                log.error("ConfigWatcher: configuration not reloaded: %s", e)
@@ -0,0 +1,292 @@
+import os
+import time
+import asyncio
+import logging
+import marshal
+
+from concurrent.futures import ProcessPoolExecutor
+
+from .deadline import Deadline
+from .health import ProbeStats
+from .probes.base import AsyncBaseProbe
+from .probes.stream import StreamProbe
+
+
+log = logging.getLogger(__name__)
+
+
+def _close_exporters(probe):
+    """Flushes and closes exporters that buffer data (e.g. ``FileExporter``)."""
+    for exporter in probe.config.get("exporters") or []:
+        close = getattr(exporter, "close", None)
+        if close is not None:
+            try:
+                close()
+            except Exception:
+                log.exception("Runner: unable to close %s", exporter.__class__.__name__)
+
+
+def _run_isolated(probe_class, config, budget=None):
+    """Runs a probe in a worker process. Results are returned serialized with
+    ``marshal``, that is compact and fast for the builtin types used by probe results.
+    ``budget`` is the seconds left before the run deadline, if any.
+    """
+    probe = probe_class(config)
+    deadline = Deadline(budget) if budget is not None else None
+    if isinstance(probe, AsyncBaseProbe):
+        status = asyncio.run(probe.run(deadline))
+    else:
+        status = probe.run(deadline)
+    return marshal.dumps((status, probe.results, probe.partial))
+
+
+class Runner(object):
+    """Runner executes a set of probes concurrently from a single asyncio event loop.
+    ``AsyncBaseProbe`` instances are awaited in the loop, while synchronous ``BaseProbe``
+    instances are executed in the loop executor so that blocking calls don't stall
+    other probes. After each run, probe results are exported.
+
+    Usage:
+        runner = Runner([AsyncPaperspaceProbe(config), WatchdogProbe(config)])
+
+        # Run all probes once
+        runner.run()
+
+        # Run all probes every 60 seconds
+        runner.run(interval=60)
+
+    Probes that are CPU or subprocess heavy can be isolated in a pool of ``processes``
+    worker processes, so they run in parallel across cores. An isolated probe is built
+    in the worker from its class and config (exporters excluded), and its results are
+    sent back to the parent where they are merged and exported. Because the probe
+    instance is rebuilt in the worker, in-memory state is not kept across runs unless
+    a ``snapshot_store`` is configured.
+
+    Usage:
+        runner = Runner(processes=2)
+        runner.add(WatchdogProbe(config), isolated=True)
+        runner.run()
+
+    When ``deadline`` (seconds) is set, each run shares a ``Deadline`` of that budget:
+    probes that are still running when it's used up are cancelled, and their partial
+    results are exported.
+
+    Probes can be added, replaced or removed while the runner is serving (see
+    ``hal.reload.ConfigWatcher``): changes apply from the next run. Exporters of
+    removed or replaced probes can be closed, once their run in progress completes.
+
+    Each run is recorded in the ``ProbeStats`` of the probe (see ``stats``), that can
+    be inspected with ``hal.health.HealthServer``.
+
+    When serving, ``StreamProbe`` instances are not polled: each one is started once
+    as a long-lived task, and restarted ``restart_delay`` seconds after its stream
+    stops or fails. Removed or replaced stream probes are cancelled.
+    """
+
+    def __init__(
+        self,
+        probes=None,
+        executor=None,
+        processes=None,
+        deadline=None,
+        restart_delay=5.0,
+    ):
+        self.probes = list(probes or [])
+        self.isolated = []
+        self.executor = executor
+        self.processes = processes
+        self.deadline = deadline
+        self.restart_delay = restart_delay
+        self.stats = {}
+        self._names = {}
+        self._running = set()
+        self._retired = set()
+        self._streams = {}
+        self._pool = None
+
+    def name(self, probe):
+        """Returns the name of a probe, or its class name if it was added without."""
+        return self._names.get(probe) or probe.__class__.__name__
+
+    def add(self, probe, isolated=False, name=None):
+        """Registers a probe in the runner. If ``isolated`` is set, the probe is
+        executed in the process pool.
+        """
+        self.probes.append(probe)
+        if isolated:
+            self.isolated.append(probe)
+        if name is not None:
+            self._names[probe] = name
+
+    def _retire(self, probe, close):
+        """Closes the exporters of an unregistered probe, or defers it until its run
+        in progress is completed and exported. Stream probes are cancelled.
+        """
+        stream = self._streams.pop(probe, None)
+        if stream is not None:
+            stream.cancel()
+        if not close:
+            return
+        if probe in self._running:
+            self._retired.add(probe)
+        else:
+            _close_exporters(probe)
+
+    def remove(self, probe, close=False):
+        """Unregisters a probe. A run in progress is not interrupted, and the probe
+        is not executed in the following runs; a running stream probe is cancelled
+        instead, as its run never completes. If ``close`` is set, the probe
+        exporters are closed after its last run; don't set it for exporters that
+        are shared with other probes.
+        """
+        self.probes = [p for p in self.probes if p is not probe]
+        self.isolated = [p for p in self.isolated if p is not probe]
+        self.stats.pop(probe, None)
+        self._names.pop(probe, None)
+        self._retire(probe, close)
+
+    def replace(self, old, new, isolated=False, close=False):
+        """Replaces a registered probe with a new one, in the same position. A run in
+        progress is not interrupted, and the new probe is executed from the next run.
+        ``close`` has the same meaning of ``remove()``.
+        """
+        self.probes = [new if p is old else p for p in self.probes]
+        self.isolated = [p for p in self.isolated if p is not old]
+        if isolated:
+            self.isolated.append(new)
+        self.stats.pop(old, None)
+        name = self._names.pop(old, None)
+        if name is not None:
+            self._names[new] = name
+        self._retire(old, close)
+
+    def _process_pool(self):
+        """Returns the process pool, forking all workers in advance so that the
+        first run doesn't pay the startup cost.
+        """
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.processes)
+            for future in [
+                self._pool.submit(os.getpid)
+                for _ in range(self.processes or os.cpu_count())
+            ]:
+                future.result()
+        return self._pool
+
+    async def _execute_isolated(self, probe, deadline):
+        """Runs a probe in the process pool and stores its results in the probe."""
+        loop = asyncio.get_running_loop()
+        config = {k: v for k, v in probe.config.items() if k != "exporters"}
+        budget = deadline.remaining() if deadline is not None else None
+        payload = await loop.run_in_executor(
+            self._process_pool(), _run_isolated, probe.__class__, config, budget
+        )
+        status, probe.results, probe.partial = marshal.loads(payload)
+        await loop.run_in_executor(self.executor, probe.export)
+        return status
+
+    def close(self):
+        """Shuts down the process pool, if any."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    async def _execute(self, probe, deadline=None):
+        """Runs and exports a single probe. Exceptions are logged so that a failing
+        probe doesn't stop the others.
+        """
+        loop = asyncio.get_running_loop()
+        started, clock = time.time(), time.monotonic()
+        self._running.add(probe)
+        try:
+            if any(probe is isolated for isolated in self.isolated):
+                status = await self._execute_isolated(probe, deadline)
+            elif isinstance(probe, AsyncBaseProbe):
+                status = await probe.run(deadline)
+                await probe.export()
+            else:
+                status = await loop.run_in_executor(self.executor, probe.run, deadline)
+                await loop.run_in_executor(self.executor, probe.export)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            log.exception("Runner: %s raised an exception", probe.__class__.__name__)
+            status = False
+        finally:
+            self._running.discard(probe)
+            if probe in self._retired:
+                # Also when a removed stream probe is cancelled
+                self._retired.discard(probe)
+                await loop.run_in_executor(self.executor, _close_exporters, probe)
+
+        if not any(probe is registered for registered in self.probes):
+            # Removed or replaced while running: its stats are gone with it
+            return status
+
+        stats = self.stats.get(probe)
+        if stats is None:
+            stats = self.stats[probe] = ProbeStats(self.name(probe))
+        stats.record(started, time.monotonic() - clock, status, probe.partial)
+        return status
+
+    async def _run_probes(self, probes):
+        deadline = Deadline(self.deadline) if self.deadline else None
+        return await asyncio.gather(
+            *(self._execute(probe, deadline) for probe in probes)
+        )
+
+    async def run_once(self):
+        """Runs all registered probes concurrently.
+
+        Returns:
+            A list of booleans with the status of each probe.
+        """
+        return await self._run_probes(self.probes)
+
+    async def _supervise(self, probe):
+        """Runs a stream probe until it's cancelled, restarting it when it stops."""
+        while True:
+            status = await self._execute(probe)
+            log.warning(
+                "Runner: %s stream stopped (%s), restarting in %s seconds",
+                self.name(probe),
+                "ok" if status else "failed",
+                self.restart_delay,
+            )
+            await asyncio.sleep(self.restart_delay)
+
+    def _start_streams(self):
+        """Starts a task for each registered stream probe that is not running."""
+        for probe in self.probes:
+            if isinstance(probe, StreamProbe) and probe not in self._streams:
+                self._streams[probe] = asyncio.ensure_future(self._supervise(probe))
+
+    async def serve(self, interval):
+        """Starts stream probes and runs the other registered probes every
+        ``interval`` seconds, forever.
+        """
+        try:
+            while True:
+                self._start_streams()
+                started = time.monotonic()
+                await self._run_probes(
+                    [p for p in self.probes if not isinstance(p, StreamProbe)]
+                )
+                elapsed = time.monotonic() - started
+                await asyncio.sleep(max(0, interval - elapsed))
+        finally:
+            streams, self._streams = list(self._streams.values()), {}
+            for stream in streams:
+                stream.cancel()
+            await asyncio.gather(*streams, return_exceptions=True)
+
+    def run(self, interval=None):
+        """Starts the event loop and runs registered probes. If ``interval`` is
+        not set, probes are executed once.
+        """
+        try:
+            if interval is None:
+                return asyncio.run(self.run_once())
+            return asyncio.run(self.serve(interval))
+        finally:
+            self.close()
@@ -0,0 +1,63 @@
+import os
+import time
+import socket
+import logging
+
+from .ring import HashRing
+
+
+log = logging.getLogger(__name__)
+
+
+class BaseMembership(object):
+    """BaseMembership defines how HAL workers discover each other to split probe work.
+    Each worker sends a heartbeat at every probe run, and workers that didn't send a
+    heartbeat in the last ``ttl`` seconds are considered gone. Live workers are placed
+    on a ``HashRing``, that is rebuilt only when the membership changes: work is then
+    rebalanced in the next run. Backends define where heartbeats are stored by
+    overriding:
+      * ``_heartbeat(worker_id, expires, now)``: stores the heartbeat and returns the
+        IDs of live workers.
+      * ``_leave(worker_id)``: removes the worker.
+
+    ``worker_id`` defaults to ``<hostname>-<pid>``, and ``ttl`` must be longer than
+    the interval between probe runs.
+    """
+
+    DEFAULTS = {"worker_id": None, "ttl": 120, "vnodes": 64}
+
+    def __init__(self, config=None):
+        config = config or {}
+        self.config = {**BaseMembership.DEFAULTS, **self.DEFAULTS, **config}
+        self.worker_id = self.config["worker_id"] or "{}-{}".format(
+            socket.gethostname(), os.getpid()
+        )
+        self._workers = None
+        self._ring = None
+
+    def _heartbeat(self, worker_id, expires, now):
+        raise NotImplementedError()
+
+    def _leave(self, worker_id):
+        raise NotImplementedError()
+
+    def ring(self):
+        """Sends a heartbeat and returns the ``HashRing`` of live workers."""
+        now = time.time()
+        workers = set(self._heartbeat(self.worker_id, now + self.config["ttl"], now))
+        workers.add(self.worker_id)
+        if workers != self._workers:
+            log.info(
+                "Sharding: %d workers, rebalancing ('%s')",
+                len(workers),
+                self.worker_id,
+            )
+            self._workers = workers
+            self._ring = HashRing(workers, self.config["vnodes"])
+        return self._ring
+
+    def leave(self):
+        """Removes this worker, so that others take over its work in their next run."""
+        self._leave(self.worker_id)
+        self._workers = None
+        self._ring = None
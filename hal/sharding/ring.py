@@ -0,0 +1,36 @@
+import bisect
+import hashlib
+
+
+def _hash(value):
+    return int.from_bytes(
+        hashlib.blake2b(value.encode(), digest_size=8).digest(), "big"
+    )
+
+
+class HashRing(object):
+    """HashRing assigns keys to workers with consistent hashing. Each worker is placed
+    on the ring ``vnodes`` times, so that keys are evenly spread, and when a worker
+    joins or leaves only the keys of its neighbours move (about ``1/N`` of the keys).
+
+    Usage:
+        ring = HashRing(["worker-1", "worker-2"])
+        ring.owner("192.168.1.10|alice")
+    """
+
+    def __init__(self, workers, vnodes=64):
+        self.workers = sorted(workers)
+        points = sorted(
+            (_hash("{}#{}".format(worker, i)), worker)
+            for worker in self.workers
+            for i in range(vnodes)
+        )
+        self._hashes = [point[0] for point in points]
+        self._workers = [point[1] for point in points]
+
+    def owner(self, key):
+        """Returns the worker that owns the given key, or ``None`` if the ring is empty."""
+        if not self._hashes:
+            return None
+        index = bisect.bisect(self._hashes, _hash(str(key))) % len(self._hashes)
+        return self._workers[index]
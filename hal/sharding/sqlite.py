@@ -0,0 +1,41 @@
+import sqlite3
+
+from .base import BaseMembership
+
+
+class SQLiteMembership(BaseMembership):
+    """SQLiteMembership stores heartbeats in a SQLite database shared by workers on the
+    same host (or on a shared volume). It's meant for local deployments and testing.
+    """
+
+    DEFAULTS = {"path": None}
+
+    def _connect(self):
+        connection = sqlite3.connect(self.config["path"], timeout=10)
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS members (worker_id TEXT PRIMARY KEY, expires REAL)"
+        )
+        return connection
+
+    def _heartbeat(self, worker_id, expires, now):
+        connection = self._connect()
+        try:
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO members VALUES (?, ?)", (worker_id, expires)
+                )
+                connection.execute("DELETE FROM members WHERE expires < ?", (now,))
+                rows = connection.execute("SELECT worker_id FROM members").fetchall()
+        finally:
+            connection.close()
+        return [row[0] for row in rows]
+
+    def _leave(self, worker_id):
+        connection = self._connect()
+        try:
+            with connection:
+                connection.execute(
+                    "DELETE FROM members WHERE worker_id = ?", (worker_id,)
+                )
+        finally:
+            connection.close()
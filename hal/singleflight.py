@@ -0,0 +1,190 @@
+"""Request coalescing: concurrent calls with the same key are merged in a single call,
+and all callers share its result (or its exception). With a ``ttl``, the result is
+also reused by calls made within ``ttl`` seconds after it completed. Failures are
+never cached, and expired results are evicted by the following calls, so keys that
+are never requested again don't grow the cache.
+
+Callers waiting for a shared call are bound by their own ``deadline``, not by the
+deadline of the caller that made the call. If that caller runs out of budget
+(``DeadlineExceeded``) or its coroutine is cancelled, waiters retry the call instead
+of failing with it.
+
+Usage:
+    flights = SingleFlight()
+    response = flights.do(("GET", url), lambda: session.get(url), ttl=5)
+"""
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+
+from .deadline import DeadlineExceeded
+
+
+class _Call(object):
+    __slots__ = ("done", "result", "error", "expires")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.expires = None
+
+
+class _Expirations(object):
+    """Min-heap of cached calls by expiration time, used to evict expired results
+    in ``O(log n)`` per call.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._counter = itertools.count()
+
+    def push(self, expires, key, call):
+        heapq.heappush(self._heap, (expires, next(self._counter), key, call))
+
+    def evict(self, calls, now):
+        """Removes from ``calls`` the results expired at ``now``. Entries replaced
+        by a newer call for the same key are left untouched.
+        """
+        while self._heap and self._heap[0][0] <= now:
+            _, _, key, call = heapq.heappop(self._heap)
+            if calls.get(key) is call:
+                del calls[key]
+
+
+class SingleFlight(object):
+    """Coalesces calls made from different threads."""
+
+    def __init__(self):
+        self._calls = {}
+        self._expirations = _Expirations()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Returns the number of calls in flight or with a cached result."""
+        with self._lock:
+            self._expirations.evict(self._calls, time.monotonic())
+            return len(self._calls)
+
+    def do(self, key, fn, ttl=0, deadline=None):
+        """Calls ``fn()`` unless a call with the same ``key`` is in flight or its
+        result is not expired; in that case, the shared result is returned.
+
+        Raises:
+            DeadlineExceeded: If ``deadline`` is used up while waiting for a call in
+                flight.
+        """
+        while True:
+            with self._lock:
+                self._expirations.evict(self._calls, time.monotonic())
+                call = self._calls.get(key)
+                if (
+                    call is not None
+                    and call.done.is_set()
+                    and time.monotonic() >= call.expires
+                ):
+                    call = None
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+                    break
+
+            timeout = deadline.timeout() if deadline is not None else None
+            if not call.done.wait(timeout):
+                raise DeadlineExceeded()
+            if isinstance(call.error, DeadlineExceeded):
+                # The deadline of the caller that made the call: retry with ours
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            call.expires = time.monotonic() + ttl
+            with self._lock:
+                if call.error is not None or not ttl:
+                    if self._calls.get(key) is call:
+                        del self._calls[key]
+                else:
+                    self._expirations.push(call.expires, key, call)
+            call.done.set()
+        return call.result
+
+
+class AsyncSingleFlight(object):
+    """Coalesces coroutine calls made from the same event loop."""
+
+    def __init__(self):
+        self._calls = {}
+        self._expirations = _Expirations()
+
+    def __len__(self):
+        """Returns the number of calls in flight or with a cached result."""
+        self._expirations.evict(self._calls, time.monotonic())
+        return len(self._calls)
+
+    async def do(self, key, fn, ttl=0, deadline=None):
+        """Awaits ``fn()`` unless a call with the same ``key`` is in flight or its
+        result is not expired; in that case, the shared result is returned.
+
+        Raises:
+            DeadlineExceeded: If ``deadline`` is used up while waiting for a call in
+                flight.
+        """
+        while True:
+            self._expirations.evict(self._calls, time.monotonic())
+            call = self._calls.get(key)
+            if call is None:
+                break
+            future, expires = call
+            if future.done():
+                if time.monotonic() < expires:
+                    return future.result()
+                break
+
+            timeout = deadline.timeout() if deadline is not None else None
+            done, _ = await asyncio.wait({future}, timeout=timeout)
+            if not done:
+                raise DeadlineExceeded()
+            if future.cancelled() or isinstance(future.exception(), DeadlineExceeded):
+                # The caller that made the call was cancelled (e.g. by its run
+                # deadline) or ran out of its deadline: retry, the first waiter
+                # makes the call again
+                continue
+            return future.result()
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = (future, None)
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            self._forget(key, future)
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved, even if there are no other callers
+            future.exception()
+            self._forget(key, future)
+            raise
+
+        future.set_result(result)
+        if ttl:
+            expires = time.monotonic() + ttl
+            call = self._calls[key] = (future, expires)
+            self._expirations.push(expires, key, call)
+        else:
+            self._forget(key, future)
+        return result
+
+    def _forget(self, key, future):
+        call = self._calls.get(key)
+        if call is not None and call[0] is future:
+            del self._calls[key]
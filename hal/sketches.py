@@ -0,0 +1,211 @@
+import math
+import hashlib
+
+
+class DDSketch(object):
+    """DDSketch is a quantile sketch with relative-error guarantees: every quantile is
+    estimated within ``relative_accuracy`` of the real value, using bounded memory.
+    Values are stored in logarithmically sized buckets; when more than ``max_bins``
+    buckets are used, the lowest ones are collapsed so that high quantiles (the
+    interesting ones for latency) keep their accuracy.
+
+    Sketches with the same accuracy can be merged, so distributions collected by
+    different probes or runs can be combined without the raw samples. Reference:
+    https://arxiv.org/abs/1908.10693
+
+    Usage:
+        sketch = DDSketch()
+        for value in samples:
+            sketch.add(value)
+        sketch.quantile(0.99)
+    """
+
+    def __init__(self, relative_accuracy=0.01, max_bins=512):
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins = {}
+        self.zeros = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def __len__(self):
+        return self.count
+
+    def _key(self, value):
+        return int(math.ceil(math.log(value) / self._log_gamma))
+
+    def _value(self, key):
+        return 2 * self.gamma**key / (self.gamma + 1)
+
+    def _collapse(self):
+        keys = sorted(self.bins)
+        excess = len(keys) - self.max_bins
+        collapsed = sum(self.bins.pop(key) for key in keys[:excess])
+        target = keys[excess]
+        self.bins[target] += collapsed
+
+    def add(self, value, count=1):
+        """Adds a non-negative value to the sketch."""
+        if value <= 0:
+            self.zeros += count
+        else:
+            key = self._key(value)
+            self.bins[key] = self.bins.get(key, 0) + count
+            if len(self.bins) > self.max_bins:
+                self._collapse()
+
+        self.count += count
+        self.sum += value * count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q):
+        """Returns the estimated value at the given quantile (0 <= q <= 1), or ``None``
+        if the sketch is empty.
+        """
+        if not self.count:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+
+        rank = q * (self.count - 1)
+        if rank < self.zeros:
+            return 0.0
+
+        seen = self.zeros
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                return min(max(self._value(key), self.min), self.max)
+        return self.max
+
+    def merge(self, other):
+        """Merges another sketch with the same accuracy in this sketch."""
+        if other.gamma != self.gamma:
+            raise ValueError("sketches with different accuracy can't be merged")
+        if not other.count:
+            return
+
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        while len(self.bins) > self.max_bins:
+            self._collapse()
+        self.zeros += other.zeros
+        self.count += other.count
+        self.sum += other.sum
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def to_dict(self):
+        """Returns a JSON serializable representation of the sketch."""
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "max_bins": self.max_bins,
+            "bins": sorted([key, count] for key, count in self.bins.items()),
+            "zeros": self.zeros,
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Builds a sketch from the output of ``to_dict()``."""
+        sketch = cls(data["relative_accuracy"], data["max_bins"])
+        sketch.bins = {key: count for key, count in data["bins"]}
+        sketch.zeros = data["zeros"]
+        sketch.count = data["count"]
+        sketch.sum = data["sum"]
+        sketch.min = data["min"]
+        sketch.max = data["max"]
+        return sketch
+
+
+class HyperLogLog(object):
+    """HyperLogLog estimates the number of distinct values added to it, with a standard
+    error of about ``1.04 / sqrt(2 ** precision)`` (1.6% with the default precision)
+    and a fixed memory of ``2 ** precision`` registers, whatever the number of values.
+    Reference: http://algo.inria.fr/flajolet/Publications/FlFuGaMe07.pdf
+
+    Usage:
+        hll = HyperLogLog()
+        for tags in series:
+            hll.add(",".join(tags))
+        hll.count()
+    """
+
+    def __init__(self, precision=12):
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = bytearray(self.m)
+        self._alpha = 0.7213 / (1 + 1.079 / self.m)
+
+    def add(self, value):
+        """Adds a string value to the sketch."""
+        h = int.from_bytes(
+            hashlib.blake2b(value.encode(), digest_size=8).digest(), "big"
+        )
+        index = h >> (64 - self.precision)
+        rest = h & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self):
+        """Returns the estimated number of distinct values."""
+        estimate = (
+            self._alpha * self.m * self.m / sum(2.0**-r for r in self.registers)
+        )
+        if estimate <= 2.5 * self.m:
+            # Small range correction (linear counting)
+            zeros = self.registers.count(0)
+            if zeros:
+                return int(round(self.m * math.log(self.m / zeros)))
+        return int(round(estimate))
+
+    def merge(self, other):
+        """Merges another sketch with the same precision in this sketch."""
+        if other.precision != self.precision:
+            raise ValueError("sketches with different precision can't be merged")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+
+class SpaceSaving(object):
+    """SpaceSaving tracks the top-K heaviest keys of a stream using at most ``capacity``
+    counters. When a new key arrives and all counters are used, the lightest key is
+    evicted and the new key inherits its weight, so heavy keys are never evicted by a
+    long tail of light ones. Reference: https://doi.org/10.1007/978-3-540-30570-5_27
+
+    Usage:
+        top = SpaceSaving(100)
+        for key, value in points:
+            top.add(key, value)
+        top.top(10)
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counters = {}
+
+    def __len__(self):
+        return len(self.counters)
+
+    def add(self, key, weight=1):
+        """Adds the weight of a key."""
+        if key in self.counters or len(self.counters) < self.capacity:
+            self.counters[key] = self.counters.get(key, 0) + weight
+            return
+
+        lightest = min(self.counters, key=self.counters.get)
+        self.counters[key] = self.counters.pop(lightest) + weight
+
+    def top(self, k):
+        """Returns the ``k`` heaviest keys, heaviest first."""
+        return sorted(self.counters, key=self.counters.get, reverse=True)[:k]
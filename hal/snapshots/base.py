@@ -0,0 +1,79 @@
+import json
+import logging
+
+
+log = logging.getLogger(__name__)
+
+
+class BaseSnapshotStore(object):
+    """BaseSnapshotStore defines the interface to persist probe state across processes,
+    so that short-lived invocations (e.g. Cloud Functions) can warm-start from the
+    state of the previous run. The store handles versioning and size limits, while
+    backends define where snapshots are stored by overriding:
+      * ``_read(key)``: returns the stored bytes, or ``None`` if not available.
+      * ``_write(key, data)``: stores the given bytes.
+
+    Snapshots are JSON documents with the format ``{"version": 1, "state": {...}}``.
+    A snapshot is discarded if its version differs from the probe snapshot version,
+    or if it's bigger than ``max_size`` bytes.
+    """
+
+    DEFAULTS = {"max_size": 1024 * 1024}
+
+    def __init__(self, config=None):
+        config = config or {}
+        self.config = {**BaseSnapshotStore.DEFAULTS, **self.DEFAULTS, **config}
+
+    def _read(self, key):
+        raise NotImplementedError()
+
+    def _write(self, key, data):
+        raise NotImplementedError()
+
+    def load(self, key, version):
+        """Loads the state stored for the given key.
+
+        Args:
+            key: Snapshot identifier, usually the probe name.
+            version: Expected snapshot version.
+        Returns:
+            The stored state, or ``None`` if not available or not valid.
+        """
+        data = self._read(key)
+        if data is None:
+            return None
+
+        if len(data) > self.config["max_size"]:
+            log.warning("Snapshot '%s' exceeds max_size; discarded", key)
+            return None
+
+        try:
+            snapshot = json.loads(data)
+        except ValueError:
+            log.warning("Snapshot '%s' is corrupted; discarded", key)
+            return None
+
+        if snapshot.get("version") != version:
+            log.info("Snapshot '%s' has a different version; discarded", key)
+            return None
+        return snapshot["state"]
+
+    def save(self, key, version, state):
+        """Stores the state for the given key.
+
+        Args:
+            key: Snapshot identifier, usually the probe name.
+            version: Snapshot version.
+            state: JSON serializable state.
+        Returns:
+            A boolean that represents if the snapshot has been stored.
+        """
+        data = json.dumps(
+            {"version": version, "state": state}, separators=(",", ":")
+        ).encode()
+        if len(data) > self.config["max_size"]:
+            log.warning("Snapshot '%s' exceeds max_size; not saved", key)
+            return False
+
+        self._write(key, data)
+        return True
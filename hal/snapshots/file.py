@@ -0,0 +1,34 @@
+import os
+import logging
+import tempfile
+
+from .base import BaseSnapshotStore
+
+
+log = logging.getLogger(__name__)
+
+
+class FileSnapshotStore(BaseSnapshotStore):
+    """FileSnapshotStore stores snapshots in a local folder, one file per key. Files are
+    replaced atomically so that a crash during a write never leaves a partial snapshot.
+    In Cloud Functions, ``/tmp`` survives across invocations served by the same instance.
+    """
+
+    DEFAULTS = {"path": tempfile.gettempdir()}
+
+    def _filename(self, key):
+        return os.path.join(self.config["path"], "hal-{}.snapshot".format(key))
+
+    def _read(self, key):
+        try:
+            with open(self._filename(key), "rb") as f:
+                return f.read(self.config["max_size"] + 1)
+        except FileNotFoundError:
+            return None
+
+    def _write(self, key, data):
+        os.makedirs(self.config["path"], exist_ok=True)
+        fd, path = tempfile.mkstemp(dir=self.config["path"])
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(path, self._filename(key))
@@ -1,4 +1,8 @@
 from setuptools import setup, find_packages
 
 
-setup(name="hal", packages=find_packages())
+setup(
+    name="hal",
+    packages=find_packages(),
+    entry_points={"console_scripts": ["hal=hal.__main__:main"]},
+)
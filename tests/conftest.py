@@ -1,9 +1,202 @@
+import json
+import gzip
+import struct
 import pytest
+import threading
 import responses
 
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
 
 @pytest.fixture
 def server():
     """Create a `responses` mock."""
     with responses.RequestsMock() as resp:
         yield resp
+
+
+class StandInRequest(object):
+    """Request received by the stand-in server."""
+
+    def __init__(self, method, path, params, headers, body):
+        self.method = method
+        self.path = path
+        self.params = params
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body)
+
+
+class StandInServer(object):
+    """Local HTTP server used as a stand-in backend for network probes and exporters.
+    Routes are registered with ``add()`` and received requests are available in
+    ``requests``.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.requests = []
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _handle(self):
+                url = urlsplit(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                request = StandInRequest(
+                    self.command,
+                    url.path,
+                    dict(parse_qsl(url.query)),
+                    dict(self.headers),
+                    self.rfile.read(length),
+                )
+                stand_in.requests.append(request)
+
+                route = stand_in.routes.get((self.command, url.path))
+                if route is None:
+                    status, body = 404, "Not found"
+                elif callable(route):
+                    status, body = route(request)
+                else:
+                    status, body = route
+                if isinstance(body, str):
+                    body = body.encode()
+
+                self.send_response(status)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = _handle
+            do_POST = _handle
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = "http://127.0.0.1:{}".format(self.httpd.server_address[1])
+
+    def add(self, method, path, body="", status=200):
+        """Registers a route. ``body`` can be a callable that receives the request
+        and returns a ``(status, body)`` tuple.
+        """
+        self.routes[(method, path)] = body if callable(body) else (status, body)
+
+    def start(self):
+        threading.Thread(
+            target=self.httpd.serve_forever, args=(0.01,), daemon=True
+        ).start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def stand_in():
+    """Create a local HTTP stand-in server."""
+    server = StandInServer()
+    server.start()
+    yield server
+    server.stop()
+
+
+def decode_protobuf(body):
+    """Decodes a protobuf message in a dictionary of ``field -> [values]``. Varints are
+    decoded as integers, while 64-bit and length-delimited fields are kept as bytes.
+    """
+    fields = {}
+    position = 0
+    while position < len(body):
+        key, position = _varint(body, position)
+        field, wire_type = key >> 3, key & 0x7
+        if wire_type == 0:
+            value, position = _varint(body, position)
+        elif wire_type == 1:
+            end = position + 8
+            value, position = body[position:end], end
+        elif wire_type == 2:
+            length, position = _varint(body, position)
+            end = position + length
+            value, position = body[position:end], end
+        else:
+            raise ValueError("unsupported wire type {}".format(wire_type))
+        fields.setdefault(field, []).append(value)
+    return fields
+
+
+def _varint(body, position):
+    value = shift = 0
+    while True:
+        byte = body[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, position
+
+
+def _attributes(key_values):
+    attributes = {}
+    for key_value in key_values:
+        key_value = decode_protobuf(key_value)
+        value = decode_protobuf(key_value[2][0])
+        if 1 in value:
+            attributes[key_value[1][0].decode()] = value[1][0].decode()
+        else:
+            attributes[key_value[1][0].decode()] = bool(value[2][0])
+    return attributes
+
+
+class Collector(object):
+    """Fake OpenTelemetry collector that decodes OTLP/HTTP metrics requests received
+    by the stand-in server.
+    """
+
+    def __init__(self, stand_in):
+        self.stand_in = stand_in
+        self.url = "{}/v1/metrics".format(stand_in.url)
+        stand_in.add("POST", "/v1/metrics", body="")
+
+    @property
+    def requests(self):
+        return self.stand_in.requests
+
+    def decode(self, request):
+        """Returns the resource attributes and the data points of a request."""
+        body = request.body
+        if request.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+
+        resource_metrics = decode_protobuf(decode_protobuf(body)[1][0])
+        resource = _attributes(decode_protobuf(resource_metrics[1][0]).get(1, []))
+        points = []
+        for scope_metrics in resource_metrics[2]:
+            for metric in decode_protobuf(scope_metrics).get(2, []):
+                metric = decode_protobuf(metric)
+                gauge = decode_protobuf(metric[5][0])
+                for point in gauge[1]:
+                    point = decode_protobuf(point)
+                    if 6 in point:
+                        value = struct.unpack("<q", point[6][0])[0]
+                    else:
+                        value = struct.unpack("<d", point[4][0])[0]
+                    points.append(
+                        {
+                            "metric": metric[1][0].decode(),
+                            "time": struct.unpack("<Q", point[3][0])[0],
+                            "value": value,
+                            "attributes": _attributes(point.get(7, [])),
+                        }
+                    )
+        return resource, points
+
+
+@pytest.fixture
+def collector(stand_in):
+    """Create a fake OpenTelemetry collector."""
+    return Collector(stand_in)
@@ -0,0 +1,74 @@
+import pytest
+
+from hal import compression
+from hal.compression import compress, compress_file, decompress
+
+
+BODY = b'{"metric":"hal.paperspace.machines.instance","points":[[1600000000,1]]}' * 50
+
+
+def test_compress_threshold():
+    """Should not compress bodies smaller than the threshold."""
+    assert compress(b"small", "gzip", threshold=1024) == (b"small", None)
+    assert compress(BODY, None) == (BODY, None)
+
+
+@pytest.mark.parametrize("algorithm", ["gzip", "deflate"])
+def test_compress_roundtrip(algorithm):
+    """Should compress and decompress bodies."""
+    body, encoding = compress(BODY, algorithm)
+    assert encoding == algorithm
+    assert len(body) < len(BODY)
+    assert decompress(body, encoding) == BODY
+
+
+def test_compress_zstd_fallback(monkeypatch):
+    """Should fall back to gzip if zstandard is not installed."""
+    monkeypatch.setattr(compression, "zstandard", None)
+    body, encoding = compress(BODY, "zstd")
+    assert encoding == "gzip"
+    assert decompress(body, encoding) == BODY
+
+
+@pytest.mark.parametrize("algorithm,extension", [("gzip", ".gz"), ("deflate", ".zz")])
+def test_compress_file(tmp_path, algorithm, extension):
+    """Should compress a file and remove the original."""
+    path = tmp_path / "hal.jsonl"
+    path.write_bytes(BODY)
+    target = compress_file(str(path), algorithm)
+
+    assert target == str(path) + extension
+    assert not path.exists()
+    with open(target, "rb") as f:
+        assert decompress(f.read(), algorithm) == BODY
+
+
+def test_compress_invalid():
+    """Should raise an error for unsupported algorithms."""
+    with pytest.raises(ValueError):
+        compress(BODY, "brotli")
+    with pytest.raises(ValueError):
+        decompress(BODY, "brotli")
+    with pytest.raises(ValueError):
+        compress_file("hal.jsonl", "brotli")
+
+
+def test_compress_realistic_batch():
+    """Should shrink a realistic Paperspace/Elmo series batch at least 5 times."""
+    from hal.exporters.datadog import DatadogExporter
+
+    data = {}
+    for i in range(40):
+        tags = ["machine_id:ps{:06d}".format(i), "account:team"]
+        data.setdefault("hal.paperspace.machines.instance", []).append((1, tags))
+        data.setdefault("hal.paperspace.machines.utilization", []).append(
+            (3600.0, tags)
+        )
+    for zone in range(8):
+        tags = ["sector:{}".format(zone), "name:Zone {}".format(zone)]
+        data.setdefault("hal.elmo.sectors.armed", []).append((zone % 2, tags))
+    body = DatadogExporter({"api_key": "valid", "hostname": "home"}).encode(data)
+
+    for level in (1, 6, 9):
+        compressed, _ = compress(body, "gzip", level)
+        assert len(compressed) * 5 < len(body)
@@ -0,0 +1,183 @@
+import json
+import pytest
+
+from hal import config
+from hal.__main__ import main
+from hal.config import ConfigError, build, load, load_class
+from hal.exporters.file import FileExporter
+from hal.exporters.guard import CardinalityGuard
+from hal.exporters.logger import LogExporter
+from hal.probes.base import BaseProbe
+from hal.probes.multi import MultiAccountProbe
+from hal.probes.watchdog import WatchdogProbe
+from hal.sharding.sqlite import SQLiteMembership
+from hal.snapshots.file import FileSnapshotStore
+
+
+class CountingProbe(BaseProbe):
+    DEFAULTS = {"points": 10}
+
+    def _run(self):
+        self.results = {
+            "hal.counting": [
+                (i, ["index:{}".format(i)]) for i in range(self.config["points"])
+            ]
+        }
+        return True, None
+
+
+def test_load_class():
+    """Should load classes by registry name or dotted path."""
+    assert load_class("watchdog", config.PROBES) is WatchdogProbe
+    assert (
+        load_class("hal.probes.watchdog.WatchdogProbe", config.PROBES) is WatchdogProbe
+    )
+
+
+@pytest.mark.parametrize(
+    "name", ["missing", "hal.probes.missing.Probe", "hal.probes.watchdog.Missing"]
+)
+def test_load_class_invalid(name):
+    """Should raise an error if the class doesn't exist."""
+    with pytest.raises(ConfigError):
+        load_class(name, config.PROBES)
+
+
+def test_build(tmp_path):
+    """Should build a probe with its exporters and snapshot store."""
+    probe = build(
+        {
+            "probe": "watchdog",
+            "config": {"hosts": [["127.0.0.1", "home"]]},
+            "exporters": [{"exporter": "file", "config": {"path": "hal.jsonl"}}],
+            "snapshot_store": {"store": "file", "config": {"path": str(tmp_path)}},
+            "membership": {
+                "backend": "sqlite",
+                "config": {"path": str(tmp_path / "members.db")},
+            },
+        }
+    )
+    assert isinstance(probe, WatchdogProbe)
+    assert probe.config["hosts"] == [["127.0.0.1", "home"]]
+    assert isinstance(probe.config["exporters"][0], FileExporter)
+    assert probe.config["exporters"][0].config["path"] == "hal.jsonl"
+    assert isinstance(probe.config["snapshot_store"], FileSnapshotStore)
+    assert isinstance(probe.config["membership"], SQLiteMembership)
+
+
+def test_build_wrapped_probe():
+    """Should load the class of wrapped probes."""
+    probe = build({"probe": "multi", "config": {"probe": "watchdog", "accounts": []}})
+    assert isinstance(probe, MultiAccountProbe)
+    assert probe.config["probe"] is WatchdogProbe
+
+
+def test_build_invalid():
+    """Should raise an error if the probe is not defined."""
+    with pytest.raises(ConfigError):
+        build({"config": {}})
+
+
+def test_load(tmp_path):
+    """Should load definitions by name."""
+    path = tmp_path / "hal.json"
+    path.write_text(
+        json.dumps([{"probe": "watchdog"}, {"name": "work", "probe": "paperspace"}])
+    )
+    definitions = load(str(path))
+    assert list(definitions) == ["watchdog", "work"]
+    assert definitions["work"]["probe"] == "paperspace"
+
+
+@pytest.mark.parametrize(
+    "content",
+    ["{", json.dumps([{"config": {}}]), json.dumps([{"probe": "watchdog"}] * 2)],
+)
+def test_load_invalid(tmp_path, content):
+    """Should raise an error for invalid files."""
+    path = tmp_path / "hal.json"
+    path.write_text(content)
+    with pytest.raises(ConfigError):
+        load(str(path))
+
+
+def test_cli_profile(tmp_path, capsys):
+    """Should profile a probe and its exporters, writing collapsed stacks."""
+    path = tmp_path / "hal.json"
+    output = tmp_path / "hal.jsonl"
+    path.write_text(
+        json.dumps(
+            {
+                "name": "counting",
+                "probe": "test_config.CountingProbe",
+                "exporters": [{"exporter": "file", "config": {"path": str(output)}}],
+            }
+        )
+    )
+    stacks = tmp_path / "stacks.txt"
+    code = main(
+        [
+            "profile",
+            "counting",
+            "--config",
+            str(path),
+            "--set",
+            "points=1000",
+            "--runs",
+            "3",
+            "--limit",
+            "100",
+            "--collapsed",
+            str(stacks),
+        ]
+    )
+    assert code == 0
+
+    out = capsys.readouterr().out
+    assert "# Hotspots (sorted by cumulative)" in out
+    assert "_run" in out
+    assert "# Top allocation sites" in out
+    assert stacks.exists()
+    # Buffered exporters are written within the profile
+    assert "(_write)" in out
+    assert len(output.read_text().splitlines()) == 3000
+
+
+def test_cli_profile_missing_definition(tmp_path, capsys):
+    """Should fail if the definition doesn't exist."""
+    path = tmp_path / "hal.json"
+    path.write_text(json.dumps([{"probe": "watchdog"}]))
+    assert main(["profile", "paperspace", "--config", str(path)]) == 2
+    assert "definition 'paperspace' not found" in capsys.readouterr().err
+
+
+def test_build_wrapped_exporters():
+    """Should build exporters wrapped by other exporters."""
+    probe = build(
+        {
+            "probe": "watchdog",
+            "exporters": [
+                {
+                    "exporter": "guard",
+                    "config": {"budget": 10, "exporters": [{"exporter": "log"}]},
+                }
+            ],
+        }
+    )
+    guard = probe.config["exporters"][0]
+    assert isinstance(guard, CardinalityGuard)
+    assert isinstance(guard.config["exporters"][0], LogExporter)
+
+
+def test_build_invalid_config():
+    """Should raise a ConfigError if the probe rejects its config."""
+    with pytest.raises(ConfigError):
+        build({"probe": "rest", "config": {"rules": [{"metric": "hal.metric"}]}})
+
+
+def test_cli_run_invalid_config(tmp_path, capsys):
+    """Should exit with an error if the configuration file is not valid."""
+    path = tmp_path / "hal.json"
+    path.write_text("[{")
+    assert main(["run", "--config", str(path)]) == 2
+    assert "unable to read" in capsys.readouterr().err
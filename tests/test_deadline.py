@@ -0,0 +1,29 @@
+import pytest
+
+from hal.deadline import Deadline, DeadlineExceeded
+
+
+def test_deadline_remaining(mocker):
+    """Should compute the remaining budget, excluding the reserve."""
+    clock = mocker.patch("hal.deadline.time.monotonic", return_value=100)
+    deadline = Deadline(10, reserve=2)
+    assert deadline.remaining() == 8
+    clock.return_value = 105
+    assert deadline.remaining() == 3
+    assert deadline.expired() is False
+    clock.return_value = 120
+    assert deadline.remaining() == 0
+    assert deadline.expired() is True
+
+
+def test_deadline_timeout(mocker):
+    """Should cap per-call timeouts with the remaining budget."""
+    clock = mocker.patch("hal.deadline.time.monotonic", return_value=100)
+    deadline = Deadline(10)
+    assert deadline.timeout() == 10
+    assert deadline.timeout(3) == 3
+    clock.return_value = 108
+    assert deadline.timeout(3) == 2
+    clock.return_value = 110
+    with pytest.raises(DeadlineExceeded):
+        deadline.timeout(3)
@@ -1,10 +1,22 @@
+import os
+import gzip
+import json
+import time
 import datadog
 import logging
 import pytest
 
+from hal.compression import decompress
 from hal.exporters.base import BaseExporter
+from hal.exporters.cache import BoundedCache
 from hal.exporters.datadog import DatadogExporter
+from hal.exporters.file import FileExporter
+from hal.exporters.guard import CardinalityGuard
+from hal.exporters.influx import InfluxExporter
 from hal.exporters.logger import LogExporter
+from hal.exporters.otlp import OTLPExporter
+from hal.payload import Payload
+from hal.probes.base import BaseProbe
 
 
 def test_base_interface():
@@ -145,3 +157,535 @@ def test_datadog_exporter_send_fail_tags(mocker, caplog):
         for record in caplog.records:
             assert record.levelname == "ERROR"
             assert "'tags' must be a list of strings" in record.message
+
+
+def test_datadog_exporter_batch(stand_in):
+    """Should send all metrics with a single compressed request."""
+    stand_in.add("POST", "/api/v1/series", body='{"status": "ok"}', status=202)
+    exporter = DatadogExporter(
+        {
+            "api_key": "valid",
+            "hostname": "home",
+            "tags": ["automation"],
+            "batch": True,
+            "compression_threshold": 0,
+            "url": "{}/api/v1/series".format(stand_in.url),
+        }
+    )
+    exporter.send({"metric_1": 1, "metric_2": [(0, ["state:off"])]})
+
+    assert len(stand_in.requests) == 1
+    request = stand_in.requests[0]
+    assert request.headers["DD-API-KEY"] == "valid"
+    assert request.headers["Content-Encoding"] == "gzip"
+    series = json.loads(decompress(request.body, "gzip"))["series"]
+    assert [s["metric"] for s in series] == ["metric_1", "metric_2"]
+    assert series[0]["points"][0][1] == 1
+    assert series[0]["tags"] == ["automation"]
+    assert series[0]["host"] == "home"
+    assert series[1]["tags"] == ["automation", "state:off"]
+
+
+def test_datadog_exporter_batch_points():
+    """Should keep timestamped points as they are."""
+    exporter = DatadogExporter({"api_key": "valid"})
+    body = exporter.encode({"metric_1": ([(10, 1), (20, 2)], ["tag_1"])}, 30)
+    series = json.loads(body)["series"]
+    assert series[0]["points"] == [[10, 1], [20, 2]]
+
+
+def test_datadog_exporter_batch_fail(stand_in, caplog):
+    """Should log an error if the series API fails."""
+    stand_in.add("POST", "/api/v1/series", body="Forbidden", status=403)
+    exporter = DatadogExporter(
+        {
+            "api_key": "invalid",
+            "batch": True,
+            "url": "{}/api/v1/series".format(stand_in.url),
+        }
+    )
+    with caplog.at_level(logging.ERROR):
+        exporter.send({"metric_1": 1})
+        assert "unable to send metrics" in caplog.records[0].message
+
+
+def test_datadog_exporter_batch_connection_error(mocker, caplog):
+    """Should log network errors, so that the following exporters still run."""
+    exporter = DatadogExporter(
+        {
+            "api_key": "valid",
+            "batch": True,
+            "url": "http://127.0.0.1:1/api/v1/series",
+        }
+    )
+    following = mocker.Mock()
+    probe = BaseProbe({"exporters": [exporter, following]})
+    probe.results = {"metric_1": 1}
+    with caplog.at_level(logging.ERROR):
+        probe.export()
+        assert "unable to send metrics" in caplog.records[0].message
+    assert following.send.call_count == 1
+
+
+def _lines(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_file_exporter_send(tmp_path):
+    """Should write a JSON line for each data point."""
+    path = str(tmp_path / "hal.jsonl")
+    exporter = FileExporter({"path": path, "tags": ["home"]})
+    exporter.send(
+        {
+            "metric_1": 1,
+            "metric_2": [(0.5, ["state:off"]), 2],
+            "metric_3": ([(10, 1), (20, 2)], ["entity_id:sensor.door"]),
+        }
+    )
+    exporter.close()
+
+    lines = _lines(path)
+    assert len(lines) == 5
+    assert lines[0]["metric"] == "metric_1"
+    assert lines[0]["value"] == 1
+    assert lines[0]["tags"] == ["home"]
+    assert lines[0]["timestamp"] > 0
+    assert lines[1]["value"] == 0.5
+    assert lines[1]["tags"] == ["home", "state:off"]
+    assert lines[2]["tags"] == ["home"]
+    assert lines[3] == {
+        "timestamp": 10,
+        "metric": "metric_3",
+        "value": 1,
+        "tags": ["home", "entity_id:sensor.door"],
+    }
+    assert lines[4]["timestamp"] == 20
+
+
+def test_file_exporter_missing_path(caplog):
+    """Should log an error if the path is not configured."""
+    with caplog.at_level(logging.ERROR):
+        FileExporter().send({"metric_1": 1})
+        assert "path is not configured" in caplog.records[0].message
+
+
+def test_file_exporter_buffer(tmp_path):
+    """Should keep data points in the buffer until it's full."""
+    path = str(tmp_path / "hal.jsonl")
+    exporter = FileExporter({"path": path, "buffer_size": 200, "flush_interval": 0})
+    exporter.send({"metric_1": 1})
+    assert not os.path.exists(path)
+
+    exporter.send({"metric_1": [1] * 5})
+    assert len(_lines(path)) == 6
+    exporter.close()
+
+
+def test_file_exporter_flush_interval(tmp_path):
+    """Should write buffered data points periodically."""
+    path = str(tmp_path / "hal.jsonl")
+    exporter = FileExporter({"path": path, "flush_interval": 0.01})
+    exporter.send({"metric_1": 1})
+    exporter._closed.wait(0.2)
+    assert len(_lines(path)) == 1
+    exporter.close()
+
+
+@pytest.mark.parametrize(
+    "module, exporter_class, config",
+    [
+        ("file", FileExporter, {"flush_interval": 60}),
+        ("batch", OTLPExporter, {"url": "http://127.0.0.1:1", "flush_interval": 60}),
+    ],
+)
+def test_exporter_close_atexit(tmp_path, mocker, module, exporter_class, config):
+    """Should unregister the exit handler when the exporter is closed."""
+    atexit = mocker.patch("hal.exporters.{}.atexit".format(module))
+    exporter = exporter_class({"path": str(tmp_path / "hal.jsonl"), **config})
+    exporter.send({"metric_1": 1})
+    exporter.close()
+    assert atexit.register.call_args[0][0] == exporter.close
+    assert atexit.unregister.call_args[0][0] == exporter.close
+
+
+def test_file_exporter_rotate_size(tmp_path):
+    """Should rotate and compress the file when it's too large."""
+    path = str(tmp_path / "hal.jsonl")
+    exporter = FileExporter(
+        {"path": path, "buffer_size": 0, "flush_interval": 0, "max_size": 100}
+    )
+    for value in range(4):
+        exporter.send({"metric_1": [value] * 2})
+    exporter.close()
+
+    rotated = sorted(str(p) for p in tmp_path.glob("hal.jsonl.*"))
+    assert len(rotated) == 3
+    assert all(name.endswith(".gz") for name in rotated)
+    with gzip.open(rotated[0]) as f:
+        assert [json.loads(line)["value"] for line in f] == [0, 0]
+    assert [line["value"] for line in _lines(path)] == [3, 3]
+
+
+def test_file_exporter_rotate_interval(tmp_path, mocker):
+    """Should rotate the file when it's too old, keeping only the last backups."""
+    path = str(tmp_path / "hal.jsonl")
+    exporter = FileExporter(
+        {
+            "path": path,
+            "buffer_size": 0,
+            "flush_interval": 0,
+            "rotate_interval": 60,
+            "compression": None,
+            "backups": 1,
+        }
+    )
+    clock = mocker.patch("hal.exporters.file.time.time", return_value=1000)
+    exporter.send({"metric_1": 1})
+    clock.return_value = 1030
+    exporter.send({"metric_1": 2})
+    clock.return_value = 1060
+    exporter.send({"metric_1": 3})
+    clock.return_value = 1120
+    exporter.send({"metric_1": 4})
+    exporter.close()
+
+    rotated = list(tmp_path.glob("hal.jsonl.*"))
+    assert len(rotated) == 1
+    assert [line["value"] for line in _lines(str(rotated[0]))] == [3]
+    assert [line["value"] for line in _lines(path)] == [4]
+
+
+def test_exporters_share_payload(tmp_path, mocker):
+    """Should encode a payload once for exporters with the same format."""
+    exporters = [
+        FileExporter({"path": str(tmp_path / "a.jsonl"), "flush_interval": 0}),
+        FileExporter({"path": str(tmp_path / "b.jsonl"), "flush_interval": 0}),
+        FileExporter({"path": str(tmp_path / "c.jsonl"), "tags": ["home"]}),
+    ]
+    spies = [mocker.spy(exporter, "encode") for exporter in exporters]
+    payload = Payload({"metric_1": 1})
+    for exporter in exporters:
+        exporter.send(payload)
+        exporter.close()
+
+    assert [spy.call_count for spy in spies] == [1, 0, 1]
+    assert (tmp_path / "a.jsonl").read_bytes() == (tmp_path / "b.jsonl").read_bytes()
+    assert _lines(str(tmp_path / "c.jsonl"))[0]["tags"] == ["home"]
+
+
+def test_exporter_serialize_without_payload(mocker):
+    """Should encode plain results every time."""
+    exporter = DatadogExporter({"api_key": "valid"})
+    spy = mocker.spy(exporter, "encode")
+    exporter.serialize({"metric_1": 1})
+    exporter.serialize({"metric_1": 1})
+    assert spy.call_count == 2
+
+
+def test_cardinality_guard_under_budget(mocker):
+    """Should forward data as is when under the budget."""
+    exporter = mocker.Mock()
+    guard = CardinalityGuard({"budget": 10, "exporters": [exporter]})
+    data = {"metric_1": [(i, ["machine_id:{}".format(i)]) for i in range(5)]}
+    guard.send(data)
+
+    payload = exporter.send.call_args[0][0]
+    assert isinstance(payload, Payload)
+    assert payload == data
+
+
+def test_cardinality_guard_fold(mocker):
+    """Should keep the top series and fold the others over the budget."""
+    exporter = mocker.Mock()
+    guard = CardinalityGuard(
+        {"budget": 3, "tags": ["machine_id"], "exporters": [exporter]}
+    )
+    guard.send(
+        {
+            "metric_1": [
+                (i, ["machine_id:{}".format(i), "state:ready"]) for i in range(10)
+            ],
+            "metric_2": 1,
+        }
+    )
+
+    payload = exporter.send.call_args[0][0]
+    assert payload["metric_2"] == 1
+    assert payload["metric_1"] == [
+        (8, ["machine_id:8", "state:ready"]),
+        (9, ["machine_id:9", "state:ready"]),
+        (28, ["machine_id:other", "state:ready"]),
+    ]
+
+
+def test_cardinality_guard_activity(mocker):
+    """Should rank series by activity and concatenate folded points."""
+    exporter = mocker.Mock()
+    guard = CardinalityGuard({"budget": 2, "rank": "activity", "exporters": [exporter]})
+    guard.send({"metric_1": ([(1, 1)], ["entity_id:a"])})
+    guard.send(
+        {
+            "metric_1": [
+                ([(2, 1)], ["entity_id:a"]),
+                ([(2, 5)], ["entity_id:b"]),
+                ([(2, 7)], ["entity_id:c"]),
+            ]
+        }
+    )
+
+    payload = exporter.send.call_args[0][0]
+    assert payload["metric_1"] == [
+        ([(2, 1)], ["entity_id:a"]),
+        ([(2, 5), (2, 7)], ["entity_id:other"]),
+    ]
+
+
+def test_cardinality_guard_window(mocker):
+    """Should reset estimates when the window expires."""
+    clock = mocker.patch("hal.exporters.guard.time.time", return_value=1000)
+    guard = CardinalityGuard({"budget": 2, "window": 60})
+    guard.guard({"metric_1": [(1, ["id:{}".format(i)]) for i in range(5)]})
+    assert len(guard.guard({"metric_1": (1, ["id:0"])})["metric_1"]) == 1
+    assert guard.series["metric_1"].count() == 5
+
+    clock.return_value = 1060
+    assert guard.guard({"metric_1": (1, ["id:0"])}) == {"metric_1": (1, ["id:0"])}
+    assert guard.series["metric_1"].count() == 1
+
+
+def test_otlp_exporter_send(collector):
+    """Should send data points as gauges with attributes."""
+    exporter = OTLPExporter(
+        {"url": collector.url, "tags": ["home"], "batch_size": 1, "flush_interval": 0}
+    )
+    exporter.send(
+        Payload(
+            {
+                "metric_1": 1,
+                "metric_2": [(0.5, ["state:off"]), ([(10, 2), (20, 3)], ["id:a"])],
+                "metric_3": None,
+            },
+            30,
+        )
+    )
+
+    assert len(collector.requests) == 1
+    request = collector.requests[0]
+    assert request.headers["Content-Type"] == "application/x-protobuf"
+    resource, points = collector.decode(request)
+    assert resource == {"service.name": "hal"}
+    assert points == [
+        {
+            "metric": "metric_1",
+            "time": 30 * 10**9,
+            "value": 1,
+            "attributes": {"home": True},
+        },
+        {
+            "metric": "metric_2",
+            "time": 30 * 10**9,
+            "value": 0.5,
+            "attributes": {"home": True, "state": "off"},
+        },
+        {
+            "metric": "metric_2",
+            "time": 10 * 10**9,
+            "value": 2,
+            "attributes": {"home": True, "id": "a"},
+        },
+        {
+            "metric": "metric_2",
+            "time": 20 * 10**9,
+            "value": 3,
+            "attributes": {"home": True, "id": "a"},
+        },
+    ]
+
+
+def test_otlp_exporter_batch(collector):
+    """Should batch data from many probes in a single compressed request."""
+    exporter = OTLPExporter(
+        {
+            "url": collector.url,
+            "batch_size": 4,
+            "flush_interval": 0,
+            "compression_threshold": 0,
+        }
+    )
+    exporter.send({"metric_1": [1, 2]})
+    exporter.send({"metric_2": 3})
+    assert collector.requests == []
+
+    exporter.send({"metric_3": 4})
+    assert len(collector.requests) == 1
+    assert collector.requests[0].headers["Content-Encoding"] == "gzip"
+    _, points = collector.decode(collector.requests[0])
+    assert [(p["metric"], p["value"]) for p in points] == [
+        ("metric_1", 1),
+        ("metric_1", 2),
+        ("metric_2", 3),
+        ("metric_3", 4),
+    ]
+
+    exporter.send({"metric_4": 5})
+    exporter.flush()
+    assert len(collector.requests) == 2
+    _, points = collector.decode(collector.requests[1])
+    assert [(p["metric"], p["value"]) for p in points] == [("metric_4", 5)]
+
+
+def test_otlp_exporter_flush_interval(collector):
+    """Should send buffered data in background."""
+    exporter = OTLPExporter({"url": collector.url, "flush_interval": 0.05})
+    exporter.send({"metric_1": 1})
+    for _ in range(100):
+        if collector.requests:
+            break
+        time.sleep(0.01)
+    exporter.close()
+    assert len(collector.requests) == 1
+
+
+def test_otlp_exporter_fail(stand_in, caplog):
+    """Should log an error if the collector rejects data."""
+    stand_in.add("POST", "/v1/metrics", body="Bad request", status=400)
+    exporter = OTLPExporter(
+        {"url": "{}/v1/metrics".format(stand_in.url), "flush_interval": 0}
+    )
+    exporter.send({"metric_1": 1})
+    with caplog.at_level(logging.ERROR):
+        exporter.flush()
+    assert "unable to send metrics" in caplog.records[0].message
+
+
+def test_influx_exporter_encode():
+    """Should render data points as line protocol, escaping names and tags."""
+    exporter = InfluxExporter({"tags": ["home"]})
+    body = exporter.encode(
+        {
+            "metric 1": 1,
+            "metric_2": [
+                (0.5, ["zone:living room", "state:a=b,c"]),
+                ([(10, True), (20, "on")], ["id:a"]),
+            ],
+            "metric_3": None,
+        },
+        30,
+    )
+    assert body.decode().splitlines() == [
+        "metric\\ 1,home=true value=1i 30000000000",
+        "metric_2,home=true,state=a\\=b\\,c,zone=living\\ room value=0.5 30000000000",
+        "metric_2,home=true,id=a value=true 10000000000",
+        'metric_2,home=true,id=a value="on" 20000000000',
+    ]
+
+
+def test_influx_exporter_batch(stand_in):
+    """Should write points from many probes in a single compressed request."""
+    stand_in.add("POST", "/write", status=204)
+    exporter = InfluxExporter(
+        {
+            "url": "{}/write".format(stand_in.url),
+            "params": {"db": "hal"},
+            "token": "secret",
+            "batch_size": 3,
+            "flush_interval": 0,
+            "compression_threshold": 0,
+        }
+    )
+    exporter.send({"metric_1": [1, 2]})
+    assert stand_in.requests == []
+    exporter.send({"metric_2": 3})
+
+    assert len(stand_in.requests) == 1
+    request = stand_in.requests[0]
+    assert request.params == {"db": "hal"}
+    assert request.headers["Authorization"] == "Token secret"
+    assert request.headers["Content-Encoding"] == "gzip"
+    lines = decompress(request.body, "gzip").decode().splitlines()
+    assert [line.split(" ")[:2] for line in lines] == [
+        ["metric_1", "value=1i"],
+        ["metric_1", "value=2i"],
+        ["metric_2", "value=3i"],
+    ]
+
+
+def test_influx_exporter_retry(stand_in, mocker):
+    """Should retry writes failing with a server error."""
+    sleep = mocker.patch("hal.exporters.influx.time.sleep")
+    statuses = [503, 500, 204]
+    stand_in.add("POST", "/write", lambda request: (statuses.pop(0), ""))
+    exporter = InfluxExporter(
+        {"url": "{}/write".format(stand_in.url), "flush_interval": 0, "backoff": 1}
+    )
+    exporter.send({"metric_1": 1})
+    exporter.flush()
+
+    assert len(stand_in.requests) == 3
+    assert [c[0][0] for c in sleep.call_args_list] == [1, 2]
+
+
+def test_influx_exporter_retry_exhausted(stand_in, mocker, caplog):
+    """Should drop points after the last retry."""
+    mocker.patch("hal.exporters.influx.time.sleep")
+    stand_in.add("POST", "/write", body="Unavailable", status=503)
+    exporter = InfluxExporter(
+        {"url": "{}/write".format(stand_in.url), "flush_interval": 0, "retries": 1}
+    )
+    exporter.send({"metric_1": [1, 2]})
+    with caplog.at_level(logging.ERROR):
+        exporter.flush()
+
+    assert len(stand_in.requests) == 2
+    assert "unable to write 2 points" in caplog.records[0].message
+
+
+def test_influx_exporter_partial_write(stand_in, caplog):
+    """Should split rejected batches, dropping only the rejected points."""
+
+    def write(request):
+        if b"bad" in decompress(request.body, request.headers.get("Content-Encoding")):
+            return 400, "partial write: field type conflict"
+        return 204, ""
+
+    stand_in.add("POST", "/write", write)
+    exporter = InfluxExporter(
+        {"url": "{}/write".format(stand_in.url), "flush_interval": 0}
+    )
+    exporter.send({"metric_1": [1, 2, 3], "bad": 4})
+    with caplog.at_level(logging.WARNING):
+        exporter.flush()
+
+    bodies = [
+        decompress(request.body, request.headers.get("Content-Encoding")).decode()
+        for request in stand_in.requests
+    ]
+    written = [
+        line for body in bodies if "bad" not in body for line in body.splitlines()
+    ]
+    assert [line.split(" ")[1] for line in written] == [
+        "value=1i",
+        "value=2i",
+        "value=3i",
+    ]
+    assert len(caplog.records) == 1
+    assert "bad value=4i" in caplog.records[0].message
+
+
+def test_bounded_cache():
+    """Should encode each key once, resetting the cache when it's full."""
+    encoded = []
+
+    def encode(key):
+        encoded.append(key)
+        return ",".join(key)
+
+    cache = BoundedCache(encode, size=2)
+    assert cache.get(("a", "b")) == "a,b"
+    assert cache.get(("a", "b")) == "a,b"
+    assert cache.get(("c",)) == "c"
+    assert encoded == [("a", "b"), ("c",)]
+
+    assert cache.get(("d",)) == "d"
+    assert len(cache) == 1
@@ -0,0 +1,150 @@
+import socket
+import asyncio
+import aiohttp
+
+from hal import health
+from hal.exporters.otlp import OTLPExporter
+from hal.health import HealthServer, ProbeStats
+from hal.probes.base import AsyncBaseProbe, BaseProbe
+from hal.runner import Runner
+
+
+class OkProbe(BaseProbe):
+    def _run(self):
+        self.results = {"hal.ok": 1}
+        return True, None
+
+
+class FailingProbe(BaseProbe):
+    def _run(self):
+        return False, "run failed"
+
+
+def test_probe_stats():
+    """Should count runs, successes and durations."""
+    stats = ProbeStats("probe")
+    stats.record(100, 0.02, True)
+    stats.record(160, 2, False, partial=True)
+    stats.record(220, 120, True)
+
+    report = stats.report()
+    assert report["runs"] == 3
+    assert report["failures"] == 1
+    assert report["partials"] == 1
+    assert report["success_ratio"] == 2 / 3
+    assert report["last_run"] == 220
+    assert report["last_duration"] == 120
+    assert {d["le"]: d["count"] for d in report["durations"] if d["count"]} == {
+        0.05: 1,
+        5: 1,
+        "+Inf": 1,
+    }
+
+
+def test_probe_stats_empty():
+    """Should not report a success ratio without runs."""
+    assert ProbeStats("probe").report()["success_ratio"] is None
+
+
+def test_runner_stats(mocker):
+    """Should record each run in the probe stats, and report exporter queues."""
+    exporter = OTLPExporter({"flush_interval": 0})
+    ok = OkProbe({"exporters": [exporter, mocker.Mock()]})
+    runner = Runner([ok])
+    runner.add(FailingProbe(), name="failing")
+    runner.run()
+    runner.run()
+
+    report = health.report(runner)
+    assert [p["name"] for p in report["probes"]] == ["OkProbe", "failing"]
+    assert [p["probe"] for p in report["probes"]] == ["OkProbe", "FailingProbe"]
+    assert [p["success_ratio"] for p in report["probes"]] == [1, 0]
+    assert report["probes"][0]["runs"] == 2
+    assert report["probes"][0]["exporters"] == [
+        {"exporter": "OTLPExporter", "queued_points": 2, "queued_chunks": 2},
+        {"exporter": "Mock"},
+    ]
+    assert set(report["http"]) == {"sessions", "requests"}
+
+    runner.remove(ok)
+    assert ok not in runner.stats
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class WaitingProbe(AsyncBaseProbe):
+    release = None
+
+    async def _run(self):
+        await WaitingProbe.release.wait()
+        return True, None
+
+
+def test_runner_stats_removed_probe():
+    """Should not record stats of probes removed or replaced while running."""
+    removed, replaced = WaitingProbe(), WaitingProbe()
+    runner = Runner([removed, replaced])
+
+    async def scenario():
+        WaitingProbe.release = asyncio.Event()
+        run = asyncio.ensure_future(runner.run_once())
+        await asyncio.sleep(0.01)
+        runner.remove(removed)
+        runner.replace(replaced, OkProbe())
+        WaitingProbe.release.set()
+        return await run
+
+    assert asyncio.run(scenario()) == [True, True]
+    assert runner.stats == {}
+    assert [p["probe"] for p in health.report(runner)["probes"]] == ["OkProbe"]
+
+
+def test_health_server_tcp():
+    """Should serve stats on a local TCP port."""
+    runner = Runner([OkProbe()])
+    port = _free_port()
+
+    async def scenario():
+        await runner.run_once()
+        server = HealthServer(runner, {"port": port})
+        await server.start()
+        try:
+            async with aiohttp.ClientSession() as session:
+                url = "http://127.0.0.1:{}".format(port)
+                async with session.get(url + "/health") as response:
+                    status = await response.json()
+                async with session.get(url + "/stats") as response:
+                    stats = await response.json()
+        finally:
+            await server.stop()
+        return status, stats
+
+    status, stats = asyncio.run(scenario())
+    assert status == {"status": "ok", "probes": 1}
+    assert stats["probes"][0]["runs"] == 1
+    assert stats["probes"][0]["last_status"] is True
+
+
+def test_health_server_unix(tmp_path):
+    """Should serve stats on a Unix socket."""
+    path = str(tmp_path / "hal.sock")
+    runner = Runner([OkProbe()])
+
+    async def scenario():
+        server = HealthServer(runner, {"path": path})
+        await server.start()
+        try:
+            connector = aiohttp.UnixConnector(path=path)
+            async with aiohttp.ClientSession(connector=connector) as session:
+                async with session.get("http://hal/stats") as response:
+                    return await response.json()
+        finally:
+            await server.stop()
+
+    stats = asyncio.run(scenario())
+    assert stats["probes"][0]["name"] == "OkProbe"
+    assert stats["probes"][0]["runs"] == 0
@@ -0,0 +1,44 @@
+import pytest
+
+from hal import jsonpath
+
+
+DOCUMENT = {
+    "total": 2,
+    "machines": [
+        {"id": "ps1", "usage": 10, "tags": {"team": "a"}},
+        {"id": "ps2", "usage": 20, "tags": {"team": "b"}},
+    ],
+    "odd key": True,
+}
+
+
+def test_compile_keys():
+    """Should access keys and indexes."""
+    assert jsonpath.compile("$")(DOCUMENT) == [DOCUMENT]
+    assert jsonpath.compile("$.total")(DOCUMENT) == [2]
+    assert jsonpath.compile("$.machines[1].id")(DOCUMENT) == ["ps2"]
+    assert jsonpath.compile("$.machines[-1].tags.team")(DOCUMENT) == ["b"]
+    assert jsonpath.compile("$['odd key']")(DOCUMENT) == [True]
+
+
+def test_compile_wildcards():
+    """Should access every item of arrays and objects."""
+    assert jsonpath.compile("$.machines[*].usage")(DOCUMENT) == [10, 20]
+    assert jsonpath.compile("$.machines[*].tags.*")(DOCUMENT) == ["a", "b"]
+
+
+def test_compile_missing():
+    """Should return an empty list if nothing matches."""
+    assert jsonpath.compile("$.missing")(DOCUMENT) == []
+    assert jsonpath.compile("$.machines[5].id")(DOCUMENT) == []
+    assert jsonpath.compile("$.total.value")(DOCUMENT) == []
+    assert jsonpath.compile("$.machines[*].missing")(DOCUMENT) == []
+
+
+def test_compile_invalid():
+    """Should reject invalid paths."""
+    with pytest.raises(ValueError):
+        jsonpath.compile("machines")
+    with pytest.raises(ValueError):
+        jsonpath.compile("$.machines[")
@@ -0,0 +1,24 @@
+from hal.payload import Payload
+
+
+def test_payload_results():
+    """Should behave like the results dictionary."""
+    payload = Payload({"metric_1": 1}, timestamp=10)
+    assert payload == {"metric_1": 1}
+    assert payload.timestamp == 10
+
+
+def test_payload_encoded_once():
+    """Should call the encoder only the first time a format is requested."""
+    payload = Payload({"metric_1": 1})
+    calls = []
+
+    def encoder():
+        calls.append(1)
+        return b"encoded"
+
+    assert payload.encoded(("format", 1), encoder) == b"encoded"
+    assert payload.encoded(("format", 1), encoder) == b"encoded"
+    assert len(calls) == 1
+    payload.encoded(("format", 2), encoder)
+    assert len(calls) == 2
@@ -1,7 +1,13 @@
+import time
+import asyncio
+import aiohttp
 import logging
 import pytest
 
-from hal.probes.base import BaseProbe
+from hal.exporters.base import AsyncBaseExporter
+from hal.deadline import Deadline, DeadlineExceeded
+from hal.payload import Payload
+from hal.probes.base import AsyncBaseProbe, BaseProbe
 
 
 def test_base_probe():
@@ -40,6 +46,19 @@ def test_base_probe_custom_exporter(mocker):
     assert exporter.send.call_args == ((42,),)
 
 
+def test_base_probe_export_payload(mocker):
+    """Should send the same payload to all exporters."""
+    exporters = [mocker.Mock(), mocker.Mock()]
+    probe = BaseProbe({"exporters": exporters})
+    probe.results = {"metric_1": 1}
+    probe.export()
+
+    payload = exporters[0].send.call_args[0][0]
+    assert isinstance(payload, Payload)
+    assert payload == {"metric_1": 1}
+    assert exporters[1].send.call_args[0][0] is payload
+
+
 def test_base_probe_export_no_results(caplog):
     """Should log a warning if the probe has no results."""
     probe = BaseProbe()
@@ -63,3 +82,155 @@ def test_base_probe_bad_exporter(caplog):
         for record in caplog.records:
             assert record.levelname == "ERROR"
             assert "exporters are not valid" in record.message
+
+
+def test_async_base_probe_run():
+    """Should raise a NotImplementedError."""
+    probe = AsyncBaseProbe()
+    with pytest.raises(NotImplementedError):
+        asyncio.run(probe.run())
+
+
+def test_async_base_probe_exporters(mocker):
+    """Should await async exporters and run sync exporters in the executor."""
+
+    class AsyncExporter(AsyncBaseExporter):
+        sent = []
+
+        async def send(self, data):
+            self.sent.append(data)
+
+    sync_exporter = mocker.Mock()
+    async_exporter = AsyncExporter()
+    probe = AsyncBaseProbe({"exporters": [sync_exporter, async_exporter]})
+    probe.results = 42
+    asyncio.run(probe.export())
+    assert sync_exporter.send.call_args == ((42,),)
+    assert async_exporter.sent == [42]
+
+
+def test_async_base_probe_bad_exporter(caplog):
+    """Should log an error without raising exceptions if the exporter is not valid."""
+    probe = AsyncBaseProbe({"exporters": None})
+    probe.results = 42
+    with caplog.at_level(logging.ERROR):
+        asyncio.run(probe.export())
+
+        assert len(caplog.records) == 1
+        assert "exporters are not valid" in caplog.records[0].message
+
+
+class SlowProbe(BaseProbe):
+    def _run(self):
+        self.results["hal.collected"] = 1
+        self._timeout()
+        self.results["hal.skipped"] = 1
+        return True, None
+
+
+def test_base_probe_deadline_partial(mocker, caplog):
+    """Should export results collected before the deadline with the partial tag."""
+    exporter = mocker.Mock()
+    probe = SlowProbe({"exporters": [exporter]})
+    with caplog.at_level(logging.WARNING):
+        assert probe.run(Deadline(0)) is True
+        assert "results are partial" in caplog.records[0].message
+    assert probe.partial is True
+    assert probe.results == {"hal.collected": 1}
+
+    probe.export()
+    assert exporter.send.call_args[0][0] == {"hal.collected": (1, ["partial:true"])}
+
+
+def test_base_probe_deadline_without_results():
+    """Should fail if the deadline is exceeded before collecting results."""
+
+    class EmptyProbe(BaseProbe):
+        def _run(self):
+            raise DeadlineExceeded()
+
+    probe = EmptyProbe()
+    assert probe.run(Deadline(10)) is False
+    assert probe.partial is True
+
+
+def test_base_probe_deadline_reset():
+    """Should reset the partial flag and timeouts in the next run."""
+    probe = SlowProbe()
+    probe.run(Deadline(0))
+    assert probe.run() is True
+    assert probe.partial is False
+    assert probe._timeout(5) == 5
+
+
+def test_base_probe_deadline_previous_results():
+    """Should not keep results of the previous run if the deadline is exceeded."""
+
+    class CountingProbe(BaseProbe):
+        def _run(self):
+            self._timeout()
+            self.results["hal.v"] = 1
+            return True, None
+
+    probe = CountingProbe()
+    assert probe.run() is True
+    assert probe.run(Deadline(0)) is False
+    assert probe.partial is True
+    assert probe.results == {}
+
+
+def test_async_base_probe_session():
+    """Should close sessions created for a run, but not shared sessions."""
+
+    async def sessions():
+        shared = aiohttp.ClientSession()
+        async with AsyncBaseProbe({"session": shared})._session() as session:
+            assert session is shared
+        async with AsyncBaseProbe()._session() as owned:
+            assert owned is not shared
+        closed = (shared.closed, owned.closed)
+        await shared.close()
+        return closed
+
+    assert asyncio.run(sessions()) == (False, True)
+
+
+def test_async_base_probe_deadline():
+    """Should cancel async probes when the deadline is exceeded."""
+
+    class AsyncSlowProbe(AsyncBaseProbe):
+        async def _run(self):
+            self.results["hal.collected"] = 1
+            await asyncio.sleep(10)
+            return True, None
+
+    probe = AsyncSlowProbe()
+    assert asyncio.run(probe.run(Deadline(0.01))) is True
+    assert probe.partial is True
+    assert probe.results == {"hal.collected": 1}
+
+
+def test_async_base_probe_deadline_reserve():
+    """Should cancel async probes keeping the reserve for the export."""
+
+    class AsyncSlowProbe(AsyncBaseProbe):
+        async def _run(self):
+            self.results["hal.collected"] = 1
+            await asyncio.sleep(10)
+            return True, None
+
+    deadline = Deadline(0.2, reserve=0.1)
+    assert asyncio.run(AsyncSlowProbe().run(deadline)) is True
+    # The reserve is still available to export partial results
+    assert 0.05 < deadline.expires - time.monotonic() <= 0.1
+
+
+def test_async_base_probe_timeout_error():
+    """Should not hide timeouts that are not caused by the deadline."""
+
+    class AsyncTimeoutProbe(AsyncBaseProbe):
+        async def _run(self):
+            raise asyncio.TimeoutError()
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(AsyncTimeoutProbe().run(Deadline(10)))
@@ -117,3 +117,33 @@ def test_elmo_fail_api_calls(mocker, caplog):
         record = caplog.records[0]
         assert record.levelname == "ERROR"
         assert "ElmoClient returns '403'" in record.message
+
+
+def test_elmo_cached_session(mocker):
+    """Should reuse the authenticated client, authenticating again if it expires."""
+    probe = ElmoProbe(
+        {
+            "base_url": "https://example.com",
+            "vendor": "vendor",
+            "username": "user",
+            "password": "pass",
+        }
+    )
+    client = mocker.patch("hal.probes.elmo.ElmoClient")
+    client.return_value.check.return_value = {
+        "areas_armed": [],
+        "areas_disarmed": [],
+        "inputs_alerted": [],
+        "inputs_wait": [],
+    }
+    assert probe.run() is True
+    assert probe.run() is True
+    assert client.return_value.auth.call_count == 1
+
+    # Expired token: the first check fails
+    client.return_value.check.side_effect = [
+        HTTPError("401"),
+        client.return_value.check.return_value,
+    ]
+    assert probe.run() is True
+    assert client.return_value.auth.call_count == 2
@@ -0,0 +1,166 @@
+import asyncio
+import logging
+
+from aiohttp import web
+
+from hal.probes.hass import HassProbe, state_value
+
+
+class Collector(object):
+    def __init__(self):
+        self.batches = []
+
+    def send(self, data):
+        self.batches.append(data)
+
+
+def state_changed(entity_id, state):
+    return {
+        "id": 1,
+        "type": "event",
+        "event": {
+            "event_type": "state_changed",
+            "data": {"entity_id": entity_id, "new_state": {"state": state}},
+        },
+    }
+
+
+async def run_probe(sessions, config, token="valid"):
+    """Runs the probe against a stand-in Home Assistant WebSocket API. Each item of
+    ``sessions`` is a ``(states, events)`` tuple served to a new connection.
+    """
+    connections = []
+
+    async def websocket(request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        connections.append(ws)
+        states, events = sessions[min(len(connections), len(sessions)) - 1]
+        await ws.send_json({"type": "auth_required"})
+        auth = await ws.receive_json()
+        if auth["access_token"] != token:
+            await ws.send_json({"type": "auth_invalid"})
+            return ws
+        await ws.send_json({"type": "auth_ok"})
+        subscribe = await ws.receive_json()
+        await ws.send_json({"id": subscribe["id"], "type": "result", "success": True})
+        get_states = await ws.receive_json()
+        result = [{"entity_id": k, "state": v} for k, v in states.items()]
+        await ws.send_json(
+            {
+                "id": get_states["id"],
+                "type": "result",
+                "success": True,
+                "result": result,
+            }
+        )
+        for event in events:
+            await ws.send_json(event)
+        await asyncio.sleep(0.05)
+        return ws
+
+    app = web.Application()
+    app.router.add_get("/api/websocket", websocket)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    probe = HassProbe(
+        {
+            "url": "http://127.0.0.1:{}/api/websocket".format(port),
+            "token": "valid",
+            "reconnect_interval": 0.05,
+            **config,
+        }
+    )
+    status = await probe.run()
+    await runner.cleanup()
+    return probe, status, connections
+
+
+def test_hass_probe():
+    """Should be initialized with a default config."""
+    probe = HassProbe()
+    assert probe.config["url"] is None
+    assert probe.config["token"] is None
+
+
+def test_hass_without_config(caplog):
+    """Should fail if url and token are not defined."""
+    with caplog.at_level(logging.ERROR):
+        assert asyncio.run(HassProbe().run()) is False
+        assert "missing 'url' and 'token'" in caplog.records[0].message
+
+
+def test_hass_state_value():
+    """Should convert numeric and boolean states."""
+    assert state_value("21.5") == 21.5
+    assert state_value("on") == 1
+    assert state_value("not_home") == 0
+    assert state_value("unavailable") is None
+    assert state_value(None) is None
+
+
+def test_hass_state_changes():
+    """Should export initial states and numeric/boolean changes only."""
+    collector = Collector()
+    sessions = [
+        (
+            {"sensor.temperature": "21.5", "light.kitchen": "off", "sun.sun": "up"},
+            [
+                state_changed("light.kitchen", "on"),
+                state_changed("sensor.temperature", "21.5"),
+                state_changed("media_player.tv", "playing"),
+            ],
+        )
+    ]
+    config = {"duration": 0.3, "flush_interval": 10, "exporters": [collector]}
+    probe, status, _ = asyncio.run(run_probe(sessions, config))
+    assert status is True
+    assert collector.batches == [
+        {
+            "hal.hass.sensor": [(21.5, ["entity_id:sensor.temperature"])],
+            "hal.hass.light": [(1, ["entity_id:light.kitchen"])],
+        }
+    ]
+    assert probe.states == {"sensor.temperature": 21.5, "light.kitchen": 1}
+
+
+def test_hass_resync_after_reconnect():
+    """Should export only entities changed while disconnected."""
+    collector = Collector()
+    sessions = [
+        ({"sensor.temperature": "21.5", "light.kitchen": "off"}, []),
+        ({"sensor.temperature": "22.0", "light.kitchen": "off"}, []),
+    ]
+    config = {"duration": 0.4, "flush_interval": 0.05, "exporters": [collector]}
+    probe, status, connections = asyncio.run(run_probe(sessions, config))
+    assert status is True
+    assert len(connections) >= 2
+    assert collector.batches[0] == {
+        "hal.hass.sensor": [(21.5, ["entity_id:sensor.temperature"])],
+        "hal.hass.light": [(0, ["entity_id:light.kitchen"])],
+    }
+    assert collector.batches[1] == {
+        "hal.hass.sensor": [(22.0, ["entity_id:sensor.temperature"])]
+    }
+    assert len(collector.batches) == 2
+
+
+def test_hass_domains():
+    """Should track only the configured domains."""
+    collector = Collector()
+    sessions = [({"sensor.temperature": "21.5", "light.kitchen": "off"}, [])]
+    config = {"duration": 0.2, "domains": ["light"], "exporters": [collector]}
+    probe, _, _ = asyncio.run(run_probe(sessions, config))
+    assert probe.states == {"light.kitchen": 0}
+
+
+def test_hass_auth_failed(caplog):
+    """Should fail if the token is not valid."""
+    with caplog.at_level(logging.ERROR):
+        _, status, _ = asyncio.run(run_probe([({}, [])], {}, token="other"))
+        assert status is False
+        assert "authentication failed" in caplog.records[0].message
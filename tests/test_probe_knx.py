@@ -0,0 +1,267 @@
+import struct
+import asyncio
+import logging
+import pytest
+
+from hal.probes import knx
+from hal.probes.knx import KNXProbe, decode_value, parse_cemi
+
+
+def telegram(address, data, small=True):
+    """Builds a cEMI L_Data.ind group value write."""
+    main, middle, sub = map(int, address.split("/"))
+    destination = (main << 11) | (middle << 8) | sub
+    if small:
+        tpdu = bytes([0x00, 0x80 | data[0]])
+    else:
+        tpdu = bytes([0x00, 0x80]) + data
+    return (
+        bytes([knx.L_DATA_IND, 0, 0xBC, 0xE0, 0x11, 0x01])
+        + struct.pack(">H", destination)
+        + bytes([len(tpdu) - 1])
+        + tpdu
+    )
+
+
+class TunnelServer(asyncio.DatagramProtocol):
+    """Stand-in KNX/IP tunnel server that sends the given telegrams after connecting."""
+
+    def __init__(
+        self, telegrams, accept=True, heartbeats=True, disconnect=False, bodies=()
+    ):
+        self.telegrams = telegrams
+        self.bodies = bodies
+        self.accept = accept
+        self.heartbeats = heartbeats
+        self.disconnect = disconnect
+        self.received = []
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        service = struct.unpack(">H", data[2:4])[0]
+        self.received.append(service)
+        if service == knx.CONNECT_REQUEST:
+            status = 0 if self.accept else 0x24
+            self.transport.sendto(
+                knx.frame(knx.CONNECT_RESPONSE, bytes([7, status])), addr
+            )
+            if self.accept:
+                for body in self.bodies:
+                    # Raw tunneling request bodies, e.g. malformed ones
+                    self.transport.sendto(knx.frame(knx.TUNNELING_REQUEST, body), addr)
+                for sequence, cemi in enumerate(self.telegrams):
+                    body = bytes([4, 7, sequence, 0]) + cemi
+                    self.transport.sendto(knx.frame(knx.TUNNELING_REQUEST, body), addr)
+            if self.disconnect:
+                # Close the first tunnel only
+                self.disconnect = False
+                body = bytes([7, 0]) + knx.hpai("127.0.0.1", 3671)
+                self.transport.sendto(knx.frame(knx.DISCONNECT_REQUEST, body), addr)
+        elif service == knx.CONNECTIONSTATE_REQUEST and self.heartbeats:
+            self.transport.sendto(
+                knx.frame(knx.CONNECTIONSTATE_RESPONSE, bytes([7, 0])), addr
+            )
+
+
+async def run_probe(server, config):
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(
+        lambda: server, local_addr=("127.0.0.1", 0)
+    )
+    port = transport.get_extra_info("sockname")[1]
+    probe = KNXProbe({"host": "127.0.0.1", "port": port, **config})
+    status = await probe.run()
+    transport.close()
+    return probe, status
+
+
+def test_knx_probe():
+    """Should be initialized with a default config."""
+    probe = KNXProbe()
+    assert probe.config["host"] is None
+    assert probe.config["port"] == 3671
+    assert probe.config["group_addresses"] == {}
+
+
+def test_knx_without_host(caplog):
+    """Should fail if the KNX interface is not defined."""
+    probe = KNXProbe()
+    with caplog.at_level(logging.ERROR):
+        assert asyncio.run(probe.run()) is False
+        assert "missing KNX 'host'" in caplog.records[0].message
+
+
+def test_knx_decode_values():
+    """Should decode supported datapoint types."""
+    assert decode_value("switch", b"\x01") == 1
+    assert decode_value("percent", b"\xff") == 100.0
+    assert decode_value("percent", b"\x80") == 50.2
+    assert decode_value("float", b"\x0c\x1a") == 21.0
+    assert decode_value("float", b"\x87\x9c") == -1.0
+    with pytest.raises(ValueError):
+        decode_value("string", b"\x00")
+
+
+def test_knx_parse_cemi():
+    """Should parse group value writes."""
+    assert parse_cemi(telegram("0/0/12", b"\x01")) == ("0/0/12", b"\x01")
+    assert parse_cemi(telegram("2/0/1", b"\x0c\x1a", small=False)) == (
+        "2/0/1",
+        b"\x0c\x1a",
+    )
+    # Group value read
+    read = bytearray(telegram("0/0/12", b"\x00"))
+    read[-1] = 0x00
+    assert parse_cemi(bytes(read)) is None
+
+
+def test_knx_stream_coalesce():
+    """Should decode telegrams and export coalesced micro-batches."""
+    batches = []
+
+    class Exporter(object):
+        def send(self, data):
+            batches.append(data)
+
+    server = TunnelServer(
+        [
+            telegram("0/0/12", b"\x01"),
+            telegram("0/0/12", b"\x00"),
+            telegram("1/0/6", b"\xff", small=False),
+            telegram("2/0/1", b"\x0c\x1a", small=False),
+            telegram("3/3/3", b"\x01"),
+        ]
+    )
+    config = {
+        "duration": 0.3,
+        "flush_interval": 0.1,
+        "exporters": [Exporter()],
+        "group_addresses": {
+            "0/0/12": {
+                "metric": "hal.knx.light.state",
+                "type": "switch",
+                "tags": ["name:Kitchen"],
+            },
+            "1/0/6": {
+                "metric": "hal.knx.blind.position",
+                "type": "percent",
+                "tags": ["name:Living"],
+            },
+            "2/0/1": {"metric": "hal.knx.climate.temperature", "type": "float"},
+        },
+    }
+    probe, status = asyncio.run(run_probe(server, config))
+    assert status is True
+    assert batches == [
+        {
+            "hal.knx.light.state": [(0, ["name:Kitchen"])],
+            "hal.knx.blind.position": [(100.0, ["name:Living"])],
+            "hal.knx.climate.temperature": [(21.0, [])],
+        }
+    ]
+    assert server.received.count(knx.TUNNELING_ACK) == 5
+    assert server.received[-1] == knx.DISCONNECT_REQUEST
+
+
+def test_knx_malformed_frames(caplog):
+    """Should drop malformed frames and keep the stream open."""
+    batches = []
+
+    class Exporter(object):
+        def send(self, data):
+            batches.append(data)
+
+    server = TunnelServer(
+        [telegram("0/0/12", b"\x01")],
+        bodies=[
+            # Truncated tunneling header
+            bytes([4, 7]),
+            # Truncated cEMI frame
+            bytes([4, 7, 9, 0]) + telegram("0/0/12", b"\x00")[:8],
+        ],
+    )
+    config = {
+        "duration": 0.2,
+        "flush_interval": 0.1,
+        "exporters": [Exporter()],
+        "group_addresses": {
+            "0/0/12": {"metric": "hal.knx.light.state", "type": "switch"}
+        },
+    }
+    with caplog.at_level(logging.DEBUG, logger="hal.probes.knx"):
+        probe, status = asyncio.run(run_probe(server, config))
+    assert status is True
+    assert batches == [{"hal.knx.light.state": [(1, [])]}]
+    assert caplog.text.count("dropping malformed frame") == 2
+
+
+def test_knx_connection_refused(caplog):
+    """Should fail if the interface refuses the tunnel."""
+    with caplog.at_level(logging.ERROR):
+        _, status = asyncio.run(run_probe(TunnelServer([], accept=False), {}))
+        assert status is False
+        assert "refused the connection" in caplog.records[0].message
+
+
+def test_knx_heartbeat():
+    """Should send connection state requests while idle."""
+    server = TunnelServer([])
+    config = {"duration": 0.35, "heartbeat_interval": 0.1}
+    _, status = asyncio.run(run_probe(server, config))
+    assert status is True
+    assert server.received.count(knx.CONNECTIONSTATE_REQUEST) >= 2
+
+
+def test_knx_heartbeat_busy_bus():
+    """Should send connection state requests while telegrams are received."""
+
+    class BusyServer(TunnelServer):
+        def datagram_received(self, data, addr):
+            super().datagram_received(data, addr)
+            service = struct.unpack(">H", data[2:4])[0]
+            if service in (knx.CONNECT_REQUEST, knx.TUNNELING_ACK):
+                # Send the next telegram as soon as the previous one is acknowledged
+                sequence = len(self.received) % 256
+                body = bytes([4, 7, sequence, 0]) + telegram("0/0/12", b"\x01")
+                asyncio.get_running_loop().call_later(
+                    0.005,
+                    self.transport.sendto,
+                    knx.frame(knx.TUNNELING_REQUEST, body),
+                    addr,
+                )
+
+    server = BusyServer([])
+    config = {"duration": 0.35, "heartbeat_interval": 0.1}
+    _, status = asyncio.run(run_probe(server, config))
+    assert status is True
+    assert server.received.count(knx.TUNNELING_ACK) > 10
+    assert server.received.count(knx.CONNECTIONSTATE_REQUEST) >= 2
+
+
+def test_knx_reconnect_after_disconnect():
+    """Should open a new tunnel if the interface closes the connection."""
+    server = TunnelServer([], disconnect=True)
+    config = {"duration": 0.2, "reconnect_interval": 0.05}
+    _, status = asyncio.run(run_probe(server, config))
+    assert status is True
+    assert server.received.count(knx.DISCONNECT_RESPONSE) == 1
+    assert server.received.count(knx.CONNECT_REQUEST) == 2
+
+
+def test_knx_reconnect_missed_heartbeats():
+    """Should open a new tunnel if heartbeats are not confirmed."""
+    server = TunnelServer([], heartbeats=False)
+    config = {
+        "duration": 0.4,
+        "heartbeat_interval": 0.05,
+        "timeout": 0.02,
+        "reconnect_interval": 0.05,
+    }
+    _, status = asyncio.run(run_probe(server, config))
+    assert status is True
+    assert server.received.count(knx.CONNECT_REQUEST) >= 2
+    # A connection state request is retried 3 times before reconnecting
+    first = server.received.index(knx.CONNECT_REQUEST, 1)
+    assert server.received[:first].count(knx.CONNECTIONSTATE_REQUEST) == 3
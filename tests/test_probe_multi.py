@@ -0,0 +1,103 @@
+import logging
+
+from hal.probes.base import BaseProbe
+from hal.probes.multi import MultiAccountProbe
+
+
+class AccountProbe(BaseProbe):
+    DEFAULTS = {"token": None, "region": None}
+
+    def _run(self):
+        if self.config["token"] == "invalid":
+            return False, "run failed for invalid token"
+        if self.config["token"] == "unreachable":
+            raise ConnectionError("connection refused")
+        self.results = {
+            "hal.account.count": 1,
+            "hal.account.region": (1, ["region:{}".format(self.config["region"])]),
+        }
+        return True, None
+
+
+def test_multi_probe_without_accounts(caplog):
+    """Should fail if the probe or accounts are not defined."""
+    probe = MultiAccountProbe()
+    with caplog.at_level(logging.ERROR):
+        assert probe.run() is False
+        assert "missing 'probe' and 'accounts'" in caplog.records[0].message
+
+
+def test_multi_probe_success():
+    """Should merge results of all accounts adding the account tag."""
+    probe = MultiAccountProbe(
+        {
+            "probe": AccountProbe,
+            "region": "eu",
+            "accounts": [
+                {"account": "work", "token": "a"},
+                {"account": "home", "token": "b", "region": "us"},
+            ],
+        }
+    )
+    assert probe.run() is True
+    assert probe.results == {
+        "hal.account.count": [(1, ["account:work"]), (1, ["account:home"])],
+        "hal.account.region": [
+            (1, ["region:eu", "account:work"]),
+            (1, ["region:us", "account:home"]),
+        ],
+    }
+
+
+def test_multi_probe_reuse_probes():
+    """Should keep child probes across runs."""
+    probe = MultiAccountProbe(
+        {"probe": AccountProbe, "accounts": [{"account": "work", "token": "a"}]}
+    )
+    probe.run()
+    child = probe.probes["work"]
+    probe.run()
+    assert probe.probes["work"] is child
+    assert probe.results["hal.account.count"] == [(1, ["account:work"])]
+
+
+def test_multi_probe_partial_failure():
+    """Should skip accounts that fail."""
+    probe = MultiAccountProbe(
+        {
+            "probe": AccountProbe,
+            "accounts": [
+                {"account": "work", "token": "invalid"},
+                {"account": "home", "token": "b"},
+            ],
+        }
+    )
+    assert probe.run() is True
+    assert probe.results["hal.account.count"] == [(1, ["account:home"])]
+
+
+def test_multi_probe_account_exception(caplog):
+    """Should collect results of other accounts if an account raises an exception."""
+    probe = MultiAccountProbe(
+        {
+            "probe": AccountProbe,
+            "accounts": [
+                {"account": "work", "token": "unreachable"},
+                {"account": "home", "token": "b"},
+            ],
+        }
+    )
+    with caplog.at_level(logging.ERROR):
+        assert probe.run() is True
+        assert "account 'work' raised an exception" in caplog.records[0].message
+    assert probe.results["hal.account.count"] == [(1, ["account:home"])]
+
+
+def test_multi_probe_failure(caplog):
+    """Should fail if all accounts fail."""
+    probe = MultiAccountProbe(
+        {"probe": AccountProbe, "accounts": [{"account": "work", "token": "invalid"}]}
+    )
+    with caplog.at_level(logging.ERROR):
+        assert probe.run() is False
+        assert "run failed for all accounts" in caplog.records[-1].message
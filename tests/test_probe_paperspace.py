@@ -1,7 +1,13 @@
+import time
+import asyncio
 import logging
 import responses
 
-from hal.probes.paperspace import PaperspaceProbe
+from unittest import mock
+
+from hal.deadline import Deadline
+from hal.probes.paperspace import AsyncPaperspaceProbe, PaperspaceProbe
+from hal.snapshots.file import FileSnapshotStore
 
 
 def test_paperspace_probe():
@@ -209,3 +215,249 @@ def test_paperspace_fail_machine(server, caplog):
         for record in caplog.records:
             assert record.levelname == "ERROR"
             assert "Skip machine check" in record.message
+
+
+def test_paperspace_pagination(server):
+    """Should follow pages until a partial page is returned."""
+    utilization = """
+      {"utilization": {"secondsUsed": 10, "hourlyRate": "0.78"},
+       "storageUtilization": {"monthlyRate": "10.00"}}
+    """
+    server.add(
+        responses.GET,
+        "https://api.paperspace.io/machines/getMachines?limit=2&skip=0",
+        body='[{"id": "m1", "state": "off"}, {"id": "m2", "state": "off"}]',
+        status=200,
+        match_querystring=True,
+    )
+    server.add(
+        responses.GET,
+        "https://api.paperspace.io/machines/getMachines?limit=2&skip=2",
+        body='[{"id": "m3", "state": "off"}]',
+        status=200,
+        match_querystring=True,
+    )
+    server.add(
+        responses.GET,
+        "https://api.paperspace.io/machines/getUtilization",
+        body=utilization,
+        status=200,
+    )
+    probe = PaperspaceProbe({"api_key": "valid", "page_size": 2})
+    assert probe.run() is True
+    assert probe.results["hal.paperspace.machines.count"] == 3
+    assert len(probe.results["hal.paperspace.utilization.instance.usage_seconds"]) == 3
+    assert set(probe.machines) == {"m1", "m2", "m3"}
+
+
+def test_paperspace_pagination_fail(server, caplog):
+    """Should fail if any page cannot be retrieved."""
+    server.add(
+        responses.GET,
+        "https://api.paperspace.io/machines/getMachines?limit=1&skip=0",
+        body='[{"id": "m1", "state": "off"}]',
+        status=200,
+        match_querystring=True,
+    )
+    server.add(
+        responses.GET,
+        "https://api.paperspace.io/machines/getMachines?limit=1&skip=1",
+        body="Service unavailable",
+        status=503,
+        match_querystring=True,
+    )
+    probe = PaperspaceProbe({"api_key": "valid", "page_size": 1})
+    with caplog.at_level(logging.ERROR):
+        assert probe.run() is False
+        assert probe.results == {}
+        assert "Service unavailable" in caplog.records[0].message
+
+
+def test_paperspace_incremental(server):
+    """Should refresh utilization only for added, changed or running machines."""
+    utilization = """
+      {"utilization": {"secondsUsed": 10, "hourlyRate": "0.78"},
+       "storageUtilization": {"monthlyRate": "10.00"}}
+    """
+    listing = "https://api.paperspace.io/machines/getMachines"
+    server.add(
+        responses.GET,
+        listing,
+        body='[{"id": "m1", "state": "off"}, {"id": "m2", "state": "ready"}]',
+        status=200,
+    )
+    server.add(
+        responses.GET,
+        "https://api.paperspace.io/machines/getUtilization",
+        body=utilization,
+        status=200,
+    )
+    probe = PaperspaceProbe({"api_key": "valid", "incremental": True})
+    probe.run()
+    assert len(server.calls) == 3
+
+    # Second run: `m1` is unchanged and off, `m2` is running
+    server.calls.reset()
+    probe.run()
+    assert len(server.calls) == 2
+    assert server.calls[1].request.params["machineId"] == "m2"
+    assert len(probe.results["hal.paperspace.utilization.instance.usage_seconds"]) == 2
+
+    # Third run: `m1` changes state and `m2` is removed
+    server.replace(
+        responses.GET,
+        listing,
+        body='[{"id": "m1", "state": "starting"}]',
+        status=200,
+    )
+    server.calls.reset()
+    probe.run()
+    assert len(server.calls) == 2
+    assert server.calls[1].request.params["machineId"] == "m1"
+    assert set(probe.machines) == {"m1"}
+    assert probe.results["hal.paperspace.machines.count"] == 1
+
+
+def test_async_paperspace_success(stand_in):
+    """Should collect metrics retrieving machines utilization concurrently."""
+    utilization = """
+      {"utilization": {"secondsUsed": 10, "hourlyRate": "0.78"},
+       "storageUtilization": {"monthlyRate": "10.00"}}
+    """
+    stand_in.add(
+        "GET",
+        "/machines/getMachines",
+        body='[{"id": "m1", "state": "off"}, {"id": "m2", "state": "ready"}]',
+    )
+    stand_in.add("GET", "/machines/getUtilization", body=utilization)
+    probe = AsyncPaperspaceProbe({"api_key": "valid", "base_url": stand_in.url})
+    assert asyncio.run(probe.run()) is True
+    assert probe.results["hal.paperspace.machines.count"] == 2
+    assert probe.results["hal.paperspace.utilization.instance.usage_seconds"] == [
+        (10, ["machine_id:m1"]),
+        (10, ["machine_id:m2"]),
+    ]
+    assert stand_in.requests[0].headers["x-api-key"] == "valid"
+
+
+def test_async_paperspace_pagination(stand_in):
+    """Should follow pages until a partial page is returned."""
+    utilization = """
+      {"utilization": {"secondsUsed": 10, "hourlyRate": "0.78"},
+       "storageUtilization": {"monthlyRate": "10.00"}}
+    """
+    pages = {
+        "0": '[{"id": "m1", "state": "off"}, {"id": "m2", "state": "off"}]',
+        "2": '[{"id": "m2", "state": "off"}, {"id": "m3", "state": "off"}]',
+        "4": "[]",
+    }
+    stand_in.add(
+        "GET",
+        "/machines/getMachines",
+        lambda request: (200, pages[request.params["skip"]]),
+    )
+    stand_in.add("GET", "/machines/getUtilization", body=utilization)
+    probe = AsyncPaperspaceProbe(
+        {"api_key": "valid", "base_url": stand_in.url, "page_size": 2}
+    )
+    assert asyncio.run(probe.run()) is True
+    # Machines shifted across pages are listed once
+    assert probe.results["hal.paperspace.machines.count"] == 3
+    assert set(probe.machines) == {"m1", "m2", "m3"}
+    listing = [r.params for r in stand_in.requests if r.path.endswith("getMachines")]
+    assert listing == [
+        {"limit": "2", "skip": "0"},
+        {"limit": "2", "skip": "2"},
+        {"limit": "2", "skip": "4"},
+    ]
+
+
+def test_async_paperspace_fail(stand_in):
+    """Should fail if an invalid API key is used."""
+    stand_in.add("GET", "/machines/getMachines", body="No such API token", status=401)
+    probe = AsyncPaperspaceProbe({"api_key": "invalid", "base_url": stand_in.url})
+    assert asyncio.run(probe.run()) is False
+    assert probe.results == {}
+
+
+def test_paperspace_incremental_warm_start(server, tmp_path):
+    """Should restore the machine index from the snapshot store."""
+    utilization = """
+      {"utilization": {"secondsUsed": 10, "hourlyRate": "0.78"},
+       "storageUtilization": {"monthlyRate": "10.00"}}
+    """
+    server.add(
+        responses.GET,
+        "https://api.paperspace.io/machines/getMachines",
+        body='[{"id": "m1", "state": "off"}]',
+        status=200,
+    )
+    server.add(
+        responses.GET,
+        "https://api.paperspace.io/machines/getUtilization",
+        body=utilization,
+        status=200,
+    )
+    config = {
+        "api_key": "valid",
+        "incremental": True,
+        "snapshot_store": FileSnapshotStore({"path": str(tmp_path)}),
+    }
+    PaperspaceProbe(config).run()
+    server.calls.reset()
+
+    probe = PaperspaceProbe(config)
+    probe.run()
+    assert len(server.calls) == 1
+    assert probe.results["hal.paperspace.utilization.instance.usage_seconds"] == [
+        (10, ["machine_id:m1"])
+    ]
+
+
+def _slow_utilization(request):
+    if request.params["machineId"] == "m2":
+        time.sleep(0.5)
+    return 200, (
+        '{"utilization": {"secondsUsed": 10, "hourlyRate": "0.78"},'
+        ' "storageUtilization": {"monthlyRate": "10.00"}}'
+    )
+
+
+def test_paperspace_deadline(stand_in):
+    """Should export partial results if machines are not checked in time."""
+    stand_in.add(
+        "GET",
+        "/machines/getMachines",
+        body='[{"id": "m1", "state": "off"}, {"id": "m2", "state": "ready"}]',
+    )
+    stand_in.add("GET", "/machines/getUtilization", _slow_utilization)
+    exporter = mock.Mock()
+    probe = PaperspaceProbe(
+        {"api_key": "valid", "base_url": stand_in.url, "exporters": [exporter]}
+    )
+    assert probe.run(Deadline(0.25)) is True
+    assert probe.partial is True
+    assert probe.results["hal.paperspace.machines.count"] == 2
+    assert probe.results["hal.paperspace.utilization.instance.usage_seconds"] == [
+        (10, ["machine_id:m1"])
+    ]
+
+    probe.export()
+    data = exporter.send.call_args[0][0]
+    assert data["hal.paperspace.machines.count"] == (2, ["partial:true"])
+
+
+def test_async_paperspace_deadline(stand_in):
+    """Should export machines refreshed before the deadline."""
+    stand_in.add(
+        "GET",
+        "/machines/getMachines",
+        body='[{"id": "m1", "state": "off"}, {"id": "m2", "state": "ready"}]',
+    )
+    stand_in.add("GET", "/machines/getUtilization", _slow_utilization)
+    probe = AsyncPaperspaceProbe({"api_key": "valid", "base_url": stand_in.url})
+    assert asyncio.run(probe.run(Deadline(0.25, reserve=0.1))) is True
+    assert probe.partial is True
+    assert probe.results["hal.paperspace.utilization.instance.usage_seconds"] == [
+        (10, ["machine_id:m1"])
+    ]
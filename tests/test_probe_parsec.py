@@ -1,7 +1,11 @@
+import time
+import asyncio
 import logging
 import responses
+import threading
 
-from hal.probes.parsec import ParsecProbe
+from hal.deadline import Deadline
+from hal.probes.parsec import AsyncParsecProbe, ParsecProbe
 
 
 def test_parsec_probe():
@@ -84,3 +88,97 @@ def test_parsec_fail(server, caplog):
         for record in caplog.records:
             assert record.levelname == "ERROR"
             assert "Server returns 'Session invalid.'" in record.message
+
+
+def test_async_parsec_success(stand_in):
+    """Should succeed with a valid session ID."""
+    stand_in.add("GET", "/v1/me", body='{"play_time": 5000, "credits": 100}')
+    probe = AsyncParsecProbe(
+        {"session_id": "valid", "url": "{}/v1/me".format(stand_in.url)}
+    )
+    assert asyncio.run(probe.run()) is True
+    assert probe.results == {"hal.parsec.play_time": 5000, "hal.parsec.credits": 100}
+    assert stand_in.requests[0].headers["X-Parsec-Session-Id"] == "valid"
+
+
+def test_async_parsec_fail(stand_in):
+    """Should fail if an invalid session ID is used."""
+    stand_in.add("GET", "/v1/me", body="Session invalid.", status=403)
+    probe = AsyncParsecProbe(
+        {"session_id": "invalid", "url": "{}/v1/me".format(stand_in.url)}
+    )
+    assert asyncio.run(probe.run()) is False
+    assert probe.results == {}
+
+
+def test_parsec_coalesce_requests(stand_in):
+    """Should send a single request for probes calling the same account."""
+
+    def slow(request):
+        time.sleep(0.1)
+        return 200, '{"play_time": 10, "credits": 1}'
+
+    stand_in.add("GET", "/v1/me", slow)
+    config = {"session_id": "valid", "url": "{}/v1/me".format(stand_in.url)}
+    probes = [ParsecProbe(config) for _ in range(3)]
+    threads = [threading.Thread(target=probe.run) for probe in probes]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(stand_in.requests) == 1
+    assert all(probe.results["hal.parsec.play_time"] == 10 for probe in probes)
+
+    # Different credentials are never coalesced
+    ParsecProbe({**config, "session_id": "other"}).run()
+    assert len(stand_in.requests) == 2
+
+
+def test_parsec_coalesce_deadline(stand_in):
+    """Should not fail a coalesced probe when the probe that sent the request runs
+    out of its deadline.
+    """
+
+    def slow(request):
+        time.sleep(0.2)
+        return 200, '{"play_time": 10, "credits": 1}'
+
+    stand_in.add("GET", "/v1/me", slow)
+    config = {"session_id": "valid", "url": "{}/v1/me".format(stand_in.url)}
+    short, unbounded = ParsecProbe(config), ParsecProbe(config)
+    statuses = {}
+    threads = [
+        threading.Thread(
+            target=lambda: statuses.update(short=short.run(Deadline(0.1)))
+        ),
+        threading.Thread(target=lambda: statuses.update(unbounded=unbounded.run())),
+    ]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.02)
+    for thread in threads:
+        thread.join()
+
+    assert statuses == {"short": False, "unbounded": True}
+    assert unbounded.results["hal.parsec.play_time"] == 10
+
+
+def test_async_parsec_coalesce_deadline(stand_in):
+    """Should not fail a coalesced probe when the probe that sent the request is
+    cancelled by its deadline.
+    """
+
+    def slow(request):
+        time.sleep(0.2)
+        return 200, '{"play_time": 10, "credits": 1}'
+
+    stand_in.add("GET", "/v1/me", slow)
+    config = {"session_id": "valid", "url": "{}/v1/me".format(stand_in.url)}
+    short, unbounded = AsyncParsecProbe(config), AsyncParsecProbe(config)
+
+    async def main():
+        return await asyncio.gather(short.run(Deadline(0.1)), unbounded.run())
+
+    assert asyncio.run(main()) == [False, True]
+    assert unbounded.results["hal.parsec.play_time"] == 10
@@ -0,0 +1,114 @@
+import sqlite3
+import logging
+import pytest
+
+from hal.probes.recorder import RecorderProbe
+
+
+@pytest.fixture
+def database(tmp_path):
+    """Create a recorder database with the current schema."""
+    path = str(tmp_path / "home-assistant_v2.db")
+    connection = sqlite3.connect(path)
+    connection.executescript(
+        """
+        CREATE TABLE states_meta (metadata_id INTEGER PRIMARY KEY, entity_id TEXT);
+        CREATE TABLE states (
+            state_id INTEGER PRIMARY KEY,
+            metadata_id INTEGER,
+            state TEXT,
+            last_updated_ts REAL
+        );
+        INSERT INTO states_meta VALUES (1, 'sensor.temperature'), (2, 'light.kitchen');
+        INSERT INTO states VALUES
+            (1, 1, '21.5', 1000.0),
+            (2, 2, 'on', 1001.0),
+            (3, 1, 'unavailable', 1002.0),
+            (4, 1, '22.0', 1003.0),
+            (5, 2, 'off', 1004.0);
+        """
+    )
+    connection.commit()
+    connection.close()
+    return path
+
+
+def test_recorder_probe():
+    """Should be initialized with a default config."""
+    probe = RecorderProbe()
+    assert probe.config["database"] is None
+    assert probe.last_state_id == 0
+
+
+def test_recorder_without_database(caplog):
+    """Should fail if the database is not defined."""
+    with caplog.at_level(logging.ERROR):
+        assert RecorderProbe().run() is False
+        assert "missing 'database'" in caplog.records[0].message
+
+
+def test_recorder_missing_database(tmp_path):
+    """Should fail if the database doesn't exist, without creating it."""
+    probe = RecorderProbe({"database": str(tmp_path / "missing.db")})
+    assert probe.run() is False
+    assert not (tmp_path / "missing.db").exists()
+
+
+def test_recorder_read(database):
+    """Should read numeric and boolean states with their timestamps."""
+    probe = RecorderProbe({"database": database})
+    assert probe.run() is True
+    assert probe.results == {
+        "hal.hass.sensor": [
+            ([(1000.0, 21.5), (1003.0, 22.0)], ["entity_id:sensor.temperature"])
+        ],
+        "hal.hass.light": [([(1001.0, 1), (1004.0, 0)], ["entity_id:light.kitchen"])],
+    }
+    assert probe.last_state_id == 5
+
+
+def test_recorder_incremental(database):
+    """Should read rows in batches and resume from the last processed row."""
+    probe = RecorderProbe({"database": database, "batch_size": 2, "max_batches": 1})
+    probe.run()
+    assert probe.last_state_id == 2
+    probe.run()
+    assert probe.last_state_id == 4
+    assert probe.results == {
+        "hal.hass.sensor": [([(1003.0, 22.0)], ["entity_id:sensor.temperature"])]
+    }
+
+    connection = sqlite3.connect(database)
+    connection.execute("INSERT INTO states VALUES (6, 1, '23.0', 1005.0)")
+    connection.commit()
+    connection.close()
+    probe.config["max_batches"] = 10
+    probe.run()
+    assert probe.last_state_id == 6
+    assert probe.results["hal.hass.sensor"] == [
+        ([(1005.0, 23.0)], ["entity_id:sensor.temperature"])
+    ]
+
+
+def test_recorder_legacy_schema(tmp_path):
+    """Should read databases with the legacy schema."""
+    path = str(tmp_path / "legacy.db")
+    connection = sqlite3.connect(path)
+    connection.executescript(
+        """
+        CREATE TABLE states (
+            state_id INTEGER PRIMARY KEY,
+            entity_id TEXT,
+            state TEXT,
+            last_updated DATETIME
+        );
+        INSERT INTO states VALUES (1, 'sensor.power', '120', '1970-01-01 00:16:40');
+        """
+    )
+    connection.commit()
+    connection.close()
+    probe = RecorderProbe({"database": path, "domains": ["sensor"]})
+    assert probe.run() is True
+    assert probe.results == {
+        "hal.hass.sensor": [([(1000.0, 120.0)], ["entity_id:sensor.power"])]
+    }
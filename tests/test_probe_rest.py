@@ -0,0 +1,85 @@
+import json
+import asyncio
+import logging
+import pytest
+
+from hal.probes.rest import AsyncRestProbe, RestProbe
+
+
+RULES = [
+    {"metric": "hal.machines.count", "path": "$.total"},
+    {
+        "metric": "hal.machines.usage",
+        "each": "$.machines[*]",
+        "path": "$.usage",
+        "tags": {"machine_id": "$.id", "team": "$.tags.team"},
+    },
+]
+BODY = json.dumps(
+    {
+        "total": 2,
+        "machines": [
+            {"id": "ps1", "usage": 10, "tags": {"team": "a"}},
+            {"id": "ps2", "usage": "n/a"},
+            {"id": "ps3", "usage": 0.5},
+        ],
+    }
+)
+
+
+def test_rest_probe_success(stand_in):
+    """Should extract metrics with the configured rules."""
+    stand_in.add("GET", "/api/machines", body=BODY)
+    probe = RestProbe(
+        {
+            "url": "{}/api/machines".format(stand_in.url),
+            "headers": {"Authorization": "Bearer token"},
+            "params": {"limit": "10"},
+            "rules": RULES,
+        }
+    )
+    assert probe.run() is True
+    assert probe.results == {
+        "hal.machines.count": [(2, [])],
+        "hal.machines.usage": [
+            (10, ["machine_id:ps1", "team:a"]),
+            (0.5, ["machine_id:ps3"]),
+        ],
+    }
+    request = stand_in.requests[0]
+    assert request.headers["Authorization"] == "Bearer token"
+    assert request.params == {"limit": "10"}
+
+
+def test_rest_probe_fail(stand_in, caplog):
+    """Should fail if the API returns an error."""
+    stand_in.add("GET", "/api/machines", body="Unauthorized", status=401)
+    probe = RestProbe({"url": "{}/api/machines".format(stand_in.url), "rules": RULES})
+    with caplog.at_level(logging.ERROR):
+        assert probe.run() is False
+    assert probe.results == {}
+    assert "Server returns 'Unauthorized'" in caplog.records[0].message
+
+
+def test_rest_probe_without_url():
+    """Should fail if the URL is not set."""
+    assert RestProbe({"rules": RULES}).run() is False
+
+
+def test_rest_probe_invalid_rules():
+    """Should reject invalid rules when the probe is created."""
+    with pytest.raises(ValueError):
+        RestProbe({"rules": [{"metric": "hal.metric"}]})
+    with pytest.raises(ValueError):
+        RestProbe({"rules": [{"metric": "hal.metric", "path": "total"}]})
+
+
+def test_async_rest_probe_success(stand_in):
+    """Should extract metrics with the configured rules."""
+    stand_in.add("GET", "/api/machines", body=BODY)
+    probe = AsyncRestProbe(
+        {"url": "{}/api/machines".format(stand_in.url), "rules": RULES}
+    )
+    assert asyncio.run(probe.run()) is True
+    assert probe.results["hal.machines.count"] == [(2, [])]
+    assert len(probe.results["hal.machines.usage"]) == 2
@@ -1,7 +1,9 @@
 import pytest
 import logging
+import subprocess
 
-from hal.probes.watchdog import WatchdogProbe
+from hal.deadline import Deadline
+from hal.probes.watchdog import WatchdogProbe, parse_neighbours, read_neighbours
 
 
 def test_watchdog_probe():
@@ -93,3 +95,257 @@ def test_watchdog_failure(caplog, mocker):
         assert "Probe watchdog: host 'invalid-host' not found" in record.message
         assert result is True
         assert len(probe.results["hal.watchdog.detected_hosts"]) == 0
+
+
+ARP_TABLE = """IP address       HW type     Flags       HW address            Mask     Device
+192.168.1.10     0x1         0x2         AA:BB:CC:DD:EE:01     *        eth0
+192.168.1.11     0x1         0x0         00:00:00:00:00:00     *        eth0
+192.168.1.12     0x1         0x2         aa:bb:cc:dd:ee:02     *        eth0
+"""
+
+
+def test_watchdog_read_neighbours(tmp_path):
+    """Should read only resolved entries of the neighbour table."""
+    table = tmp_path / "arp"
+    table.write_text(ARP_TABLE)
+    assert read_neighbours(str(table)) == {
+        "192.168.1.10",
+        "aa:bb:cc:dd:ee:01",
+        "192.168.1.12",
+        "aa:bb:cc:dd:ee:02",
+    }
+
+
+IP_NEIGH = b"""192.168.1.10 dev wlan0 lladdr AA:BB:CC:DD:EE:01 REACHABLE
+192.168.1.11 dev wlan0 lladdr aa:bb:cc:dd:ee:03 STALE
+192.168.1.12 dev wlan0 lladdr aa:bb:cc:dd:ee:02 DELAY
+192.168.1.13 dev wlan0 lladdr aa:bb:cc:dd:ee:04 router PROBE
+192.168.1.14 dev wlan0  FAILED
+fe80::1 dev wlan0 lladdr aa:bb:cc:dd:ee:05 router STALE
+"""
+
+
+def test_watchdog_parse_neighbours():
+    """Should parse only reachable entries of the neighbour table."""
+    assert parse_neighbours(IP_NEIGH.decode()) == {
+        "192.168.1.10",
+        "aa:bb:cc:dd:ee:01",
+        "192.168.1.12",
+        "aa:bb:cc:dd:ee:02",
+        "192.168.1.13",
+        "aa:bb:cc:dd:ee:04",
+    }
+
+
+def test_watchdog_passive_neighbour_states(mocker):
+    """Should not detect hosts with a stale neighbour entry, and ping them instead."""
+
+    def run(args, **kwargs):
+        process = mocker.Mock(returncode=1, stdout=b"")
+        if args[0] == "ip":
+            process.returncode, process.stdout = 0, IP_NEIGH
+        return process
+
+    process = mocker.patch("subprocess.run", side_effect=run)
+    hosts = [
+        ("192.168.1.10", "phone"),
+        ("AA:BB:CC:DD:EE:02", "laptop"),
+        ("192.168.1.11", "tablet"),
+        ("aa:bb:cc:dd:ee:03", "tv"),
+    ]
+    probe = WatchdogProbe({"hosts": hosts, "passive": True})
+    assert probe.run() is True
+    assert probe.results["hal.watchdog.detected_hosts"] == [
+        (1, ["phone"]),
+        (1, ["laptop"]),
+    ]
+    # The neighbour table is read once, and the stale IP address is pinged
+    assert [c[0][0] for c in process.call_args_list] == [
+        ["ip", "neigh", "show"],
+        ["ping", "-c", "1", "192.168.1.11"],
+    ]
+
+
+def test_watchdog_passive_without_ip(mocker, caplog):
+    """Should fall back to active probing if the 'ip' command is not available."""
+
+    def run(args, **kwargs):
+        if args[0] == "ip":
+            raise FileNotFoundError("No such file or directory: 'ip'")
+        return mocker.Mock(returncode=0, stdout=b"")
+
+    mocker.patch("subprocess.run", side_effect=run)
+    probe = WatchdogProbe({"hosts": [("127.0.0.1", "test")], "passive": True})
+    with caplog.at_level(logging.WARNING):
+        assert probe.run() is True
+        assert "unable to read the neighbour table" in caplog.records[0].message
+    assert probe.results["hal.watchdog.detected_hosts"] == [(1, ["test"])]
+
+
+def test_watchdog_passive(mocker, tmp_path):
+    """Should detect hosts from the neighbour table and ping only unresolved hosts."""
+    table = tmp_path / "arp"
+    table.write_text(ARP_TABLE)
+    process = mocker.patch("subprocess.run")
+    process.return_value.returncode = 1
+    hosts = [
+        ("192.168.1.10", "phone"),
+        ("AA:BB:CC:DD:EE:02", "laptop"),
+        ("192.168.1.11", "tablet"),
+        ("aa:bb:cc:dd:ee:03", "tv"),
+    ]
+    probe = WatchdogProbe(
+        {"hosts": hosts, "passive": True, "neighbour_table": str(table)}
+    )
+    assert probe.run() is True
+    assert probe.results["hal.watchdog.detected_hosts"] == [
+        (1, ["phone"]),
+        (1, ["laptop"]),
+    ]
+    # Only the unresolved IP address is pinged
+    assert process.call_count == 1
+    assert process.call_args[0][0] == ["ping", "-c", "1", "192.168.1.11"]
+
+
+def test_watchdog_passive_missing_table(mocker, caplog):
+    """Should fall back to active probing if the neighbour table is not available."""
+    process = mocker.patch("subprocess.run")
+    process.return_value.returncode = 0
+    probe = WatchdogProbe(
+        {
+            "hosts": [("127.0.0.1", "test")],
+            "passive": True,
+            "neighbour_table": "/nonexistent/arp",
+        }
+    )
+    with caplog.at_level(logging.WARNING):
+        assert probe.run() is True
+        assert "unable to read the neighbour table" in caplog.records[0].message
+    assert probe.results["hal.watchdog.detected_hosts"] == [(1, ["test"])]
+
+
+def test_watchdog_home_hysteresis(mocker):
+    """Should mark a host as home after consecutive detections."""
+    process = mocker.patch("subprocess.run")
+    process.return_value.returncode = 0
+    probe = WatchdogProbe({"hosts": [("127.0.0.1", "test")], "home_after": 2})
+    probe.run()
+    assert probe.results["hal.watchdog.detected_hosts"] == []
+    probe.run()
+    assert probe.results["hal.watchdog.detected_hosts"] == [(1, ["test"])]
+
+
+def test_watchdog_away_hysteresis(mocker):
+    """Should keep a host home until it's not seen for 'away_after' seconds."""
+    clock = mocker.patch("hal.probes.watchdog.time.time")
+    process = mocker.patch("subprocess.run")
+    probe = WatchdogProbe({"hosts": [("127.0.0.1", "test")], "away_after": 300})
+
+    clock.return_value = 1000
+    process.return_value.returncode = 0
+    probe.run()
+    assert probe.results["hal.watchdog.detected_hosts"] == [(1, ["test"])]
+
+    # A lost packet doesn't flip the presence
+    clock.return_value = 1060
+    process.return_value.returncode = 1
+    probe.run()
+    assert probe.results["hal.watchdog.detected_hosts"] == [(1, ["test"])]
+
+    clock.return_value = 1300
+    probe.run()
+    assert probe.results["hal.watchdog.detected_hosts"] == []
+    assert probe.presence["127.0.0.1|test"]["last_seen"] == 1000
+
+
+def test_watchdog_fresh_hosts_skipped(mocker):
+    """Should not probe hosts seen recently."""
+    clock = mocker.patch("hal.probes.watchdog.time.time")
+    process = mocker.patch("subprocess.run")
+    process.return_value.returncode = 0
+    probe = WatchdogProbe({"hosts": [("127.0.0.1", "test")], "fresh_for": 120})
+
+    clock.return_value = 1000
+    probe.run()
+    clock.return_value = 1100
+    probe.run()
+    assert process.call_count == 1
+    assert probe.results["hal.watchdog.detected_hosts"] == [(1, ["test"])]
+
+    clock.return_value = 1120
+    probe.run()
+    assert process.call_count == 2
+
+
+def test_watchdog_presence_snapshot(mocker):
+    """Should restore presence and forget hosts removed from the configuration."""
+    process = mocker.patch("subprocess.run")
+    process.return_value.returncode = 0
+    probe = WatchdogProbe({"hosts": [("127.0.0.1", "test"), ("10.0.0.1", "old")]})
+    probe.run()
+
+    restored = WatchdogProbe({"hosts": [("127.0.0.1", "test")]})
+    restored.restore(probe.snapshot())
+    restored.run()
+    assert list(restored.presence) == ["127.0.0.1|test"]
+    assert restored.presence["127.0.0.1|test"]["hits"] == 2
+
+
+def test_watchdog_rtt(mocker):
+    """Should report RTT quantiles per host and per name."""
+    process = mocker.patch("subprocess.run")
+    process.return_value.returncode = 0
+    probe = WatchdogProbe({"hosts": [("10.0.0.1", "phone"), ("10.0.0.2", "phone")]})
+    for rtt in (b"1.0", b"2.0", b"3.0"):
+        process.return_value.stdout = (
+            b"64 bytes from 10.0.0.1: icmp_seq=1 ttl=64 time=" + rtt + b" ms\n"
+        )
+        probe.run()
+
+    assert probe.results["hal.watchdog.rtt.count"] == [(6, ["name:phone"])]
+    assert probe.results["hal.watchdog.rtt.avg"] == [(2.0, ["name:phone"])]
+    p50 = probe.results["hal.watchdog.rtt.p50"][0]
+    assert p50[0] == pytest.approx(2.0, rel=0.01)
+    host = probe.results["hal.watchdog.host.rtt.p50"]
+    assert host[0][1] == ["host:10.0.0.1", "name:phone"]
+    assert host[0][0] == pytest.approx(2.0, rel=0.01)
+
+
+def test_watchdog_rtt_window(mocker):
+    """Should reset RTT sketches when the window expires."""
+    clock = mocker.patch("hal.probes.watchdog.time.time")
+    process = mocker.patch("subprocess.run")
+    process.return_value.returncode = 0
+    process.return_value.stdout = b"time=5.0 ms"
+    probe = WatchdogProbe({"hosts": [("10.0.0.1", "phone")], "rtt_window": 60})
+    clock.return_value = 1000
+    probe.run()
+    clock.return_value = 1030
+    probe.run()
+    assert probe.results["hal.watchdog.rtt.count"] == [(2, ["name:phone"])]
+    clock.return_value = 1060
+    probe.run()
+    assert probe.results["hal.watchdog.rtt.count"] == [(1, ["name:phone"])]
+
+    restored = WatchdogProbe({"hosts": [("10.0.0.1", "phone")], "rtt_window": 60})
+    restored.restore(probe.snapshot())
+    restored.run()
+    assert restored.results["hal.watchdog.rtt.count"] == [(2, ["name:phone"])]
+
+
+def test_watchdog_deadline(mocker):
+    """Should keep the last known state of hosts not checked before the deadline."""
+    process = mocker.patch("subprocess.run")
+    process.return_value.returncode = 0
+    hosts = [("192.168.1.10", "alice"), ("192.168.1.11", "bob")]
+    probe = WatchdogProbe({"hosts": hosts})
+    probe.run()
+
+    process.side_effect = [
+        mocker.Mock(returncode=1),
+        subprocess.TimeoutExpired(["ping"], 1),
+    ]
+    assert probe.run(Deadline(60)) is True
+    assert probe.partial is True
+    assert probe.results["hal.watchdog.detected_hosts"] == [(1, ["bob"])]
+    assert process.call_args[1]["timeout"] <= 60
@@ -0,0 +1,154 @@
+import asyncio
+import aiohttp
+import logging
+
+from hal.probes.webhook import WebhookProbe, validate
+
+
+class Collector(object):
+    def __init__(self):
+        self.batches = []
+
+    def send(self, data):
+        self.batches.append(data)
+
+
+async def push(probe, requests):
+    """Runs the probe and sends the given ``(source, token, body)`` requests."""
+    task = asyncio.ensure_future(probe.run())
+    while probe.port is None:
+        await asyncio.sleep(0.01)
+
+    responses = []
+    async with aiohttp.ClientSession() as session:
+        for source, token, body in requests:
+            url = "http://127.0.0.1:{}/ingest/{}".format(probe.port, source)
+            headers = {"Authorization": "Bearer {}".format(token)}
+            async with session.post(url, json=body, headers=headers) as response:
+                responses.append(response.status)
+    status = await task
+    return status, responses
+
+
+def probe_config(collector, **config):
+    return {
+        "port": 0,
+        "duration": 0.3,
+        "flush_interval": 10,
+        "exporters": [collector],
+        "sources": {"alarm": {"token": "secret", "max_pending": 3}},
+        **config,
+    }
+
+
+def test_webhook_without_sources(caplog):
+    """Should fail if no sources are configured."""
+    with caplog.at_level(logging.ERROR):
+        assert asyncio.run(WebhookProbe().run()) is False
+        assert "missing 'sources'" in caplog.records[0].message
+
+
+def test_webhook_validate():
+    """Should validate points against the schema."""
+    assert validate({"metric": "hal.alarm", "value": 1}) is None
+    assert validate({"metric": "hal.alarm", "value": 1.5, "tags": ["a:b"]}) is None
+    assert validate([]) == "point must be an object"
+    assert validate({"value": 1}) == "'metric' must be a string"
+    assert validate({"metric": "hal.alarm", "value": "1"}) == "'value' must be a number"
+    assert "'tags'" in validate({"metric": "hal.alarm", "value": 1, "tags": [1]})
+    assert "'timestamp'" in validate({"metric": "m", "value": 1, "timestamp": "now"})
+
+
+def test_webhook_ingest():
+    """Should export pushed points with the source tag."""
+    collector = Collector()
+    probe = WebhookProbe(probe_config(collector))
+    body = [
+        {
+            "metric": "hal.alarm.armed",
+            "value": 1,
+            "tags": ["area:home"],
+            "timestamp": 10,
+        },
+        {
+            "metric": "hal.alarm.armed",
+            "value": 0,
+            "tags": ["area:home"],
+            "timestamp": 20,
+        },
+    ]
+    status, responses = asyncio.run(push(probe, [("alarm", "secret", body)]))
+    assert status is True
+    assert responses == [202]
+    assert collector.batches == [
+        {"hal.alarm.armed": [([(10, 1), (20, 0)], ["area:home", "source:alarm"])]}
+    ]
+
+
+def test_webhook_rejects_requests():
+    """Should reject unknown sources, invalid tokens and invalid payloads."""
+    collector = Collector()
+    probe = WebhookProbe(probe_config(collector))
+    requests = [
+        ("unknown", "secret", []),
+        ("alarm", "invalid", []),
+        ("alarm", "secret", {"metric": "hal.alarm"}),
+        ("alarm", "secret", [{"metric": "hal.alarm", "value": "on"}]),
+    ]
+    _, responses = asyncio.run(push(probe, requests))
+    assert responses == [404, 401, 400, 400]
+    assert collector.batches == []
+
+
+def test_webhook_backpressure():
+    """Should refuse points over the source capacity until the next flush."""
+    collector = Collector()
+    probe = WebhookProbe(probe_config(collector))
+    point = {"metric": "hal.alarm", "value": 1}
+    requests = [
+        ("alarm", "secret", [point, point]),
+        ("alarm", "secret", [point, point]),
+        ("alarm", "secret", [point]),
+    ]
+    _, responses = asyncio.run(push(probe, requests))
+    assert responses == [202, 429, 202]
+    assert len(collector.batches[0]["hal.alarm"][0][0]) == 3
+
+
+def test_webhook_exporter_error(caplog):
+    """Should keep flushing in background if an export fails."""
+
+    class FlakyCollector(Collector):
+        def send(self, data):
+            if not self.batches:
+                self.batches.append(None)
+                raise ConnectionError("unreachable")
+            super().send(data)
+
+    collector = FlakyCollector()
+    probe = WebhookProbe(probe_config(collector, duration=0.6, flush_interval=0.1))
+    point = {"metric": "hal.alarm", "value": 1}
+
+    async def scenario():
+        task = asyncio.ensure_future(probe.run())
+        while probe.port is None:
+            await asyncio.sleep(0.01)
+
+        statuses = []
+        url = "http://127.0.0.1:{}/ingest/alarm".format(probe.port)
+        headers = {"Authorization": "Bearer secret"}
+        async with aiohttp.ClientSession() as session:
+            for _ in range(3):
+                async with session.post(
+                    url, json=[point, point], headers=headers
+                ) as response:
+                    statuses.append(response.status)
+                await asyncio.sleep(0.15)
+        return await task, statuses
+
+    with caplog.at_level(logging.ERROR):
+        status, statuses = asyncio.run(scenario())
+    assert status is True
+    assert statuses == [202, 202, 202]
+    assert len(collector.batches) == 3
+    assert "unable to export a batch" in caplog.records[0].message
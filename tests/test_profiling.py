@@ -0,0 +1,35 @@
+import time
+import threading
+
+from hal.profiling import Profiler
+
+
+def busy():
+    end = time.time() + 0.05
+    while time.time() < end:
+        sum(range(100))
+
+
+def test_profiler_hotspots():
+    """Should report hotspots and allocation sites of the profiled code."""
+    with Profiler(interval=None) as profiler:
+        busy()
+        data = [str(i) for i in range(10000)]
+
+    assert "busy" in profiler.hotspots()
+    assert "test_profiling.py" in profiler.allocations()
+    assert profiler.collapsed() == ""
+    assert data
+
+
+def test_profiler_samples_threads():
+    """Should sample stacks of other threads in the collapsed format."""
+    with Profiler(interval=0.001) as profiler:
+        thread = threading.Thread(target=busy)
+        thread.start()
+        thread.join()
+
+    lines = profiler.collapsed().splitlines()
+    assert any("busy (" in line for line in lines)
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0
@@ -0,0 +1,175 @@
+import os
+import json
+import asyncio
+import logging
+import threading
+
+from hal.probes.base import BaseProbe
+from hal.reload import ConfigWatcher
+from hal.runner import Runner
+
+
+class StatefulProbe(BaseProbe):
+    DEFAULTS = {"value": 0}
+
+    def __init__(self, config=None):
+        super().__init__(config)
+        self.runs = 0
+
+    def _run(self):
+        self.runs += 1
+        self.results = {"hal.value": self.config["value"]}
+        return True, None
+
+
+def _write(path, definitions):
+    path.write_text(json.dumps(definitions))
+    # Make sure the change is detected on filesystems with coarse timestamps
+    stat = os.stat(str(path))
+    os.utime(str(path), ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+def _definition(name, value):
+    return {
+        "name": name,
+        "probe": "test_reload.StatefulProbe",
+        "config": {"value": value},
+    }
+
+
+def test_watcher_reload(tmp_path):
+    """Should add, rebuild and remove only changed definitions."""
+    path = tmp_path / "hal.json"
+    _write(path, [_definition("a", 1), _definition("b", 2)])
+    runner = Runner()
+    watcher = ConfigWatcher(str(path), runner)
+    assert watcher.reload() == ["a", "b"]
+    assert runner.run() == [True, True]
+    a, b = watcher.probes["a"], watcher.probes["b"]
+
+    _write(path, [_definition("a", 1), _definition("b", 3), _definition("c", 4)])
+    assert watcher.changed() is True
+    assert watcher.reload() == ["b", "c"]
+    assert watcher.changed() is False
+    # Unchanged probes keep their state
+    assert watcher.probes["a"] is a and a.runs == 1
+    assert watcher.probes["b"] is not b
+    assert runner.probes == [a, watcher.probes["b"], watcher.probes["c"]]
+
+    _write(path, [_definition("b", 3)])
+    assert watcher.reload() == ["a", "c"]
+    assert runner.probes == [watcher.probes["b"]]
+
+
+def test_watcher_reload_invalid(tmp_path, caplog):
+    """Should keep current probes if a definition or the file is not valid."""
+    path = tmp_path / "hal.json"
+    _write(path, [_definition("a", 1)])
+    runner = Runner()
+    watcher = ConfigWatcher(str(path), runner)
+    watcher.reload()
+    a = watcher.probes["a"]
+
+    _write(path, [{"name": "a", "probe": "missing"}, _definition("b", 2)])
+    with caplog.at_level(logging.ERROR):
+        assert watcher.reload() == ["b"]
+    assert "unable to build 'a'" in caplog.records[0].message
+    assert runner.probes == [a, watcher.probes["b"]]
+
+    path.write_text("[{")
+    with caplog.at_level(logging.ERROR):
+        asyncio.run(_watch_once(watcher))
+    assert "configuration not reloaded" in caplog.records[-1].message
+    assert runner.probes == [a, watcher.probes["b"]]
+
+
+async def _watch_once(watcher):
+    watcher.interval = 0.01
+    task = asyncio.ensure_future(watcher.watch())
+    await asyncio.sleep(0.1)
+    task.cancel()
+
+
+def test_watcher_close_exporters(tmp_path, mocker):
+    """Should close exporters of replaced probes."""
+    path = tmp_path / "hal.json"
+    definition = {
+        **_definition("a", 1),
+        "exporters": [{"exporter": "file", "config": {"path": str(tmp_path / "o")}}],
+    }
+    _write(path, [definition])
+    watcher = ConfigWatcher(str(path), Runner())
+    watcher.reload()
+    exporter = watcher.probes["a"].config["exporters"][0]
+    close = mocker.patch.object(exporter, "close")
+
+    _write(path, [_definition("a", 2)])
+    watcher.reload()
+    assert close.call_count == 1
+
+
+def test_runner_serve_with_watcher(tmp_path):
+    """Should run new definitions without interrupting the runner."""
+    path = tmp_path / "hal.json"
+    _write(path, [_definition("a", 1)])
+    runner = Runner()
+    watcher = ConfigWatcher(str(path), runner, interval=0.01)
+    watcher.reload()
+    a = watcher.probes["a"]
+
+    async def serve():
+        tasks = [
+            asyncio.ensure_future(runner.serve(0.02)),
+            asyncio.ensure_future(watcher.watch()),
+        ]
+        await asyncio.sleep(0.05)
+        _write(path, [_definition("a", 1), _definition("b", 2)])
+        await asyncio.sleep(0.1)
+        for task in tasks:
+            task.cancel()
+
+    asyncio.run(serve())
+    assert watcher.probes["a"] is a
+    assert a.runs > watcher.probes["b"].runs > 0
+
+
+class BlockingProbe(BaseProbe):
+    DEFAULTS = {"value": 0}
+    release = None
+
+    def _run(self):
+        BlockingProbe.release.wait(5)
+        self.results = {"hal.value": self.config["value"]}
+        return True, None
+
+
+def test_watcher_close_exporters_after_run(tmp_path):
+    """Should close exporters of a replaced probe only after its run is exported."""
+    path = tmp_path / "hal.json"
+    output = tmp_path / "output.jsonl"
+    definition = {
+        "name": "a",
+        "probe": "test_reload.BlockingProbe",
+        "config": {"value": 1},
+        "exporters": [{"exporter": "file", "config": {"path": str(output)}}],
+    }
+    _write(path, [definition])
+    runner = Runner()
+    watcher = ConfigWatcher(str(path), runner)
+    watcher.reload()
+    exporter = watcher.probes["a"].config["exporters"][0]
+    BlockingProbe.release = threading.Event()
+
+    async def scenario():
+        run = asyncio.ensure_future(runner.run_once())
+        await asyncio.sleep(0.05)
+        _write(path, [{**definition, "config": {"value": 2}}])
+        watcher.reload()
+        # The replaced probe is still running: its exporter must stay open
+        assert exporter._closed.is_set() is False
+        BlockingProbe.release.set()
+        return await run
+
+    assert asyncio.run(scenario()) == [True]
+    assert exporter._closed.is_set() is True
+    assert json.loads(output.read_text())["value"] == 1
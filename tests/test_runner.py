@@ -0,0 +1,194 @@
+import os
+import asyncio
+import logging
+import threading
+
+from hal.probes.base import AsyncBaseProbe, BaseProbe
+from hal.probes.stream import StreamProbe
+from hal.runner import Runner
+
+
+class SyncProbe(BaseProbe):
+    def _run(self):
+        self.results["thread"] = threading.get_ident()
+        return True, None
+
+
+class SleepingProbe(AsyncBaseProbe):
+    async def _run(self):
+        await asyncio.sleep(0.1)
+        self.results["slept"] = 1
+        return True, None
+
+
+class BrokenProbe(BaseProbe):
+    def _run(self):
+        raise RuntimeError("boom")
+
+
+def test_runner_run_once(mocker):
+    """Should run and export sync and async probes."""
+    exporter = mocker.Mock()
+    sync_probe = SyncProbe({"exporters": [exporter]})
+    async_probe = SleepingProbe({"exporters": [exporter]})
+    runner = Runner([sync_probe, async_probe])
+    assert runner.run() == [True, True]
+    assert exporter.send.call_count == 2
+    # Sync probes must not block the event loop thread
+    assert sync_probe.results["thread"] != threading.get_ident()
+
+
+def test_runner_concurrency():
+    """Should run async probes concurrently."""
+    runner = Runner([SleepingProbe() for _ in range(10)])
+    loop = asyncio.new_event_loop()
+    started = loop.time()
+    loop.run_until_complete(runner.run_once())
+    assert loop.time() - started < 0.5
+    loop.close()
+
+
+def test_runner_probe_exception(caplog):
+    """Should isolate probes that raise exceptions."""
+    runner = Runner()
+    runner.add(BrokenProbe())
+    runner.add(SleepingProbe())
+    with caplog.at_level(logging.ERROR):
+        assert runner.run() == [False, True]
+        assert "BrokenProbe raised an exception" in caplog.records[0].message
+
+
+class PidProbe(BaseProbe):
+    def _run(self):
+        self.results["pid"] = (os.getpid(), ["worker"])
+        return True, None
+
+
+def test_runner_isolated_probes(mocker):
+    """Should run isolated probes in worker processes and export from the parent."""
+    exporter = mocker.Mock()
+    probe = PidProbe({"exporters": [exporter]})
+    runner = Runner(processes=2)
+    runner.add(probe, isolated=True)
+    runner.add(SleepingProbe())
+    assert runner.run() == [True, True]
+    assert probe.results["pid"][0] != os.getpid()
+    assert probe.results["pid"][1] == ["worker"]
+    assert exporter.send.call_count == 1
+    assert runner._pool is None
+
+
+class RunCountProbe(BaseProbe):
+    """Emits a different metric at each run; runs are counted in a file because
+    the probe is rebuilt in the worker process.
+    """
+
+    DEFAULTS = {"path": None}
+
+    def _run(self):
+        with open(self.config["path"], "a+") as f:
+            f.write(".")
+            f.seek(0)
+            runs = len(f.read())
+        self.results = {"hal.run_{}".format(runs): 1}
+        return True, None
+
+
+def test_runner_isolated_probes_results(tmp_path, mocker):
+    """Should export only the results of the current run of isolated probes."""
+    exporter = mocker.Mock()
+    probe = RunCountProbe({"path": str(tmp_path / "runs"), "exporters": [exporter]})
+    runner = Runner(processes=1)
+    runner.add(probe, isolated=True)
+    runner.run()
+    runner.run()
+    assert list(exporter.send.call_args[0][0]) == ["hal.run_2"]
+
+
+def test_runner_deadline():
+    """Should share a deadline between probes of the same run."""
+
+    class DeadlineProbe(BaseProbe):
+        def _run(self):
+            self.results = {"hal.remaining": self.deadline.remaining()}
+            return True, None
+
+    probe = DeadlineProbe()
+    runner = Runner([probe], deadline=30)
+    assert runner.run() == [True]
+    assert 0 < probe.results["hal.remaining"] <= 30
+
+
+class TickingStream(StreamProbe):
+    """Streams an update every 10 ms, forever."""
+
+    DEFAULTS = {**StreamProbe.DEFAULTS, "flush_interval": 0.02}
+    starts = 0
+
+    async def _stream(self):
+        TickingStream.starts += 1
+        while True:
+            self.collect("hal.tick", 1, [])
+            await asyncio.sleep(0.01)
+
+
+class FailingStream(StreamProbe):
+    async def _stream(self):
+        return False, "connection refused"
+
+
+class CountingProbe(AsyncBaseProbe):
+    runs = 0
+
+    async def _run(self):
+        CountingProbe.runs += 1
+        return True, None
+
+
+async def _serve(runner, interval, duration):
+    task = asyncio.ensure_future(runner.serve(interval))
+    await asyncio.sleep(duration)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+def test_runner_serve_stream_probes(mocker):
+    """Should keep polling probes while stream probes run in their own task."""
+    exporter = mocker.Mock()
+    TickingStream.starts = CountingProbe.runs = 0
+    runner = Runner([TickingStream({"exporters": [exporter]}), CountingProbe()])
+    asyncio.run(_serve(runner, 0.05, 0.5))
+    assert CountingProbe.runs >= 5
+    assert TickingStream.starts == 1
+    assert exporter.send.call_count > 5
+    assert runner._streams == {}
+
+
+def test_runner_serve_restart_stream(caplog):
+    """Should restart stream probes that stop."""
+    probe = FailingStream()
+    runner = Runner([probe], restart_delay=0.05)
+    with caplog.at_level(logging.WARNING):
+        asyncio.run(_serve(runner, 1, 0.2))
+    assert runner.stats[probe].runs >= 3
+    assert runner.stats[probe].successes == 0
+    assert "FailingStream stream stopped (failed)" in caplog.text
+
+
+def test_runner_remove_stream(mocker):
+    """Should cancel a removed stream probe and close its exporters."""
+    exporter = mocker.Mock()
+    probe = TickingStream({"exporters": [exporter]})
+    runner = Runner([probe])
+
+    async def scenario():
+        task = asyncio.ensure_future(runner.serve(1))
+        await asyncio.sleep(0.1)
+        stream = runner._streams[probe]
+        runner.remove(probe, close=True)
+        await asyncio.sleep(0.05)
+        assert stream.cancelled()
+        task.cancel()
+
+    asyncio.run(scenario())
+    assert exporter.close.call_count == 1
@@ -0,0 +1,120 @@
+import responses
+
+from hal.probes.base import BaseProbe
+from hal.probes.paperspace import PaperspaceProbe
+from hal.probes.watchdog import WatchdogProbe
+from hal.sharding.ring import HashRing
+from hal.sharding.sqlite import SQLiteMembership
+
+
+KEYS = ["machine-{}".format(i) for i in range(1000)]
+
+
+def _members(tmp_path, *workers):
+    path = str(tmp_path / "members.db")
+    return [SQLiteMembership({"path": path, "worker_id": w}) for w in workers]
+
+
+def test_ring_distribution():
+    """Should spread keys across all workers."""
+    ring = HashRing(["a", "b", "c"])
+    owners = [ring.owner(key) for key in KEYS]
+    for worker in ("a", "b", "c"):
+        assert 200 < owners.count(worker) < 470
+
+
+def test_ring_rebalance():
+    """Should move only the keys of the leaving worker."""
+    before = HashRing(["a", "b", "c"])
+    after = HashRing(["a", "b"])
+    for key in KEYS:
+        if before.owner(key) != "c":
+            assert after.owner(key) == before.owner(key)
+        else:
+            assert after.owner(key) in ("a", "b")
+
+
+def test_ring_empty():
+    """Should return no owner without workers."""
+    assert HashRing([]).owner("key") is None
+
+
+def test_sqlite_membership(tmp_path, mocker):
+    """Should track live workers with heartbeats."""
+    clock = mocker.patch("hal.sharding.base.time.time", return_value=1000)
+    first, second = _members(tmp_path, "first", "second")
+    assert first.ring().workers == ["first"]
+    assert second.ring().workers == ["first", "second"]
+    assert first.ring().workers == ["first", "second"]
+
+    # Workers that stop sending heartbeats are removed
+    clock.return_value = 1000 + first.config["ttl"] + 1
+    assert first.ring().workers == ["first"]
+
+    second.ring()
+    second.leave()
+    assert first.ring().workers == ["first"]
+
+
+def test_probe_owns_without_membership():
+    """Should own all items if work is not sharded."""
+    probe = BaseProbe()
+    assert probe.owns("key") is True
+    assert probe.owns_aggregates() is True
+
+
+def test_watchdog_sharding(tmp_path, mocker):
+    """Should check each host on a single worker."""
+    process = mocker.patch("subprocess.run")
+    process.return_value.returncode = 0
+    process.return_value.stdout = b""
+    hosts = [("192.168.1.{}".format(i), "name-{}".format(i)) for i in range(20)]
+    members = _members(tmp_path, "first", "second")
+    for membership in members:
+        membership.ring()
+
+    detected = []
+    for membership in members:
+        probe = WatchdogProbe({"hosts": hosts, "membership": membership})
+        assert probe.run() is True
+        detected.extend(probe.results["hal.watchdog.detected_hosts"])
+
+    assert sorted(tags[0] for _, tags in detected) == sorted(n for _, n in hosts)
+    assert process.call_count == 20
+
+
+def test_paperspace_sharding(server, tmp_path):
+    """Should split machines across workers, reporting the count once."""
+    machines = ",".join('{{"id": "m{}", "state": "off"}}'.format(i) for i in range(10))
+    server.add(
+        responses.GET,
+        "https://api.paperspace.io/machines/getMachines",
+        body="[{}]".format(machines),
+    )
+    server.add(
+        responses.GET,
+        "https://api.paperspace.io/machines/getUtilization",
+        body=(
+            '{"utilization": {"secondsUsed": 10, "hourlyRate": "0.78"},'
+            ' "storageUtilization": {"monthlyRate": "10.00"}}'
+        ),
+    )
+    members = _members(tmp_path, "first", "second")
+    for membership in members:
+        membership.ring()
+
+    counts, usage = [], []
+    for membership in members:
+        probe = PaperspaceProbe({"api_key": "valid", "membership": membership})
+        assert probe.run() is True
+        if "hal.paperspace.machines.count" in probe.results:
+            counts.append(probe.results["hal.paperspace.machines.count"])
+        usage.extend(probe.results["hal.paperspace.utilization.instance.usage_seconds"])
+
+    assert counts == [10]
+    assert sorted(tags[0] for _, tags in usage) == sorted(
+        "machine_id:m{}".format(i) for i in range(10)
+    )
+    # Each worker only fetched utilization data of its own machines
+    utilization_calls = [c for c in server.calls if "getUtilization" in c.request.url]
+    assert len(utilization_calls) == 10
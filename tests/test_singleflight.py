@@ -0,0 +1,270 @@
+import time
+import asyncio
+import pytest
+import threading
+
+from hal.deadline import Deadline, DeadlineExceeded
+from hal.singleflight import AsyncSingleFlight, SingleFlight
+
+
+def test_singleflight_coalesce():
+    """Should share a single call between concurrent callers."""
+    flights = SingleFlight()
+    calls = []
+    results = []
+
+    def fn():
+        calls.append(1)
+        time.sleep(0.1)
+        return len(calls)
+
+    threads = [
+        threading.Thread(target=lambda: results.append(flights.do("key", fn)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [1] * 5
+    # Completed calls are not cached without a TTL
+    assert flights.do("key", fn) == 2
+
+
+def test_singleflight_ttl(mocker):
+    """Should reuse the result until the TTL expires."""
+    flights = SingleFlight()
+    clock = mocker.patch("hal.singleflight.time.monotonic", return_value=100)
+    fn = mocker.Mock(side_effect=[1, 2])
+
+    assert flights.do("key", fn, ttl=5) == 1
+    clock.return_value = 104
+    assert flights.do("key", fn, ttl=5) == 1
+    clock.return_value = 105
+    assert flights.do("key", fn, ttl=5) == 2
+    assert fn.call_count == 2
+
+
+def test_singleflight_errors():
+    """Should raise errors to all callers, without caching them."""
+    flights = SingleFlight()
+
+    def fail():
+        raise ValueError("upstream error")
+
+    with pytest.raises(ValueError):
+        flights.do("key", fail, ttl=60)
+    assert flights.do("key", lambda: 42, ttl=60) == 42
+
+
+def test_async_singleflight_coalesce():
+    """Should share a single coroutine call between concurrent callers."""
+    flights = AsyncSingleFlight()
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    async def main():
+        return await asyncio.gather(*(flights.do("key", fn) for _ in range(5)))
+
+    assert asyncio.run(main()) == [1] * 5
+    assert len(calls) == 1
+
+
+def test_async_singleflight_ttl():
+    """Should reuse the result across event loops until the TTL expires."""
+    flights = AsyncSingleFlight()
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        return len(calls)
+
+    assert asyncio.run(flights.do("key", fn, ttl=60)) == 1
+    assert asyncio.run(flights.do("key", fn, ttl=60)) == 1
+    assert asyncio.run(flights.do("other", fn, ttl=60)) == 2
+
+
+def test_async_singleflight_errors():
+    """Should raise errors to all callers, without caching them."""
+    flights = AsyncSingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream error")
+
+    async def main():
+        return await asyncio.gather(
+            *(flights.do("key", fail, ttl=60) for _ in range(2)), return_exceptions=True
+        )
+
+    errors = asyncio.run(main())
+    assert all(isinstance(e, ValueError) for e in errors)
+    assert "key" not in flights._calls
+
+
+def test_singleflight_evict_expired(mocker):
+    """Should evict expired results of keys that are not requested again."""
+    clock = mocker.patch("hal.singleflight.time.monotonic", return_value=100)
+    flights = SingleFlight()
+    for month in ("2020-01", "2020-02", "2020-03"):
+        flights.do(("GET", month), lambda: 1, ttl=10)
+    assert len(flights) == 3
+
+    clock.return_value = 111
+    flights.do(("GET", "2020-04"), lambda: 1, ttl=10)
+    assert list(flights._calls) == [("GET", "2020-04")]
+
+    clock.return_value = 121
+    assert len(flights) == 0
+
+
+def test_async_singleflight_evict_expired(mocker):
+    """Should evict expired results of keys that are not requested again."""
+    clock = mocker.patch("hal.singleflight.time.monotonic", return_value=100)
+    flights = AsyncSingleFlight()
+
+    async def one():
+        return 1
+
+    async def scenario():
+        await flights.do("a", one, ttl=10)
+        await flights.do("b", one, ttl=20)
+        clock.return_value = 115
+        await flights.do("c", one, ttl=10)
+        return sorted(flights._calls)
+
+    assert asyncio.run(scenario()) == ["b", "c"]
+    clock.return_value = 130
+    assert len(flights) == 0
+
+
+def test_singleflight_leader_deadline():
+    """Should retry the call for waiters if the caller that made it runs out of its
+    deadline.
+    """
+    flights = SingleFlight()
+    calls = []
+
+    def fn(deadline):
+        calls.append(1)
+        time.sleep(0.1)
+        if deadline is not None:
+            raise DeadlineExceeded()
+        return len(calls)
+
+    def call(deadline, results):
+        try:
+            results.append(flights.do("key", lambda: fn(deadline), deadline=deadline))
+        except DeadlineExceeded as e:
+            results.append(e)
+
+    leader, waiter = [], []
+    threads = [
+        threading.Thread(target=call, args=(Deadline(0.05), leader)),
+        threading.Thread(target=call, args=(None, waiter)),
+    ]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.01)
+    for thread in threads:
+        thread.join()
+
+    assert isinstance(leader[0], DeadlineExceeded)
+    assert waiter == [2]
+
+
+def test_singleflight_waiter_deadline():
+    """Should stop waiting for a call in flight when the waiter deadline is used up."""
+    flights = SingleFlight()
+    release = threading.Event()
+    thread = threading.Thread(target=lambda: flights.do("key", lambda: release.wait(5)))
+    thread.start()
+    time.sleep(0.01)
+
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        flights.do("key", lambda: None, deadline=Deadline(0.05))
+    assert time.monotonic() - started < 1
+    release.set()
+    thread.join()
+
+
+def test_async_singleflight_leader_deadline():
+    """Should retry the call for waiters if the caller that made it runs out of its
+    deadline.
+    """
+    flights = AsyncSingleFlight()
+    calls = []
+
+    async def fn(deadline):
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        if deadline is not None:
+            raise DeadlineExceeded()
+        return len(calls)
+
+    async def call(deadline):
+        return await flights.do("key", lambda: fn(deadline), deadline=deadline)
+
+    async def main():
+        return await asyncio.gather(
+            call(Deadline(0.01)), call(None), return_exceptions=True
+        )
+
+    leader, waiter = asyncio.run(main())
+    assert isinstance(leader, DeadlineExceeded)
+    assert waiter == 2
+
+
+def test_async_singleflight_waiter_deadline():
+    """Should stop waiting for a call in flight when the waiter deadline is used up."""
+    flights = AsyncSingleFlight()
+
+    async def slow():
+        await asyncio.sleep(0.5)
+        return 1
+
+    async def main():
+        leader = asyncio.ensure_future(flights.do("key", slow))
+        await asyncio.sleep(0)
+        started = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            await flights.do("key", slow, deadline=Deadline(0.05))
+        elapsed = time.monotonic() - started
+        return elapsed, await leader
+
+    elapsed, result = asyncio.run(main())
+    assert elapsed < 0.3
+    assert result == 1
+
+
+def test_async_singleflight_leader_cancelled():
+    """Should make the call again for waiters if the caller that made it is
+    cancelled.
+    """
+    flights = AsyncSingleFlight()
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return len(calls)
+
+    async def main():
+        leader = asyncio.ensure_future(flights.do("key", fn))
+        waiters = [asyncio.ensure_future(flights.do("key", fn)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await asyncio.gather(*waiters), leader.cancelled()
+
+    results, cancelled = asyncio.run(main())
+    assert cancelled is True
+    assert results == [2, 2]
+    assert len(calls) == 2
+    assert "key" not in flights._calls
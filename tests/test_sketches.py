@@ -0,0 +1,105 @@
+import random
+import pytest
+
+from hal.sketches import DDSketch, HyperLogLog, SpaceSaving
+
+
+def test_sketch_empty():
+    """Should return None for empty sketches."""
+    sketch = DDSketch()
+    assert len(sketch) == 0
+    assert sketch.quantile(0.5) is None
+
+
+def test_sketch_relative_accuracy():
+    """Should estimate quantiles within the relative accuracy."""
+    rng = random.Random(42)
+    values = [rng.lognormvariate(2, 1) for _ in range(10000)]
+    sketch = DDSketch(relative_accuracy=0.01)
+    for value in values:
+        sketch.add(value)
+
+    values.sort()
+    for q in (0.5, 0.95, 0.99):
+        expected = values[int(q * (len(values) - 1))]
+        assert sketch.quantile(q) == pytest.approx(expected, rel=0.01)
+    assert sketch.quantile(0) == values[0]
+    assert sketch.quantile(1) == values[-1]
+
+
+def test_sketch_zeros():
+    """Should count zero values."""
+    sketch = DDSketch()
+    sketch.add(0)
+    sketch.add(0)
+    sketch.add(10)
+    assert sketch.quantile(0.5) == 0.0
+    assert sketch.quantile(1) == 10
+
+
+def test_sketch_bounded_memory():
+    """Should collapse lowest buckets above max_bins, keeping high quantiles."""
+    sketch = DDSketch(max_bins=32)
+    for value in range(1, 10001):
+        sketch.add(value)
+    assert len(sketch.bins) == 32
+    assert sketch.count == 10000
+    assert sketch.quantile(0.99) == pytest.approx(9900, rel=0.01)
+
+
+def test_sketch_merge():
+    """Should merge sketches like a single sketch with all values."""
+    first, second, full = DDSketch(), DDSketch(), DDSketch()
+    for value in range(1, 1001):
+        (first if value % 2 else second).add(value)
+        full.add(value)
+    first.merge(second)
+    assert first.count == full.count
+    assert first.bins == full.bins
+    assert first.min == 1 and first.max == 1000
+    with pytest.raises(ValueError):
+        first.merge(DDSketch(relative_accuracy=0.05))
+
+
+def test_sketch_serialization():
+    """Should serialize and restore sketches."""
+    sketch = DDSketch()
+    for value in (1.5, 2.5, 100):
+        sketch.add(value)
+    restored = DDSketch.from_dict(sketch.to_dict())
+    assert restored.bins == sketch.bins
+    assert restored.quantile(0.5) == sketch.quantile(0.5)
+
+
+@pytest.mark.parametrize("n", [0, 10, 1000, 50000])
+def test_hyperloglog_count(n):
+    """Should estimate the number of distinct values within a few percent."""
+    hll = HyperLogLog()
+    for i in range(n):
+        hll.add("machine_id:{}".format(i))
+        hll.add("machine_id:{}".format(i))
+    assert hll.count() == pytest.approx(n, rel=0.05)
+
+
+def test_hyperloglog_merge():
+    """Should merge sketches with the same precision."""
+    first, second = HyperLogLog(), HyperLogLog()
+    for i in range(1000):
+        first.add(str(i))
+        second.add(str(i + 500))
+    first.merge(second)
+    assert first.count() == pytest.approx(1500, rel=0.05)
+    with pytest.raises(ValueError):
+        first.merge(HyperLogLog(precision=10))
+
+
+def test_space_saving_top():
+    """Should keep heavy keys with bounded counters."""
+    top = SpaceSaving(10)
+    for i in range(1000):
+        top.add("light-{}".format(i), 1)
+        if i % 10 == 0:
+            top.add("heavy-a", 50)
+            top.add("heavy-b", 30)
+    assert len(top) == 10
+    assert top.top(2) == ["heavy-a", "heavy-b"]
@@ -0,0 +1,86 @@
+import os
+import logging
+import pytest
+
+from hal.probes.base import BaseProbe
+from hal.snapshots.base import BaseSnapshotStore
+from hal.snapshots.file import FileSnapshotStore
+
+
+class CounterProbe(BaseProbe):
+    def __init__(self, config=None):
+        super().__init__(config)
+        self.counter = 0
+
+    def snapshot(self):
+        return {"counter": self.counter}
+
+    def restore(self, state):
+        self.counter = state["counter"]
+
+    def _run(self):
+        self.counter += 1
+        self.results["hal.counter"] = self.counter
+        return True, None
+
+
+def test_base_store_interface():
+    """Should raise NotImplementedError."""
+    store = BaseSnapshotStore()
+    with pytest.raises(NotImplementedError):
+        store.load("key", 1)
+    with pytest.raises(NotImplementedError):
+        store.save("key", 1, {})
+
+
+def test_file_store_roundtrip(tmp_path):
+    """Should store and load the state."""
+    store = FileSnapshotStore({"path": str(tmp_path)})
+    assert store.load("probe", 1) is None
+    assert store.save("probe", 1, {"machines": {"m1": [1, 2]}}) is True
+    assert store.load("probe", 1) == {"machines": {"m1": [1, 2]}}
+    assert os.listdir(str(tmp_path)) == ["hal-probe.snapshot"]
+
+
+def test_file_store_version(tmp_path):
+    """Should discard snapshots with a different version."""
+    store = FileSnapshotStore({"path": str(tmp_path)})
+    store.save("probe", 1, {"counter": 1})
+    assert store.load("probe", 2) is None
+
+
+def test_file_store_max_size(tmp_path, caplog):
+    """Should not save or load snapshots bigger than max_size."""
+    store = FileSnapshotStore({"path": str(tmp_path), "max_size": 32})
+    with caplog.at_level(logging.WARNING):
+        assert store.save("probe", 1, {"data": "x" * 64}) is False
+        assert store.load("probe", 1) is None
+        assert "exceeds max_size" in caplog.records[0].message
+
+    (tmp_path / "hal-probe.snapshot").write_bytes(b"x" * 64)
+    assert store.load("probe", 1) is None
+
+
+def test_file_store_corrupted(tmp_path):
+    """Should discard corrupted snapshots."""
+    (tmp_path / "hal-probe.snapshot").write_bytes(b"{not json")
+    store = FileSnapshotStore({"path": str(tmp_path)})
+    assert store.load("probe", 1) is None
+
+
+def test_probe_warm_start(tmp_path):
+    """Should restore the probe state from the previous invocation."""
+    store = FileSnapshotStore({"path": str(tmp_path)})
+    CounterProbe({"snapshot_store": store}).run()
+    probe = CounterProbe({"snapshot_store": store})
+    probe.run()
+    assert probe.results["hal.counter"] == 2
+    assert store.load("CounterProbe", 1) == {"counter": 2}
+
+
+def test_probe_without_store():
+    """Should not persist state if a store is not configured."""
+    CounterProbe().run()
+    probe = CounterProbe()
+    probe.run()
+    assert probe.results["hal.counter"] == 1